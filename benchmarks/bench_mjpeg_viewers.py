@@ -0,0 +1,145 @@
+"""
+Benchmark of MJPEG streaming to many viewers.
+
+A feeder writes JPEG-sized frames into a StreamingOutput at the stream
+framerate. Simulated viewers (asyncio clients) read '/stream.mjpeg' from
+the threaded WSGI server and from the asyncio StreamServer, while
+a client measures round-trip times of a small JSON request to the
+WSGI app. Reported: delivered frames per viewer, request latency
+and threads of the process.
+
+Use: python -m benchmarks.bench_mjpeg_viewers [viewers] [seconds] [frame_kb]
+"""
+import sys
+import time
+import asyncio
+import logging
+import threading
+from threading import Thread, Event
+
+import numpy as np
+from flask import Flask, Response, jsonify
+from werkzeug.serving import make_server
+
+from benchmarks.bench_web_latency import measure_latency
+from securypi_app.peripherals.camera.streaming import StreamingOutput
+from securypi_app.services.stream_server import StreamServer, STREAM_PATH
+
+FRAMERATE = 15
+
+
+def create_app(output):
+    app = Flask(__name__)
+    app.secret_key = "bench"
+
+    @app.route("/status")
+    def status():
+        readings = {f"sensor_{i}": i * 0.5 for i in range(200)}
+        return jsonify(sorted(readings.items()))
+
+    @app.route(STREAM_PATH)
+    def stream():
+        return Response(output.generate_frames(),
+                        mimetype="multipart/x-mixed-replace; boundary=frame")
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # no access log
+    return app
+
+
+def feed(output, frame, stop_event):
+    """ Write 'frame' at the stream framerate until stopped. """
+    next_write = time.monotonic()
+    while not stop_event.is_set():
+        output.write(frame)
+        next_write += 1 / FRAMERATE
+        stop_event.wait(max(next_write - time.monotonic(), 0))
+
+
+async def view(port, cookie, counts, index, stop_event):
+    """ Count boundaries received by one viewer. """
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET {STREAM_PATH} HTTP/1.1\r\nHost: localhost\r\n"
+                 f"Cookie: session={cookie}\r\n\r\n".encode())
+    tail = b""
+    while not stop_event.is_set():
+        try:
+            data = await asyncio.wait_for(reader.read(65536), 0.5)
+        except asyncio.TimeoutError:
+            continue
+        if not data:
+            break
+        counts[index] += (tail + data).count(b"--frame\r\n")
+        tail = data[-8:]
+    writer.close()
+
+
+def run_viewers(port, status_port, cookie, viewers, seconds):
+    """
+    Connect 'viewers' clients to 'port' for 'seconds', return frames
+    per viewer, latencies of requests to 'status_port' and thread count.
+    """
+    counts = [0] * viewers
+    stop_event = Event()
+
+    async def main():
+        tasks = [asyncio.create_task(view(port, cookie, counts, i, stop_event))
+                 for i in range(viewers)]
+        await asyncio.gather(*tasks)
+
+    thread = Thread(target=asyncio.run, args=(main(),), daemon=True)
+    thread.start()
+    time.sleep(1.0)     # connected
+    counts[:] = [0] * viewers
+    latencies = measure_latency(status_port, seconds)
+    threads = threading.active_count()
+    stop_event.set()
+    thread.join()
+    return np.array(counts), latencies, threads
+
+
+def report(name, counts, latencies, threads, seconds):
+    p50, p95 = np.percentile(latencies, [50, 95])
+    print(f"{name:<8} frames/viewer/s min {counts.min() / seconds:5.1f} "
+          f"mean {counts.mean() / seconds:5.1f}   "
+          f"request p50 {p50:6.2f} ms  p95 {p95:7.2f} ms   threads {threads}")
+
+
+def main():
+    viewers = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+    frame_kb = int(sys.argv[3]) if len(sys.argv) > 3 else 60
+
+    output = StreamingOutput()
+    frame = np.random.default_rng(0).integers(0, 256, frame_kb * 1024,
+                                              dtype=np.uint8).tobytes()
+    app = create_app(output)
+    cookie = app.session_interface.get_signing_serializer(app).dumps(  # pyright: ignore[reportAttributeAccessIssue]
+        {"username": "viewer"}
+    )
+
+    wsgi = make_server("127.0.0.1", 0, app, threaded=True)
+    Thread(target=wsgi.serve_forever, daemon=True).start()
+    stream_server = StreamServer(app, output.frames, host="127.0.0.1",
+                                 framerate=FRAMERATE).start()
+
+    stop_event = Event()
+    Thread(target=feed, args=(output, frame, stop_event), daemon=True).start()
+    print(f"viewers: {viewers}, frame: {frame_kb} kB at {FRAMERATE} fps, "
+          f"{seconds:.0f} s per case")
+    try:
+        counts, latencies, threads = run_viewers(wsgi.port, wsgi.port, cookie,
+                                                 viewers, seconds)
+        report("wsgi", counts, latencies, threads, seconds)
+        time.sleep(0.5)     # WSGI threads notice closed connections
+
+        counts, latencies, threads = run_viewers(stream_server.port, wsgi.port, cookie,
+                                                 viewers, seconds)
+        report("asyncio", counts, latencies, threads, seconds)
+    finally:
+        stop_event.set()
+        stream_server.stop()
+        wsgi.shutdown()
+
+
+if __name__ == "__main__":
+    main()
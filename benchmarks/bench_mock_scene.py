@@ -0,0 +1,56 @@
+"""
+Benchmark of detection accuracy and throughput on the mock camera scene.
+
+Frames of MockScene.default() are scored by the pipeline of the current
+configuration. A frame is positive if an object is visible in it or the
+previous frame; results are counted per frame against the threshold.
+
+Use: python -m benchmarks.bench_mock_scene [width] [height] [frames]
+"""
+import sys
+import time
+
+from securypi_app.models.app_config import AppConfig
+from securypi_app.peripherals.camera.mock_camera_modules.mock_scene import MockScene
+from securypi_app.peripherals.camera.motion_detectors.detection_pipeline import (
+    create_detection_pipeline
+)
+
+
+def main():
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else 640
+    height = int(sys.argv[2]) if len(sys.argv) > 2 else 360
+    count = int(sys.argv[3]) if len(sys.argv) > 3 else 600
+
+    config = AppConfig.get().camera.motion_capturing
+    threshold = config.frame_change_ratio_threshold
+    scene = MockScene.default()
+    frames = [scene.render_luminance(i, width, height) for i in range(count)]
+    visible = [any(True for _ in scene.object_boxes(i, width, height)) for i in range(count)]
+
+    pipeline = create_detection_pipeline(config).resize((width, height)).reset()
+    true_pos = false_pos = false_neg = 0
+    start = time.perf_counter()
+    for i, frame in enumerate(frames):
+        ratio = pipeline.score(frame, threshold)
+        if ratio is None:
+            continue
+        detected = ratio >= threshold
+        expected = visible[i] or visible[i - 1]
+        true_pos += detected and expected
+        false_pos += detected and not expected
+        false_neg += expected and not detected
+    elapsed = time.perf_counter() - start
+    pipeline.close()
+
+    precision = true_pos / max(true_pos + false_pos, 1)
+    recall = true_pos / max(true_pos + false_neg, 1)
+    print(f"resolution: {width}x{height}, frames: {count}, "
+          f"engine: {config.motion_detection_engine}, threshold: {threshold}")
+    print(f"throughput: {count / elapsed:7.1f} frames/s")
+    print(f"precision: {precision:.3f}, recall: {recall:.3f} "
+          f"(tp {true_pos}, fp {false_pos}, fn {false_neg})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Benchmark of tiled motion detection throughput with 1 to 4 pool workers.
+
+Use: python -m benchmarks.bench_tiled_detection [width] [height]
+"""
+import os
+import sys
+
+from benchmarks.bench_motion_detection import N_FRAMES, synthetic_frames, measure
+from securypi_app.peripherals.camera.motion_detectors.frame_difference_detector import (
+    FrameDifferenceDetector
+)
+from securypi_app.peripherals.camera.motion_detectors.background_model_detector import (
+    BackgroundModelDetector
+)
+from securypi_app.peripherals.camera.motion_detectors.tiled_detector import TiledDetector
+
+
+def main():
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else 1280
+    height = int(sys.argv[2]) if len(sys.argv) > 2 else 720
+    frames = synthetic_frames(width, height, N_FRAMES)
+
+    print(f"resolution: {width}x{height}, frames: {N_FRAMES}, cpus: {os.cpu_count()}")
+    for engine in (FrameDifferenceDetector, BackgroundModelDetector):
+        single_ms = measure(engine().resize((width, height)).score, frames)
+        print(f"{engine.__name__}, no tiles: {1000 / single_ms:7.1f} frames/s")
+
+        for workers in range(1, 5):
+            detector = TiledDetector(engine, tiles=workers).resize((width, height))
+            tiled_ms = measure(detector.score, frames)
+            detector.close()
+            print(f"{engine.__name__}, {workers} workers: {1000 / tiled_ms:7.1f} frames/s "
+                  f"({single_ms / tiled_ms:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark of web request latency while motion detection runs at full rate.
+
+A threaded werkzeug server answers small JSON requests, a client measures
+their round-trip times while the detection pipeline scores lores frames
+back to back: not at all, in a thread of the server process
+and in a DetectionWorker process.
+
+Use: python -m benchmarks.bench_web_latency [width] [height] [seconds]
+"""
+import sys
+import time
+import logging
+import http.client
+from threading import Thread, Event
+
+import numpy as np
+from flask import Flask, jsonify
+from werkzeug.serving import make_server
+
+from benchmarks.bench_motion_detection import synthetic_frames
+from securypi_app.models.app_config import MotionCaptureConfig
+from securypi_app.peripherals.camera.motion_detectors.detection_pipeline import (
+    create_detection_pipeline
+)
+from securypi_app.peripherals.camera.motion_detectors.detection_worker import (
+    DetectionWorker
+)
+
+THRESHOLD = 0.01
+
+
+def create_server():
+    app = Flask(__name__)
+
+    @app.route("/status")
+    def status():
+        # a bit of Python work, like a rendered page
+        readings = {f"sensor_{i}": i * 0.5 for i in range(200)}
+        return jsonify(sorted(readings.items()))
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # no access log
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_detection(pipeline, frames, stop_event, counter):
+    """ Score frames back to back until stopped. """
+    while not stop_event.is_set():
+        for frame in frames:
+            pipeline.score(frame, THRESHOLD)
+            counter[0] += 1
+
+
+def measure_latency(port, seconds):
+    """ Return request latencies in milliseconds. """
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    latencies = []
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        conn.request("GET", "/status")
+        conn.getresponse().read()
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.005)
+    conn.close()
+    return np.array(latencies)
+
+
+def run_case(name, pipeline, frames, port, seconds):
+    stop_event = Event()
+    counter = [0]
+    thread = None
+    if pipeline is not None:
+        thread = Thread(target=run_detection,
+                        args=(pipeline, frames, stop_event, counter), daemon=True)
+        thread.start()
+
+    latencies = measure_latency(port, seconds)
+    stop_event.set()
+    if thread is not None:
+        thread.join()
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    print(f"{name:<22} p50 {p50:6.2f} ms   p95 {p95:6.2f} ms   p99 {p99:6.2f} ms   "
+          f"detection {counter[0] / seconds:6.1f} fps")
+
+
+def main():
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else 1280
+    height = int(sys.argv[2]) if len(sys.argv) > 2 else 720
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 5.0
+    frames = synthetic_frames(width, height, 30)
+    config = MotionCaptureConfig(capture_motion_in_background=True,
+                                 motion_detection_framerate=30,
+                                 min_motion_capture_length_sec=5,
+                                 max_motion_capture_length_sec=60,
+                                 frame_change_ratio_threshold=THRESHOLD,
+                                 motion_captures_window_size_gb=1.0,
+                                 motion_detection_engine="background_model",
+                                 blob_filter=True)
+
+    server = create_server()
+    print(f"resolution: {width}x{height}, {seconds:.0f} s per case")
+
+    run_case("no detection", None, frames, server.port, seconds)
+
+    pipeline = create_detection_pipeline(config).resize((width, height))
+    run_case("detection thread", pipeline, frames, server.port, seconds)
+
+    worker = DetectionWorker(config).resize((width, height))
+    try:
+        worker.score(frames[0], THRESHOLD)  # wait for the worker to start
+        run_case("detection process", worker, frames, server.port, seconds)
+    finally:
+        worker.close()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -66,4 +66,8 @@ def create_app(test_config=None):
     from .models.init_db import register_cli_commands
     register_cli_commands(app)
 
+    # optional asyncio MJPEG server next to the WSGI app
+    from .services.stream_server import init_stream_server
+    init_stream_server(app)
+
     return app
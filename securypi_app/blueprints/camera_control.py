@@ -1,8 +1,12 @@
 import logging
 
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import (
+    Blueprint, render_template, redirect, url_for, flash, request, jsonify
+)
 
-from securypi_app.services.auth import login_required, is_logged_in_admin
+from securypi_app.services.auth import (
+    login_required, is_logged_in_admin, api_admin_rights_required
+)
 from securypi_app.services.camera_control import (
     get_motion_capturing_config, get_recording_config, get_streaming_config,
     update_motion_capturing_config, update_recording_config,
@@ -102,6 +106,20 @@ def stop_motion_capturing():
     return redirect(url_for("camera_control.index"))
 
 
+@bp.route("/motion_telemetry")
+@api_admin_rights_required
+def motion_telemetry():
+    """
+    Recent motion detection scores for threshold tuning.
+    Query: 'points' - history length (1 - 1000, default 200).
+    """
+    points = request.args.get("points", 200, type=int)
+    points = min(max(points, 1), 1000)
+
+    camera = MyPicamera2.get_instance()
+    return jsonify(camera.motion_capturing.get_motion_telemetry(points))
+
+
 def handle_form_action(form):
     """ Recieve and handle form data. Refreshes page and flashes result. """
     action = form["action"]
@@ -1,17 +1,31 @@
 import logging
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
 
 from flask import (
-    Response, Blueprint, render_template, request, url_for, jsonify
+    Response, Blueprint, render_template, request, url_for, jsonify, current_app,
+    send_from_directory, abort
 )
 
 from securypi_app.services.auth import login_required, api_login_required
 
 from securypi_app.peripherals.camera.mycam import MyPicamera2
 from securypi_app.peripherals.measurements.weather_station import WeatherStation
+from securypi_app.models.app_config import AppConfig
+from securypi_app.peripherals.camera.streaming import HLS_PLAYLIST
+from securypi_app.services.snapshots import get_snapshot, get_snapshot_jpeg
+from securypi_app.services.stream_server import STREAM_PATH
 
 logger = logging.getLogger(__name__)
 
 MEASUREMENTS_REFRESH_SEC = 30
+HLS_START_TIMEOUT_SEC = 10  # first segment after starting the encoder
+
+HLS_MIMETYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".mp4": "video/mp4",
+    ".m4s": "video/iso.segment",
+}
 
 
 ### Globals ###
@@ -24,28 +38,92 @@ def video_feed():
     """ Route returns mjpeg stream - continuous img stream. """
     try:
         camera = MyPicamera2.get_instance()
-        streaming_output = camera.streaming.start_capture_stream()
-        
-        return Response(streaming_output.generate_frames(),
+        camera.streaming.start_capture_stream()
+
+        return Response(camera.streaming.generate_frames(),
                         mimetype="multipart/x-mixed-replace; boundary=frame")
     except Exception as e:
         logger.error("Error during startup of mjpeg stream: %s", e)
         return Response(status=500)
 
 
+@bp.route("/live/<path:filename>")
+@api_login_required
+def live_segments(filename):
+    """
+    HLS live mode: playlist and fMP4 segments.
+    Requesting the playlist starts or keeps alive the segmenting encoder.
+    """
+    camera = MyPicamera2.get_instance()
+    mimetype = HLS_MIMETYPES.get("." + filename.rsplit(".", 1)[-1])
+    if mimetype is None:
+        abort(404)
+
+    if filename == HLS_PLAYLIST:
+        try:
+            live_dir = camera.streaming.start_live_segments()
+        except Exception as e:
+            logger.error("Error during startup of HLS live mode: %s", e)
+            return Response(status=500)
+        if not camera.streaming.wait_live_playlist(HLS_START_TIMEOUT_SEC):
+            return Response(status=503, headers={"Retry-After": "1"})
+        # rewritten with every segment
+        return send_from_directory(live_dir, filename, mimetype=mimetype, max_age=0)
+
+    # segment names are never reused while segmenting runs
+    return send_from_directory(camera.streaming.get_live_dir(), filename,
+                               mimetype=mimetype, max_age=60)
+
+
+def async_stream_url() -> str | None:
+    """
+    URL of the asyncio MJPEG server on this host, None if not running.
+    The server speaks plain http only, browsers block it on https pages
+    (mixed content), these use the WSGI stream instead, as do clients
+    the server's bind address does not serve.
+    """
+    server = current_app.extensions.get("stream_server")
+    if server is None or request.is_secure:
+        return None
+    host = urlsplit(request.host_url).hostname or "localhost"
+    if not server.is_reachable_from(host):
+        return None
+    if ":" in host:
+        host = f"[{host}]"  # IPv6
+    return f"http://{host}:{server.port}{STREAM_PATH}"
+
+
 @bp.route("/picture.jpg")
 @api_login_required
 def picture_feed():
-    """ Route returns single jpeg snapshot. """
+    """
+    Route returns single jpeg snapshot,
+    304 if the client has the same one (ETag / Last-Modified).
+    Optional 'width' (px, never enlarged) and 'quality' (1 - 95) parameters.
+    """
+    width = request.args.get("width", type=int)
+    quality = request.args.get("quality", type=int)
+    if width is not None and width <= 0:
+        return jsonify({"error": "width must be a positive integer"}), 400
+    if quality is not None and not 1 <= quality <= 95:
+        return jsonify({"error": "quality must be an integer between 1 and 95"}), 400
+
     try:
         camera = MyPicamera2.get_instance()
-        jpeg_data = camera.capture_picture()
-        return Response(jpeg_data, mimetype="image/jpeg")
+        snapshot = get_snapshot(camera)
+        jpeg, etag = get_snapshot_jpeg(snapshot, width, quality)
     
     except Exception as e:
         logger.error("Error capturing picture: %s", e)
         return Response(status=500)
 
+    response = Response(jpeg, mimetype="image/jpeg")
+    response.set_etag(etag)
+    response.last_modified = datetime.fromtimestamp(snapshot.timestamp, timezone.utc)
+    response.cache_control.no_cache = True  # always revalidate
+    response.cache_control.private = True
+    return response.make_conditional(request)
+
 
 @bp.route("/current_measurements")
 @api_login_required
@@ -72,8 +150,11 @@ def index():
     mode = request.args.get("mode", "picture")
 
     # determine the template and URL for the <img> tag based on the mode
+    live_playlist_src = None
     if mode == "stream":
-        camera_feed_src = url_for("overview.video_feed")
+        camera_feed_src = async_stream_url() or url_for("overview.video_feed")
+        if AppConfig.get().camera.streaming.live_mode == "hls":
+            live_playlist_src = url_for("overview.live_segments", filename=HLS_PLAYLIST)
     else:  # Default is "picture"
         camera_feed_src = url_for("overview.picture_feed")
 
@@ -81,6 +162,7 @@ def index():
         "overview/index.html",
         mode=mode,
         camera_feed_src=camera_feed_src,
+        live_playlist_src=live_playlist_src,
         measurements=measurements,
         measurements_refresh_sec=measurements_refresh_sec
     )
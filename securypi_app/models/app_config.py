@@ -1,7 +1,7 @@
 import json
 import logging
 import os
-from typing import ClassVar, Tuple, Optional
+from typing import ClassVar, Tuple, List, Optional, Literal
 from pydantic import BaseModel, Field
 from pathlib import Path
 from threading import Lock
@@ -13,7 +13,15 @@ from threading import Lock
 class StreamingConfig(BaseModel):
     resolution: Tuple[int, int]  # Enforces exactly two integers: [width, height]
     framerate: int = Field(gt=0) # > 0
-    timeout_seconds: int
+    viewer_grace_seconds: int = Field(default=5, ge=0) # keep encoder after the last viewer left
+    adaptive_tiers: bool = True  # smaller frames for clients on slow links
+    async_server_host: str = "localhost" # "0.0.0.0" to serve viewers on other hosts
+    async_server_port: int = Field(default=0, ge=0, le=65535) # asyncio MJPEG server, 0 = off
+    live_mode: Literal["mjpeg", "hls"] = "mjpeg"
+    hls_dir: str = "/dev/shm" # existing tmpfs directory, segments never touch the SD card
+    hls_segment_seconds: int = Field(default=2, gt=0)
+    hls_window_segments: int = Field(default=5, ge=2)  # segments listed in the playlist
+    hls_bitrate: int = Field(default=1500000, gt=0)
     description: Optional[str] = None
 
 class RecordingConfig(BaseModel):
@@ -21,6 +29,13 @@ class RecordingConfig(BaseModel):
     framerate: int
     description: Optional[str] = None
 
+class MotionZoneConfig(BaseModel):
+    """ Polygon of normalized [x, y] vertices (0.0 - 1.0) with own threshold. """
+    name: str
+    polygon: List[Tuple[float, float]] = Field(min_length=3)
+    frame_change_ratio_threshold: float = Field(gt=0.0, le=1.0) # 0.0 < x <= 1.0
+    description: Optional[str] = None
+
 class MotionCaptureConfig(BaseModel):
     """ Appears in 'camera' and 'mock_camera'. """
     capture_motion_in_background: bool
@@ -29,6 +44,36 @@ class MotionCaptureConfig(BaseModel):
     max_motion_capture_length_sec: int
     frame_change_ratio_threshold: float = Field(ge=0.0, le=1.0) # 0.0 <= x= < 1.0
     motion_captures_window_size_gb: float = Field(gt=0.0) # > 0.0
+    pre_roll_seconds: int = Field(default=0, ge=0) # >= 0, 0 = disabled
+    # adaptive detection rate: idle_detection_framerate ... motion_detection_framerate
+    adaptive_detection_rate: bool = False
+    idle_detection_framerate: float = Field(default=2.0, gt=0.0) # > 0.0
+    adaptive_ramp_fraction: float = Field(default=0.5, gt=0.0, le=1.0) # of threshold
+    adaptive_cooldown_sec: float = Field(default=10.0, ge=0.0) # >= 0.0
+    # detection engine
+    motion_detection_engine: Literal["frame_difference", "background_model"] = "frame_difference"
+    background_learning_rate: float = Field(default=0.02, gt=0.0, le=1.0) # 0.0 < x <= 1.0
+    suppress_illumination_changes: bool = True # ignore global brightness shifts
+    detect_in_subprocess: bool = False # run detection outside of the web server process
+    # coarse pre-detection on every n-th pixel (1 = disabled), full frame is scored
+    # only if the coarse ratio reaches coarse_exit_fraction of the threshold,
+    # not used by the background_model engine, its model learns from every frame
+    coarse_decimation: int = Field(default=4, ge=1)
+    coarse_exit_fraction: float = Field(default=0.5, gt=0.0, le=1.0)
+    detection_workers: int = Field(default=1, ge=1) # > 1: horizontal tiles on a thread pool
+    telemetry_capacity: int = Field(default=3600, ge=1) # detection samples kept in memory
+    # automatic threshold: multiplier * quantile of quiet ratios, within min - max
+    auto_threshold: bool = False
+    auto_threshold_quantile: float = Field(default=0.95, gt=0.0, lt=1.0)
+    auto_threshold_multiplier: float = Field(default=3.0, gt=0.0)
+    auto_threshold_min: float = Field(default=0.0003, ge=0.0, le=1.0)
+    auto_threshold_max: float = Field(default=0.01, ge=0.0, le=1.0)
+    # regions of interest, empty = whole frame with frame_change_ratio_threshold
+    zones: List[MotionZoneConfig] = Field(default_factory=list)
+    # connected-component filtering, ratio is then the area of the largest blob
+    blob_filter: bool = False
+    blob_downsample: int = Field(default=4, ge=1) # labelling every n-th pixel
+    min_blob_area_ratio: float = Field(default=0.0002, ge=0.0, le=1.0)
     description: Optional[str] = None
 
 # - measurements -
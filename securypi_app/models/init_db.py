@@ -1,8 +1,11 @@
 import click
+import numpy as np   # pyright: ignore[reportMissingImports]
 from flask import current_app
 
 from . import db
 from .user import User
+from .app_config import AppConfig
+from securypi_app.services.motion_replay import load_frames, replay
 from securypi_app.services.string_parsing import (
     validate_str_username, validate_str_password,
     generate_random_password_formatted, generate_random_password
@@ -94,3 +97,51 @@ def register_cli_commands(app):
         
         _, message = User.register(username, password, is_admin)
         click.echo(message)
+
+    @app.cli.command("replay-motion")
+    @click.argument("path", type=click.Path(exists=True))
+    @click.option("--fps", type=float, default=None,
+                  help="Framerate of image directories and .npz without timestamps.")
+    @click.option("--size", default=None,
+                  help="Resize frames to WIDTHxHEIGHT, e.g. the lores resolution.")
+    @click.option("--threshold", type=float, default=None,
+                  help="Override frame change ratio threshold.")
+    @click.option("--rate", type=float, default=None,
+                  help="Scored frames per second, default the motion detection framerate.")
+    def replay_motion_command(path, fps, size, threshold, rate):
+        """
+        CLI command to replay frames through the motion detector
+        with the current configuration, faster than real time.
+        PATH: directory of images, .npz stack or video (e.g. a motion capture).
+        Use: flask --app securypi_app replay-motion [path]
+                [--fps 4] [--size 640x360] [--threshold 0.0011] [--rate 4]
+        """
+        config = AppConfig.get().camera.motion_capturing.model_copy(deep=True)
+        if threshold is not None:
+            config.frame_change_ratio_threshold = threshold
+        framerate = fps or config.motion_detection_framerate
+
+        resolution = None
+        if size is not None:
+            try:
+                width, height = (int(n) for n in size.lower().split("x"))
+                resolution = (width, height)
+            except ValueError:
+                return click.echo(f"Invalid size '{size}', use WIDTHxHEIGHT.")
+
+        try:
+            result = replay(load_frames(path, framerate, resolution), config, rate)
+        except RuntimeError as e:
+            return click.echo(str(e))
+
+        if result.frames == 0:
+            return click.echo("No frames to replay.")
+
+        p50, p95 = np.percentile(result.latencies * 1000, [50, 95])
+        click.echo(f"frames: {result.frames}, scoring: {result.fps:.1f} frames/s")
+        click.echo(f"latency: mean {result.latencies.mean() * 1000:.2f} ms, "
+                   f"p50 {p50:.2f} ms, p95 {p95:.2f} ms, "
+                   f"max {result.latencies.max() * 1000:.2f} ms")
+        click.echo(f"triggers: {len(result.triggers)}")
+        for t in result.triggers:
+            click.echo(f"  {t:9.2f} s")
@@ -0,0 +1,159 @@
+"""
+Frame bus of the lores stream.
+
+One capture thread publishes each lores luminance frame once into
+a small ring of reusable buffers, tagged with a sequence number.
+Consumers wait for the newest frame and read it without copying,
+stale frames are skipped, the camera never waits for consumers.
+"""
+import logging
+import time
+from threading import Thread, Condition, Event
+from typing import Callable
+
+import numpy as np   # pyright: ignore[reportMissingImports]
+
+
+logger = logging.getLogger(__name__)
+
+
+class FrameBus:
+    """
+    Ring of 'slots' luminance buffers filled by one capture thread.
+    The thread runs while at least one consumer is subscribed,
+    at the highest rate requested by the consumers.
+
+    A frame stays valid until the producer wraps around the ring,
+    consumers slower than 'slots' frames check it with 'is_valid'.
+    """
+
+    def __init__(self, capture: Callable[[], np.ndarray], slots: int = 4):
+        """
+        - 'capture': blocking call returning the next 2D uint8 frame
+          (a view is enough, it is copied into the ring)
+        - 'slots': ring size
+        """
+        self._capture = capture
+        self._slots = slots
+
+        self._ring: np.ndarray | None = None
+        self._views: list[np.ndarray] = []    # read-only view per slot
+        self._seq = 0                         # sequence number of the newest frame
+        self._timestamp = 0.0                 # time.time() of the newest frame
+        self._condition = Condition()
+
+        self._rates: dict[str, float] = {}    # consumer -> max frames per second
+        self._thread: Thread | None = None
+        self._stop_event = Event()
+
+    # consumers
+    def subscribe(self, consumer: str, max_rate: float):
+        """ Register 'consumer' reading at most 'max_rate' frames per second. """
+        with self._condition:
+            self._rates[consumer] = max_rate
+            if self._thread is None:
+                self._start()
+
+    def unsubscribe(self, consumer: str):
+        with self._condition:
+            self._rates.pop(consumer, None)
+            last = not self._rates
+        if last:
+            self._stop()
+
+    def is_running(self) -> bool:
+        return self._thread is not None
+
+    def get_sequence(self) -> int:
+        """ Sequence number of the newest frame, 0 before the first one. """
+        return self._seq
+
+    def wait_next(self,
+                  after_seq: int,
+                  timeout: float | None = None) -> tuple[int, np.ndarray] | None:
+        """
+        Return (sequence number, read-only frame) of the newest frame
+        newer than 'after_seq', frames in between are skipped.
+        None if there is none in 'timeout' seconds or the bus stopped.
+        """
+        with self._condition:
+            if not self._condition.wait_for(
+                lambda: self._seq > after_seq or self._thread is None, timeout
+            ):
+                return None
+            if self._seq <= after_seq:
+                return None
+            return self._seq, self._views[self._seq % self._slots]
+
+    def latest(self) -> tuple[int, float, np.ndarray] | None:
+        """ (sequence number, timestamp, read-only frame) of the newest frame. """
+        with self._condition:
+            if self._seq == 0:
+                return None
+            return self._seq, self._timestamp, self._views[self._seq % self._slots]
+
+    def is_valid(self, seq: int) -> bool:
+        """ Frame 'seq' was not overwritten yet. """
+        return self._seq - seq < self._slots
+
+    # producer
+    def _start(self):
+        self._stop_event.clear()
+        self._thread = Thread(target=self._run, name="frame-bus", daemon=True)
+        self._thread.start()
+        logger.info("Frame bus started.")
+
+    def _stop(self):
+        thread = self._thread
+        if thread is None:
+            return
+        self._stop_event.set()
+        thread.join(timeout=2.0)
+        with self._condition:
+            self._thread = None
+            self._condition.notify_all()  # release waiting consumers
+            # a consumer subscribed while stopping
+            if self._rates:
+                self._start()
+                return
+        logger.info("Frame bus stopped.")
+
+    def _publish(self, frame: np.ndarray):
+        """ Copy 'frame' into the next slot and announce it. """
+        if self._ring is None or self._ring.shape[1:] != frame.shape:
+            # first frame or reconfigured stream, consumers keep the old buffers
+            ring = np.empty((self._slots,) + frame.shape, dtype=np.uint8)
+            views = []
+            for slot in ring:
+                view = slot.view()
+                view.flags.writeable = False
+                views.append(view)
+            with self._condition:
+                self._ring, self._views = ring, views
+
+        seq = self._seq + 1
+        np.copyto(self._ring[seq % self._slots], frame)
+        with self._condition:
+            self._seq = seq
+            self._timestamp = time.time()
+            self._condition.notify_all()
+
+    def _run(self):
+        next_capture = time.monotonic()
+        while not self._stop_event.is_set():
+            with self._condition:
+                max_rate = max(self._rates.values(), default=1.0)
+
+            try:
+                self._publish(self._capture())
+            except Exception as e:
+                # e.g. camera stopped for reconfiguration
+                logger.warning("Frame bus capture failed: %s", e)
+                if self._stop_event.wait(timeout=0.5):
+                    break
+                continue
+
+            # pace to the fastest consumer, never catch up with bursts
+            next_capture = max(next_capture + 1 / max_rate, time.monotonic())
+            if self._stop_event.wait(timeout=next_capture - time.monotonic()):
+                break
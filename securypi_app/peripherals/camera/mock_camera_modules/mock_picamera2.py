@@ -3,30 +3,115 @@ import random
 import numpy as np
 from threading import Thread, Event
 from io import BytesIO
+from pathlib import Path
 
 from PIL import Image
 
+from securypi_app.peripherals.camera.mock_camera_modules.mock_scene import MockScene
+
 logger = logging.getLogger(__name__)
 
 
-class MockStreamingOutput:
+class MockOutput:
+    """ Mocking picamera2 Output base class. """
+    def __init__(self, pts=None):
+        self.recording = False
+
+    def _add_stream(self, encoder_stream, codec_name, **kwargs):
+        pass
+
+    def start(self):
+        self.recording = True
+
+    def stop(self):
+        self.recording = False
+
+    def outputframe(self, frame, keyframe=True, timestamp=None, packet=None, audio=False):
+        pass
+
+
+class MockStreamingOutput(MockOutput):
     def __init__(self, output=None):
+        super().__init__()
         self.output = output
 
-    def write(self, data):
-        if self.output:
-            self.output.write(data)
+    def outputframe(self, frame, keyframe=True, timestamp=None, packet=None, audio=False):
+        if self.output and self.recording:
+            self.output.write(frame)
 
 
-class MockPyavOutput():
+class MockPyavOutput(MockOutput):
     def __init__(self, output=None):
+        super().__init__()
         self.output = output
 
-    def write(self, data):
-        if self.output:
+    def outputframe(self, frame, keyframe=True, timestamp=None, packet=None, audio=False):
+        if self.output and self.recording:
             with open(file=self.output, mode="w") as f:
                 f.write("Mocking recording to a video output.")
 
+
+class MockFfmpegOutput(MockOutput):
+    """
+    Mocking ffmpeg HLS output: every frame becomes one segment file
+    of a sliding playlist window, files as the hls muxer names them.
+    """
+    def __init__(self, output_filename, audio=False):
+        super().__init__()
+        args = output_filename.split()
+        self.playlist = Path(args[-1])
+        self.segment_pattern = args[args.index("-hls_segment_filename") + 1]
+        self.init_filename = args[args.index("-hls_fmp4_init_filename") + 1]
+        self.window = int(args[args.index("-hls_list_size") + 1])
+        self.segment_seconds = int(args[args.index("-hls_time") + 1])
+        self._sequence = 0
+
+    def outputframe(self, frame, keyframe=True, timestamp=None, packet=None, audio=False):
+        if not self.recording:
+            return
+        folder = self.playlist.parent
+        (folder / self.init_filename).write_bytes(b"mock init segment")
+        Path(self.segment_pattern % self._sequence).write_bytes(frame)
+        stale = Path(self.segment_pattern % (self._sequence - self.window))
+        stale.unlink(missing_ok=True)
+
+        first = max(self._sequence - self.window + 1, 0)
+        lines = ["#EXTM3U", "#EXT-X-VERSION:7",
+                 f"#EXT-X-TARGETDURATION:{self.segment_seconds}",
+                 f"#EXT-X-MEDIA-SEQUENCE:{first}",
+                 f'#EXT-X-MAP:URI="{self.init_filename}"']
+        for sequence in range(first, self._sequence + 1):
+            lines.append(f"#EXTINF:{self.segment_seconds:.3f},")
+            lines.append(Path(self.segment_pattern % sequence).name)
+        temporary = self.playlist.with_suffix(".tmp")
+        temporary.write_text("\n".join(lines) + "\n")
+        temporary.replace(self.playlist)
+        self._sequence += 1
+
+
+class MockCircularOutput2(MockOutput):
+    """ Mocking in-memory circular buffer output with attachable output. """
+    def __init__(self, pts=None, buffer_duration_ms=5000):
+        super().__init__()
+        self.buffer_duration_ms = buffer_duration_ms
+        self._output = None
+
+    def open_output(self, output):
+        if self._output:
+            raise RuntimeError("Underlying output still open")
+        self._output = output
+        self._output.start()
+
+    def close_output(self):
+        if not self._output:
+            raise RuntimeError("No output open")
+        self._output.stop()
+        self._output = None
+
+    def outputframe(self, frame, keyframe=True, timestamp=None, packet=None, audio=False):
+        if self._output:
+            self._output.outputframe(frame, keyframe, timestamp, packet, audio)
+
 # mocking controls.draft.NoiseReductionModeEnum
 
 
@@ -65,8 +150,9 @@ class MockEncoder:
 class MockStreamConfig:
     """ Mocking object oriented camera configuration. """
 
-    def __init__(self, size=None):
+    def __init__(self, size=None, format=None):
         self.size = size
+        self.format = format
 
 
 class MockSensorConfig:
@@ -81,13 +167,13 @@ class MockVideoConfiguration:
     """ Mocking object oriented camera configuration. """
 
     def __init__(self):
-        self.main = MockStreamConfig((1920, 1080))
+        self.main = MockStreamConfig((1920, 1080), "XBGR8888")
         self.lores = None
         self.sensor = MockSensorConfig((2304, 1296))
 
     def enable_lores(self):
         if self.lores is None:
-            self.lores = MockStreamConfig()
+            self.lores = MockStreamConfig(format="YUV420")
 
 
 class MockPicamera2:
@@ -95,9 +181,6 @@ class MockPicamera2:
     Mocking Picamera2 library for the purpouses of
     working with mycam module (MyPicamera2).
     """
-    _mock_encoder_thread = None
-    _mock_encoder_stop_event = Event()
-
     # mocked sensor modes of RPI Camera Module 3 Wide
     sensor_modes = [
         {'format': "SRGGB10_CSI2P",
@@ -130,6 +213,11 @@ class MockPicamera2:
         self.started = False
         self.video_configuration = MockVideoConfiguration()
         self.new_frame_interval_seconds = 2  # new fake frame every n seconds
+        # running fake encoders: id(encoder) -> (thread, stop_event)
+        self._mock_encoder_threads = {}
+        # synthetic scene of the lores stream, next frame index
+        self.scene = MockScene.default()
+        self.scene_frame_index = 0
 
     def configure(self, config):
         logger.debug("[MockPicamera2] Configured with: %s", config)
@@ -142,6 +230,9 @@ class MockPicamera2:
         """ Continuously generate fake frames """
         logger.debug("[MockPicamera2] Simulating video recording to %s using %s on stream '%s' with quality '%s'.", output, encoder, name, quality)
 
+        stop_event = Event()
+        output.start()
+
         def frame_generator():
             while True:
                 img = self.create_random_color_image(640, 360, brightness=0.5)
@@ -149,30 +240,32 @@ class MockPicamera2:
                 img.save(buffer, format="JPEG")
                 jpeg_bytes = buffer.getvalue()
 
-                output.write(jpeg_bytes)
-                if self._mock_encoder_stop_event.wait(
-                    timeout=self.new_frame_interval_seconds
-                ):
+                output.outputframe(jpeg_bytes, keyframe=True)
+                if stop_event.wait(timeout=self.new_frame_interval_seconds):
                     logger.debug("Mock encoder exited cleanly.")
                     break
 
-        self._mock_encoder_stop_event.clear()  # clear stop signal
-
-        self._mock_encoder_thread = Thread(target=frame_generator, daemon=True)
-        self._mock_encoder_thread.start()
+        thread = Thread(target=frame_generator, daemon=True)
+        self._mock_encoder_threads[id(encoder)] = (thread, stop_event, output)
+        thread.start()
 
     def start_recording(self, encoder, output, name="main"):
         self.start_encoder(self, encoder, output, name)
         self.start()
 
     def stop_encoder(self, recording_encoder="<default mock encoder"):
+        """ Stop given encoder, or all running encoders if not started. """
         logger.debug("[MockPicamera2] Stopping encoder %s.", recording_encoder)
-        self._mock_encoder_stop_event.set()  # signal stop
-        if self._mock_encoder_thread is not None:
-            self._mock_encoder_thread.join(timeout=2.0)
-        self._mock_encoder_stop_event.clear()  # clear stop signal
+        if id(recording_encoder) in self._mock_encoder_threads:
+            keys = [id(recording_encoder)]
+        else:
+            keys = list(self._mock_encoder_threads)
 
-        self._mock_encoder_thread = None
+        for key in keys:
+            thread, stop_event, output = self._mock_encoder_threads.pop(key)
+            stop_event.set()  # signal stop
+            thread.join(timeout=2.0)
+            output.stop()
 
     def stop_recording(self):
         self.stop()
@@ -185,8 +278,30 @@ class MockPicamera2:
         img = self.create_random_color_image(640, 360, brightness=0.5)
         img.save(stream, format=format)
     
+    def stream_configuration(self, name="main") -> dict:
+        """ Configuration of a stream, rows aligned to 64 bytes. """
+        stream_config = getattr(self.video_configuration, name)
+        width, height = stream_config.size
+        return {
+            "size": (width, height),
+            "format": stream_config.format,
+            "stride": (width + 63) // 64 * 64,
+        }
+
     def capture_buffer(self, stream) -> np.ndarray:
-        """ Return numpy array with fake single color image. """
+        """
+        Return numpy array with fake single color image.
+        'lores' stream returns the next frame of the synthetic scene
+        as flat YUV420 buffer with padded rows.
+        """
+        if stream == "lores":
+            stream_config = self.stream_configuration(stream)
+            width, height = stream_config["size"]
+            buffer = self.scene.render_yuv420(self.scene_frame_index, width, height,
+                                              stride=stream_config["stride"])
+            self.scene_frame_index += 1
+            return buffer
+
         img = self.create_random_color_image(640, 360, brightness=0.5)
         return np.asarray(img)
 
@@ -0,0 +1,169 @@
+"""
+Deterministic synthetic scene for the mock camera.
+
+Frames are fully defined by the scene seed and the frame index:
+textured background, sensor noise, objects moving along scripted
+trajectories and global lighting steps. Motion detection accuracy
+and throughput can be measured without camera hardware.
+"""
+from typing import NamedTuple
+
+import numpy as np
+from PIL import Image
+
+
+# precomputed noise frames per resolution, picked per frame index
+NOISE_BANK_SIZE = 16
+# frames of the default scene script, least common multiple of its cycles
+DEFAULT_PERIOD = 600
+
+
+class MovingObject(NamedTuple):
+    """
+    Rectangle moving along 'waypoints' (normalized x, y of its center),
+    one pass takes 'frames', then it starts over.
+    Visible in frames [start, end), end None = forever.
+    """
+    size: tuple[float, float]            # normalized width, height
+    waypoints: list[tuple[float, float]]
+    frames: int
+    luminance: int = 230
+    start: int = 0
+    end: int | None = None
+
+
+class LightingStep(NamedTuple):
+    """ Brightness 'offset' added to the whole frame from frame 'start' on. """
+    start: int
+    offset: int
+
+
+class MockScene:
+    """
+    Renders luminance or lores YUV420 frames of a scripted scene.
+    With 'period', objects and lighting repeat every 'period' frames.
+    """
+
+    def __init__(self,
+                 objects: list[MovingObject] | None = None,
+                 lighting_steps: list[LightingStep] | None = None,
+                 noise_sigma: float = 2.0,
+                 seed: int = 0,
+                 period: int | None = None):
+        self.objects = objects or []
+        self.lighting_steps = sorted(lighting_steps or [])
+        self.period = period
+        self._noise_sigma = noise_sigma
+        self._seed = seed
+        # (height, width) -> background / noise bank
+        self._backgrounds = {}
+        self._noise_banks = {}
+
+    @classmethod
+    def default(cls) -> "MockScene":
+        """
+        Scene of the mock camera: a person crossing the frame every 40 frames
+        for 20 frames, a car passing every 100 frames and a lighting step
+        every 150 frames, repeating forever.
+        """
+        objects = []
+        for cycle in range(0, DEFAULT_PERIOD, 40):
+            objects.append(MovingObject(size=(0.08, 0.35),
+                                        waypoints=[(0.1, 0.6), (0.9, 0.6)],
+                                        frames=20, luminance=40,
+                                        start=cycle + 20, end=cycle + 40))
+        for cycle in range(0, DEFAULT_PERIOD, 100):
+            objects.append(MovingObject(size=(0.3, 0.15),
+                                        waypoints=[(1.1, 0.85), (-0.1, 0.85)],
+                                        frames=15, luminance=220,
+                                        start=cycle + 70, end=cycle + 85))
+        lighting_steps = [LightingStep(start, 25 if (start // 150) % 2 else 0)
+                          for start in range(150, DEFAULT_PERIOD, 150)]
+        return cls(objects, lighting_steps, period=DEFAULT_PERIOD)
+
+    def background(self, width: int, height: int) -> np.ndarray:
+        """ Smooth texture (int16) of the static scene. """
+        if (height, width) not in self._backgrounds:
+            rng = np.random.default_rng(self._seed)
+            coarse = rng.integers(40, 200, (max(height // 8, 2), max(width // 8, 2)),
+                                  dtype=np.uint8)
+            texture = Image.fromarray(coarse).resize((width, height),
+                                                     Image.Resampling.BICUBIC)
+            self._backgrounds[(height, width)] = np.asarray(texture, dtype=np.int16)
+        return self._backgrounds[(height, width)]
+
+    def _noise(self, index: int, width: int, height: int) -> np.ndarray:
+        if (height, width) not in self._noise_banks:
+            rng = np.random.default_rng(self._seed + 1)
+            self._noise_banks[(height, width)] = np.round(
+                rng.normal(0.0, self._noise_sigma, (NOISE_BANK_SIZE, height, width))
+            ).astype(np.int16)
+        bank = self._noise_banks[(height, width)]
+        # deterministic, but not periodic in a way aligned with object paths
+        return bank[(index * 7 + index // NOISE_BANK_SIZE) % NOISE_BANK_SIZE]
+
+    def _script_index(self, index: int) -> int:
+        """ Frame index within the script. """
+        return index % self.period if self.period else index
+
+    def lighting_offset(self, index: int) -> int:
+        index = self._script_index(index)
+        offset = 0
+        for step in self.lighting_steps:
+            if step.start > index:
+                break
+            offset = step.offset
+        return offset
+
+    def object_boxes(self, index: int, width: int, height: int):
+        """ Yield (x0, y0, x1, y1, luminance) pixel boxes visible in frame 'index'. """
+        index = self._script_index(index)
+        for obj in self.objects:
+            if index < obj.start or (obj.end is not None and index >= obj.end):
+                continue
+            x, y = self._position(obj, index - obj.start)
+            w, h = obj.size
+            x0 = max(round((x - w / 2) * width), 0)
+            x1 = min(round((x + w / 2) * width), width)
+            y0 = max(round((y - h / 2) * height), 0)
+            y1 = min(round((y + h / 2) * height), height)
+            if x0 < x1 and y0 < y1:
+                yield x0, y0, x1, y1, obj.luminance
+
+    @staticmethod
+    def _position(obj: MovingObject, step: int) -> tuple[float, float]:
+        """ Linear interpolation along the waypoints. """
+        points = obj.waypoints
+        if len(points) == 1:
+            return points[0]
+        progress = (step % obj.frames) / obj.frames * (len(points) - 1)
+        i = min(int(progress), len(points) - 2)
+        t = progress - i
+        (x0, y0), (x1, y1) = points[i], points[i + 1]
+        return x0 + (x1 - x0) * t, y0 + (y1 - y0) * t
+
+    def render_luminance(self, index: int, width: int, height: int,
+                         out: np.ndarray | None = None) -> np.ndarray:
+        """ uint8 (height, width) luminance of frame 'index', into 'out' if given. """
+        frame = self.background(width, height) + self._noise(index, width, height)
+        frame += self.lighting_offset(index)
+        for x0, y0, x1, y1, luminance in self.object_boxes(index, width, height):
+            frame[y0:y1, x0:x1] = luminance + self._noise(index, width, height)[y0:y1, x0:x1]
+
+        if out is None:
+            out = np.empty((height, width), dtype=np.uint8)
+        np.clip(frame, 0, 255, out=frame)
+        np.copyto(out, frame, casting="unsafe")
+        return out
+
+    def render_yuv420(self, index: int, width: int, height: int,
+                      stride: int | None = None) -> np.ndarray:
+        """
+        Flat YUV420 buffer of frame 'index' as the lores stream delivers it:
+        Y plane rows padded to 'stride' bytes, neutral chroma planes.
+        """
+        stride = stride or width
+        buffer = np.full(stride * height * 3 // 2, 128, dtype=np.uint8)
+        y_plane = buffer[:stride * height].reshape(height, stride)
+        self.render_luminance(index, width, height, out=y_plane[:, :width])
+        return buffer
@@ -4,7 +4,6 @@ from threading import Thread, Event
 from pathlib import Path
 
 import numpy as np   # pyright: ignore[reportMissingImports]
-from scipy.ndimage import gaussian_filter   # pyright: ignore[reportMissingImports]
 
 from securypi_app.services.string_parsing import timed_filename
 from securypi_app.services.captures import (
@@ -14,12 +13,30 @@ from securypi_app.peripherals.camera.motion_capturing_interface import (
     MotionCapturingInterface
 )
 from securypi_app.peripherals.camera.mycam_interface import MyPicamera2Interface
+from securypi_app.peripherals.camera.motion_detectors.detection_rate import (
+    AdaptiveDetectionRate
+)
+from securypi_app.peripherals.camera.motion_detectors.detection_pipeline import (
+    DetectionPipeline, create_detection_pipeline
+)
+from securypi_app.peripherals.camera.motion_detectors.detection_worker import (
+    DetectionWorker
+)
+from securypi_app.peripherals.camera.motion_detectors.score_telemetry import (
+    ScoreTelemetry
+)
+from securypi_app.peripherals.camera.motion_detectors.threshold_calibration import (
+    ThresholdCalibrator
+)
 from securypi_app.models.app_config import AppConfig
 from securypi_app.services.notifications import notify_motion_capture
 
 
 logger = logging.getLogger(__name__)
 
+FRAME_BUS_CONSUMER = "motion_capturing"
+FRAME_TIMEOUT_SEC = 2.0
+
 
 class MotionCapturing(MotionCapturingInterface):
     """
@@ -34,6 +51,14 @@ class MotionCapturing(MotionCapturingInterface):
         self._capture_motion_in_background = False
         self._capturing_thread = None
         self._capturing_stop_event = Event()
+
+        # detection pipeline with preallocated workspace buffers,
+        # in this process or in a worker process
+        self._pipeline: DetectionPipeline | DetectionWorker | None = None
+
+        # ratios and latencies of recent detections, kept across restarts
+        capacity = AppConfig.get().camera.motion_capturing.telemetry_capacity
+        self._telemetry = ScoreTelemetry(capacity)
         self.apply_capturing_config()
 
     def apply_capturing_config(self):
@@ -51,13 +76,58 @@ class MotionCapturing(MotionCapturingInterface):
         self._min_recording_length = min_length
         self._max_recording_length = max_length
         self._window_size_gb = config.camera.motion_capturing.motion_captures_window_size_gb
+        self._pre_roll_seconds = config.camera.motion_capturing.pre_roll_seconds
+        self._adaptive_rate = config.camera.motion_capturing.adaptive_detection_rate
+        self._idle_detection_rate = config.camera.motion_capturing.idle_detection_framerate
+        self._adaptive_ramp_fraction = config.camera.motion_capturing.adaptive_ramp_fraction
+        self._adaptive_cooldown_sec = config.camera.motion_capturing.adaptive_cooldown_sec
+        self.init_threshold_calibration()
+        self.init_motion_detector()
 
         if capture:
             self.start()
 
+    def init_motion_detector(self):
+        """
+        Set detection pipeline selected in the configuration,
+        optionally running in a separate process.
+        """
+        config = AppConfig.get()
+        motion_config = config.camera.motion_capturing
+
+        # a running loop closes its pipeline when it exits
+        if motion_config.detect_in_subprocess:
+            self._pipeline = DetectionWorker(motion_config.model_copy(deep=True))
+        else:
+            self._pipeline = create_detection_pipeline(motion_config)
+
+    def init_threshold_calibration(self):
+        """ Set threshold calibrator, if automatic threshold is enabled. """
+        motion_config = AppConfig.get().camera.motion_capturing
+
+        self._calibrator = None
+        if motion_config.auto_threshold:
+            self._calibrator = ThresholdCalibrator(
+                quantile=motion_config.auto_threshold_quantile,
+                multiplier=motion_config.auto_threshold_multiplier,
+                min_threshold=motion_config.auto_threshold_min,
+                max_threshold=motion_config.auto_threshold_max
+            )
+
     def is_motion_capturing(self) -> bool:
         return self._capture_motion_in_background
 
+    def get_motion_box(self) -> tuple[float, float, float, float] | None:
+        if self._pipeline is None:
+            return None
+        return self._pipeline.motion_box
+
+    def get_motion_telemetry(self, points: int = 200) -> dict:
+        summary = self._telemetry.summary(points)
+        summary["threshold"] = self.get_change_ratio_threshold()
+        summary["effective_threshold"] = self.get_effective_threshold()
+        return summary
+
     # setters / getters
     def set_motion_capturing(self, set: bool):
         if self.is_motion_capturing() != set:
@@ -100,6 +170,11 @@ class MotionCapturing(MotionCapturingInterface):
             config.camera.motion_capturing.frame_change_ratio_threshold = threshold
             config.save()
 
+    def get_effective_threshold(self) -> float:
+        if self._calibrator is None:
+            return self._change_ratio_threshold
+        return self._calibrator.threshold(default=self._change_ratio_threshold)
+
     # recording length
     def get_min_recording_length(self) -> int:
         return self._min_recording_length
@@ -125,6 +200,21 @@ class MotionCapturing(MotionCapturingInterface):
             config.camera.motion_capturing.max_motion_capture_length_sec = seconds
             config.save()
 
+    def get_pre_roll_seconds(self) -> int:
+        return self._pre_roll_seconds
+
+    def set_pre_roll_seconds(self, seconds):
+        self._pre_roll_seconds = seconds
+
+        # update config:
+        config = AppConfig.get()
+        if config.camera.motion_capturing.pre_roll_seconds != seconds:
+            config.camera.motion_capturing.pre_roll_seconds = seconds
+            config.save()
+
+        if self.is_motion_capturing():
+            self.start()  # restarts with new pre-roll buffer
+
     def start(self):
         """
         Start background motion capturing.
@@ -159,12 +249,27 @@ class MotionCapturing(MotionCapturingInterface):
 
         filename = folder_path / timed_filename(".mp4")
         self._mycam.start_recording_to_file(filename)
-        logger.info("New motion detected: %.2f%% frame change ratio", ratio * 100)
+        logger.info("New motion detected: %.2f%% frame change ratio, box %s",
+                    ratio * 100, self.get_motion_box())
         try:
             notify_motion_capture(self._mycam._app)
         except Exception as e:
             logger.error("Motion capture notification error: %s", e)
 
+    def create_detection_rate(self) -> AdaptiveDetectionRate:
+        """
+        Detection rate scheduler, idle rate is used only
+        with adaptive detection rate enabled.
+        """
+        idle_rate = self._detection_rate
+        if self._adaptive_rate:
+            idle_rate = self._idle_detection_rate
+
+        return AdaptiveDetectionRate(idle_rate=idle_rate,
+                                     active_rate=self._detection_rate,
+                                     ramp_fraction=self._adaptive_ramp_fraction,
+                                     cooldown_sec=self._adaptive_cooldown_sec)
+
     def loop_motion_capturing(self, debug=False):
         """
         Detect motion in background and save output to:
@@ -175,66 +280,107 @@ class MotionCapturing(MotionCapturingInterface):
         - self._min_recording_length
         - self._max_recording_length
         - self._window_size_gb
+        - self._pre_roll_seconds
+        - self._calibrator (automatic threshold from the noise floor)
+        - self._adaptive_rate (idle / active detection rate)
         """
         w, h = self._mycam.get_current_resolution(target="lores")
+        # reallocates buffers only if the camera was reconfigured
+        pipeline = self._pipeline.resize((w, h)).reset()
 
         folder_path = motion_captures_path()
-        detection_timeout = 1 / self._detection_rate
+        detection_rate = self.create_detection_rate()
 
         last_detected: float = 0
         recording_start_time: float = 0
-        prev = None
         low_storage_exit = False
-        while True:
 
-            cur = self._mycam.capture_buffer(stream="lores")
-            cur = cur[:w * h].reshape(h, w)
-            cur = gaussian_filter(cur.astype(np.float32), sigma=1)  # smooth
-
-            if prev is not None:
-                # Measure pixels differences between current and
-                # previous frame
-                ratio = self.image_change_ratio(prev, cur)
-
-                # debug - empiric search for change ratio
-                if debug:
-                    logger.debug("Motion ratio: %.2f%%", ratio * 100)
-
-                # detect motion
-                if ratio >= self.get_change_ratio_threshold():
-                    if not has_enough_free_storage(folder_path):
-                        logger.warning("Not enough free storage (< 1 GB). Stopping motion capturing.")
-                        self._mycam.stop_recording_to_file()
-                        low_storage_exit = True
-                        break
-
-                    # start recording
-                    if not self._mycam.is_recording():
-                        self._on_new_motion_detected(folder_path, ratio)
-                        recording_start_time = time.time()
-                    # restart recording if it exceeds max length
-                    elif time.time() - recording_start_time > self._max_recording_length:
-                        self._mycam.stop_recording_to_file()
-                        file_path = str(folder_path / timed_filename(".mp4"))
-                        self._mycam.start_recording_to_file(file_path)
-                        recording_start_time = time.time()
-
-                    last_detected = time.time()
+        # lores frames come from the shared capture thread
+        frame_bus = self._mycam.get_frame_bus()
+        try:
+            # encoder runs all the time, recordings start with buffered seconds
+            if self._pre_roll_seconds > 0:
+                self._mycam.start_preroll_buffer(self._pre_roll_seconds)
+
+            # captures follow the adaptive rate, not the active one
+            subscribed_rate = detection_rate.get_rate()
+            frame_bus.subscribe(FRAME_BUS_CONSUMER, max_rate=subscribed_rate)
+            seq = frame_bus.get_sequence()
+
+            while True:
+
+                ratio = None
+                threshold = self.get_effective_threshold()
+                frame = frame_bus.wait_next(seq, timeout=FRAME_TIMEOUT_SEC)
+                if frame is None:
+                    logger.warning("No lores frame in %s s.", FRAME_TIMEOUT_SEC)
                 else:
-                    # Stop recording if no motion detected for
-                    # minimal recording length
-                    if self._mycam.is_recording() and (
-                        time.time() - last_detected > self.get_min_recording_length()
-                    ):
+                    seq, cur = frame
+
+                    # Measure ratio of changed pixels of the smoothed frame,
+                    # zone scores stay relative to the configured threshold
+                    detection_start = time.perf_counter()
+                    ratio = pipeline.score(cur, self.get_change_ratio_threshold(),
+                                           exit_threshold=threshold)
+                    if ratio is not None and not frame_bus.is_valid(seq):
+                        # the capture thread wrapped around the ring while scoring
+                        logger.warning("Lores frame overwritten during detection, skipped.")
+                        ratio = None
+                    if ratio is not None:
+                        self._telemetry.push(time.time(), ratio,
+                                             time.perf_counter() - detection_start)
+
+                        # debug - empiric search for change ratio
+                        if debug:
+                            logger.debug("Motion ratio: %.2f%%", ratio * 100)
+
+                        # detect motion
+                        if ratio >= threshold:
+                            if not has_enough_free_storage(folder_path):
+                                logger.warning("Not enough free storage (< 1 GB). Stopping motion capturing.")
+                                self._mycam.stop_recording_to_file()
+                                low_storage_exit = True
+                                break
+
+                            # start recording
+                            if not self._mycam.is_recording():
+                                self._on_new_motion_detected(folder_path, ratio)
+                                recording_start_time = time.time()
+                            # continue in a new segment if it exceeds max length
+                            elif time.time() - recording_start_time > self._max_recording_length:
+                                enforce_motion_captures_window(folder_path, self._window_size_gb)
+                                file_path = str(folder_path / timed_filename(".mp4"))
+                                self._mycam.split_recording_to_file(file_path)
+                                recording_start_time = time.time()
+
+                            last_detected = time.time()
+                        else:
+                            # quiet scene - track its noise floor
+                            if self._calibrator is not None and not self._mycam.is_recording():
+                                self._calibrator.update(ratio)
+
+                            # Stop recording if no motion detected for
+                            # minimal recording length
+                            if self._mycam.is_recording() and (
+                                time.time() - last_detected > self.get_min_recording_length()
+                            ):
+                                self._mycam.stop_recording_to_file()
+
+                detection_timeout = detection_rate.next_interval(
+                    ratio, threshold, self._mycam.is_recording()
+                )
+                if detection_rate.get_rate() != subscribed_rate:
+                    subscribed_rate = detection_rate.get_rate()
+                    frame_bus.subscribe(FRAME_BUS_CONSUMER, max_rate=subscribed_rate)
+                if self._capturing_stop_event.wait(timeout=detection_timeout):
+                    if self._mycam.is_recording():
                         self._mycam.stop_recording_to_file()
-
-            prev = cur
-
-            if self._capturing_stop_event.wait(timeout=detection_timeout):
-                if self._mycam.is_recording():
-                    self._mycam.stop_recording_to_file()
-                logger.info("Background MotionCapturing exited cleanly.")
-                break
+                    logger.info("Background MotionCapturing exited cleanly.")
+                    break
+        finally:
+            frame_bus.unsubscribe(FRAME_BUS_CONSUMER)
+            self._mycam.stop_preroll_buffer()
+            pipeline.close()
 
         if low_storage_exit:
             self._capture_motion_in_background = False
@@ -22,6 +22,23 @@ class MotionCapturingInterface(ABC):
         """ Set and start/stop background motion capturing. """
         pass
 
+    @abstractmethod
+    def get_motion_box(self) -> tuple[float, float, float, float] | None:
+        """
+        Bounding box (x0, y0, x1, y1) of the largest moving blob
+        in frame fractions (0.0 - 1.0) from the last detection,
+        None without motion or with blob filter disabled.
+        """
+        pass
+
+    @abstractmethod
+    def get_motion_telemetry(self, points: int = 200) -> dict:
+        """
+        Recent detection scores: history downsampled to 'points',
+        ratio and latency percentiles, current and suggested threshold.
+        """
+        pass
+
     @abstractmethod
     def get_detection_rate(self) -> int:
         """ Get motion detection rate per second. """
@@ -47,6 +64,14 @@ class MotionCapturingInterface(ABC):
         """
         pass
 
+    @abstractmethod
+    def get_effective_threshold(self) -> float:
+        """
+        Threshold in use - calibrated from the noise floor with automatic
+        threshold enabled, otherwise the configured one.
+        """
+        pass
+
     @abstractmethod
     def get_min_recording_length(self) -> int:
         """ Get minimal length of motion capture in seconds. """
@@ -66,3 +91,17 @@ class MotionCapturingInterface(ABC):
     def set_max_recording_length(self, seconds: int):
         """ Update maximal length of motion capture. """
         pass
+
+    @abstractmethod
+    def get_pre_roll_seconds(self) -> int:
+        """ Get length of buffered video preceding each motion capture. """
+        pass
+
+    @abstractmethod
+    def set_pre_roll_seconds(self, seconds: int):
+        """
+        Update length of buffered video preceding each motion capture,
+        0 disables the pre-roll buffer.
+        If running, restart motion capturing.
+        """
+        pass
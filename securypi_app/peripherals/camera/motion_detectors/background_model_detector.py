@@ -0,0 +1,154 @@
+"""
+Running-average background model motion detector.
+
+Keeps an exponentially weighted mean and variance of every pixel
+as in-place float32 buffers and scores frames against that model,
+so slow-moving subjects stand out from the learned background
+and noisy pixels need a larger change to count.
+"""
+import numpy as np   # pyright: ignore[reportMissingImports]
+
+from securypi_app.peripherals.camera.motion_detectors.detector_interface import (
+    MotionDetectorInterface
+)
+from securypi_app.peripherals.camera.motion_detectors.smoothing import (
+    SMOOTHING_SCALE, smooth_binomial
+)
+
+
+class BackgroundModelDetector(MotionDetectorInterface):
+    """
+    Motion detector comparing each smoothed frame
+    with the running background model.
+
+    A pixel is changed if its deviation from the background mean
+    exceeds 'deviation_factor' standard deviations of the background,
+    but at least 'pixel_threshold'.
+
+    With 'compensate_illumination', deviations are scored after subtracting
+    the mean brightness offset between the frame and the background,
+    the background itself still follows the brightness at the learning rate.
+    """
+
+    # the background stays valid while frames are skipped
+    needs_consecutive_frames = False
+
+    def __init__(self,
+                 learning_rate: float = 0.02,
+                 pixel_threshold: float = 12.0,
+                 deviation_factor: float = 3.0,
+                 compensate_illumination: bool = False):
+        """
+        - 'learning_rate': weight of a new frame in the background model
+        - 'pixel_threshold': minimal per-pixel change (0-255) of a smoothed
+          frame to be counted as changed
+        - 'deviation_factor': changed pixels deviate by more than
+          this many standard deviations
+        - 'compensate_illumination': match mean brightness before scoring
+        """
+        self._learning_rate = learning_rate
+        self.compensates_illumination = compensate_illumination
+        # mean brightness of the background, tracked without a reduction
+        self._background_level = 0.0
+        self._factor_squared = deviation_factor ** 2
+        # variance floor, so that the threshold never drops below pixel_threshold
+        self._min_variance = (pixel_threshold / deviation_factor) ** 2
+
+        self._shape = None
+        self._smoothed = None
+        self._scratch = None
+        self._deviation = None
+        self._squared = None
+        self._limit = None
+        self._mean = None
+        self._variance = None
+        self._mask = None
+        self._has_model = False
+
+    def resize(self, resolution: tuple[int, int]):
+        width, height = resolution
+        shape = (height, width)
+        if shape == self._shape:
+            return self
+
+        self._shape = shape
+        self._smoothed = np.empty(shape, dtype=np.uint16)
+        self._scratch = np.empty(shape, dtype=np.uint16)
+        self._deviation = np.empty(shape, dtype=np.float32)
+        self._squared = np.empty(shape, dtype=np.float32)
+        self._limit = np.empty(shape, dtype=np.float32)
+        self._mean = np.empty(shape, dtype=np.float32)
+        self._variance = np.empty(shape, dtype=np.float32)
+        self._mask = np.empty(shape, dtype=np.bool_)
+        self._has_model = False
+        return self
+
+    def reset(self):
+        self._has_model = False
+        return self
+
+    @property
+    def changed_mask(self) -> np.ndarray | None:
+        return self._mask
+
+    def score(self, frame: np.ndarray, level: float | None = None) -> float | None:
+        """
+        Return ratio of pixels deviating from the background model,
+        None for the very first frame (model is initialized by it).
+        """
+        if frame.shape != self._shape:
+            self.resize((frame.shape[1], frame.shape[0]))
+
+        smoothed = smooth_binomial(frame, self._smoothed, self._scratch)
+        deviation, squared = self._deviation, self._squared
+        np.multiply(smoothed, 1 / SMOOTHING_SCALE, out=deviation)
+        if self.compensates_illumination:
+            # mean brightness, the only extra reduction per frame
+            if level is None:
+                level = frame.mean()
+        else:
+            level = 0.0
+
+        if not self._has_model:
+            np.copyto(self._mean, deviation)
+            self._variance.fill(self._min_variance)
+            self._background_level = level
+            self._has_model = True
+            return None
+
+        # deviation from background and its square
+        np.subtract(deviation, self._mean, out=deviation)
+        if self.compensates_illumination:
+            np.subtract(deviation, level - self._background_level, out=squared)
+            np.multiply(squared, squared, out=squared)
+            self._background_level += self._learning_rate * (level - self._background_level)
+        else:
+            np.multiply(deviation, deviation, out=squared)
+
+        # changed: deviation^2 > factor^2 * variance
+        np.multiply(self._variance, self._factor_squared, out=self._limit)
+        np.greater(squared, self._limit, out=self._mask)
+        ratio = np.count_nonzero(self._mask) / self._mask.size
+
+        self._update_model()
+        return ratio
+
+    def _update_model(self):
+        """
+        Exponentially weighted update of background mean and variance:
+        mean += a * d
+        variance = (1 - a) * (variance + a * d^2)
+        Changed pixels do not add to the variance, so a subject
+        does not make its own pixels look noisy.
+        """
+        rate = self._learning_rate
+        deviation, squared = self._deviation, self._squared
+
+        np.multiply(deviation, rate, out=deviation)
+        np.add(self._mean, deviation, out=self._mean)
+
+        np.copyto(squared, 0.0, where=self._mask)
+        np.multiply(squared, rate, out=squared)
+        np.add(self._variance, squared, out=self._variance)
+        np.multiply(self._variance, 1 - rate, out=self._variance)
+        np.maximum(self._variance, self._min_variance, out=self._variance)
@@ -0,0 +1,75 @@
+"""
+Connected-component filtering of changed pixels.
+
+Changed pixels are labelled on a decimated mask (strided view, no copy),
+components smaller than the minimal area are dropped as noise.
+Cost per frame is bounded by the decimated mask size.
+"""
+import numpy as np   # pyright: ignore[reportMissingImports]
+from scipy import ndimage   # pyright: ignore[reportMissingImports]
+
+
+# 8-connectivity
+_STRUCTURE = ndimage.generate_binary_structure(2, 2)
+
+
+class BlobFilter:
+    """
+    Keeps only blobs of at least 'min_area_ratio' of the mask area,
+    tracks area and bounding box of the largest blob.
+    """
+
+    def __init__(self, downsample: int = 4, min_area_ratio: float = 0.0002):
+        """
+        - 'downsample': mask is labelled at every n-th row and column
+        - 'min_area_ratio': smaller blobs (fraction of the mask area) are noise
+        """
+        self._downsample = downsample
+        self._min_area_ratio = min_area_ratio
+
+        self._shape = None
+        self._labels = None
+        self._filtered = None
+        self.box = None  # (x0, y0, x1, y1) of the largest blob, mask-normalized
+        self.largest_ratio = 0.0  # area of the largest kept blob / mask area
+
+    def _resize(self, shape):
+        self._shape = shape
+        self._labels = np.empty(shape, dtype=np.int32)
+        self._filtered = np.empty(shape, dtype=np.bool_)
+
+    def filter(self, mask: np.ndarray) -> np.ndarray:
+        """
+        Return decimated mask of 'mask' without noise-sized blobs.
+        The returned buffer is reused by the next call.
+        """
+        small = mask[::self._downsample, ::self._downsample]
+        if small.shape != self._shape:
+            self._resize(small.shape)
+
+        labels = self._labels
+        count = ndimage.label(small, structure=_STRUCTURE, output=labels)
+        if count == 0:
+            self._filtered.fill(False)
+            self.box = None
+            self.largest_ratio = 0.0
+            return self._filtered
+
+        areas = np.bincount(labels.reshape(-1), minlength=count + 1)
+        areas[0] = 0  # background
+
+        # lookup table label -> keep
+        keep = areas >= max(1.0, self._min_area_ratio * small.size)
+        np.take(keep, labels, out=self._filtered)
+
+        largest = int(np.argmax(areas))
+        if keep[largest]:
+            rows, cols = ndimage.find_objects(labels, max_label=largest)[largest - 1]
+            height, width = small.shape
+            self.box = (cols.start / width, rows.start / height,
+                        cols.stop / width, rows.stop / height)
+            self.largest_ratio = areas[largest] / small.size
+        else:
+            self.box = None
+            self.largest_ratio = 0.0
+        return self._filtered
@@ -0,0 +1,212 @@
+"""
+Motion detection pipeline, from a luminance frame to a change ratio.
+"""
+import math
+
+import numpy as np   # pyright: ignore[reportMissingImports]
+
+from securypi_app.peripherals.camera.motion_detectors.detector_interface import (
+    MotionDetectorInterface
+)
+from securypi_app.peripherals.camera.motion_detectors.frame_difference_detector import (
+    FrameDifferenceDetector
+)
+from securypi_app.peripherals.camera.motion_detectors.background_model_detector import (
+    BackgroundModelDetector
+)
+from securypi_app.peripherals.camera.motion_detectors.motion_zones import (
+    MIN_CROP_SIZE, MotionZone, MotionZones
+)
+from securypi_app.peripherals.camera.motion_detectors.blob_filter import BlobFilter
+from securypi_app.peripherals.camera.motion_detectors.tiled_detector import TiledDetector
+from securypi_app.models.app_config import MotionCaptureConfig
+
+
+class DetectionPipeline:
+    """
+    Frame scoring stages:
+    - crop to motion zones (optional)
+    - coarse detection on a decimated frame, early exit
+      if its score is below a fraction of the threshold (optional)
+    - detection engine
+    - connected-component blob filtering (optional),
+      the ratio is then the area of the largest blob
+    - per-zone scoring (optional)
+    """
+
+    def __init__(self,
+                 detector: MotionDetectorInterface,
+                 zones: MotionZones | None = None,
+                 blob_filter: BlobFilter | None = None,
+                 coarse_detector: MotionDetectorInterface | None = None,
+                 coarse_decimation: int = 4,
+                 coarse_exit_fraction: float = 0.5):
+        """
+        - 'coarse_detector': engine scoring every 'coarse_decimation'-th pixel
+          of every 'coarse_decimation'-th row first
+        - 'coarse_exit_fraction': the full frame is scored only if the coarse
+          score reaches this fraction of the threshold
+        """
+        self.detector = detector
+        self._zones = zones
+        if zones is not None and coarse_detector is not None:
+            # the coarse view of the crop needs as many pixels as the crop itself
+            zones.min_crop_size = max(zones.min_crop_size,
+                                      MIN_CROP_SIZE * coarse_decimation)
+        self._blob_filter = blob_filter
+        self._coarse_detector = coarse_detector
+        self._coarse_decimation = coarse_decimation
+        self._coarse_exit_fraction = coarse_exit_fraction
+        # full-frame detector has seen the previous frame
+        self._detector_is_current = False
+        # copy of the last early-exit frame, the full-frame detector
+        # restarts from it, so the next ratio passes all stages
+        self._exit_frame = None
+        self._has_exit_frame = False
+
+        # (x0, y0, x1, y1) frame-normalized box of the largest blob
+        self.motion_box = None
+
+    def resize(self, resolution: tuple[int, int]):
+        """ Prepare buffers for lores frames of 'resolution' (width, height). """
+        if self._zones is not None:
+            resolution = self._zones.crop_resolution(resolution)
+        self.detector.resize(resolution)
+        if self._coarse_detector is not None:
+            width, height = resolution
+            k = self._coarse_decimation
+            self._coarse_detector.resize((math.ceil(width / k), math.ceil(height / k)))
+        return self
+
+    def reset(self):
+        self.detector.reset()
+        if self._coarse_detector is not None:
+            self._coarse_detector.reset()
+        self._detector_is_current = False
+        self._has_exit_frame = False
+        self.motion_box = None
+        return self
+
+    def close(self):
+        """ Release the engines' resources, buffers are kept for reuse. """
+        self.detector.close()
+        if self._coarse_detector is not None:
+            self._coarse_detector.close()
+
+    def score(self,
+              frame: np.ndarray,
+              threshold: float,
+              exit_threshold: float | None = None) -> float | None:
+        """
+        Return change ratio of 'frame', comparable with 'threshold',
+        None if there is nothing to compare to yet.
+        The coarse early exit is relative to 'exit_threshold',
+        if the ratio is compared with another threshold than 'threshold'.
+        """
+        if exit_threshold is None:
+            exit_threshold = threshold
+        if self._zones is not None:
+            frame = self._zones.crop(frame)
+
+        if self._coarse_detector is not None:
+            coarse_ratio = self._score_coarse(frame, threshold)
+            if coarse_ratio is not None:
+                if coarse_ratio < self._coarse_exit_fraction * exit_threshold:
+                    if self.detector.needs_consecutive_frames:
+                        self._detector_is_current = False
+                        self._store_exit_frame(frame)
+                    else:
+                        # a scene model must learn from every frame, or it goes stale
+                        self.detector.score(frame)
+                    self.motion_box = None
+                    return coarse_ratio
+
+                # restart differencing from the last skipped frame
+                if not self._detector_is_current and self.detector.needs_consecutive_frames:
+                    self.detector.reset()
+                    if not self._has_exit_frame:
+                        self.detector.score(frame)
+                        self._detector_is_current = True
+                        self.motion_box = None
+                        return None
+                    self.detector.score(self._exit_frame)
+
+        ratio = self.detector.score(frame)
+        self._detector_is_current = True
+        if ratio is None:
+            return ratio
+
+        mask = self.detector.changed_mask
+        if self._blob_filter is not None:
+            mask = self._blob_filter.filter(mask)
+            ratio = self._blob_filter.largest_ratio
+            self.motion_box = self._to_frame_box(self._blob_filter.box)
+
+        if self._zones is not None:
+            ratio = self._zones.score(mask, threshold)
+        return ratio
+
+    def _store_exit_frame(self, frame: np.ndarray):
+        """
+        Copy 'frame' into a buffer allocated once per resolution,
+        frame bus buffers are reused by the capture thread.
+        """
+        if self._exit_frame is None or self._exit_frame.shape != frame.shape:
+            self._exit_frame = np.empty(frame.shape, dtype=np.uint8)
+        np.copyto(self._exit_frame, frame)
+        self._has_exit_frame = True
+
+    def _score_coarse(self, frame: np.ndarray, threshold: float) -> float | None:
+        """ Score strided view of 'frame', no copy besides the detector's own. """
+        k = self._coarse_decimation
+        ratio = self._coarse_detector.score(frame[::k, ::k])
+        if ratio is not None and self._zones is not None:
+            ratio = self._zones.score(self._coarse_detector.changed_mask, threshold)
+        return ratio
+
+    def _to_frame_box(self, box):
+        """ Map box of the (cropped) mask to frame-normalized coordinates. """
+        if box is None or self._zones is None:
+            return box
+        return self._zones.to_frame_box(box)
+
+
+def _create_detector(config: MotionCaptureConfig) -> MotionDetectorInterface:
+    if config.motion_detection_engine == "background_model":
+        return BackgroundModelDetector(
+            learning_rate=config.background_learning_rate,
+            compensate_illumination=config.suppress_illumination_changes
+        )
+    return FrameDifferenceDetector(
+        compensate_illumination=config.suppress_illumination_changes
+    )
+
+
+def create_detection_pipeline(config: MotionCaptureConfig) -> DetectionPipeline:
+    """ Build the detection pipeline selected in the motion capturing configuration. """
+    if config.detection_workers > 1:
+        detector = TiledDetector(lambda: _create_detector(config),
+                                 tiles=config.detection_workers)
+    else:
+        detector = _create_detector(config)
+    zones = None
+    if config.zones:
+        zones = MotionZones([
+            MotionZone(zone.name, zone.polygon, zone.frame_change_ratio_threshold)
+            for zone in config.zones
+        ])
+
+    blob_filter = None
+    if config.blob_filter:
+        blob_filter = BlobFilter(downsample=config.blob_downsample,
+                                 min_area_ratio=config.min_blob_area_ratio)
+
+    # the background model scores every frame anyway, the coarse stage would not save work
+    coarse_detector = None
+    if config.coarse_decimation > 1 and detector.needs_consecutive_frames:
+        coarse_detector = _create_detector(config)
+
+    return DetectionPipeline(detector, zones, blob_filter,
+                             coarse_detector=coarse_detector,
+                             coarse_decimation=config.coarse_decimation,
+                             coarse_exit_fraction=config.coarse_exit_fraction)
@@ -0,0 +1,59 @@
+"""
+Adaptive scheduling of motion detection ticks.
+"""
+import time
+
+
+class AdaptiveDetectionRate:
+    """
+    Detection rate switching between idle and active polling.
+
+    - idle: sample at 'idle_rate' per second
+    - change ratio reaches 'ramp_fraction' of the threshold, or recording:
+      jump to 'active_rate' immediately
+    - no activity for 'cooldown_sec': decay back towards 'idle_rate'
+      by 'decay_factor' each tick
+
+    With idle_rate == active_rate the rate is fixed.
+    """
+
+    def __init__(self,
+                 idle_rate: float,
+                 active_rate: float,
+                 ramp_fraction: float = 0.5,
+                 cooldown_sec: float = 10.0,
+                 decay_factor: float = 0.8):
+        self._active_rate = active_rate
+        self._idle_rate = min(idle_rate, active_rate)
+        self._ramp_fraction = ramp_fraction
+        self._cooldown_sec = cooldown_sec
+        self._decay_factor = decay_factor
+
+        self._rate = self._idle_rate
+        self._last_active = 0.0
+
+    def get_rate(self) -> float:
+        """ Current detection rate per second. """
+        return self._rate
+
+    def next_interval(self,
+                      ratio: float | None,
+                      threshold: float,
+                      is_recording: bool,
+                      now: float | None = None) -> float:
+        """
+        Update rate from the last detection tick,
+        return seconds to wait before the next one.
+        """
+        if now is None:
+            now = time.monotonic()
+
+        if is_recording or (
+            ratio is not None and ratio >= self._ramp_fraction * threshold
+        ):
+            self._rate = self._active_rate
+            self._last_active = now
+        elif now - self._last_active > self._cooldown_sec:
+            self._rate = max(self._idle_rate, self._rate * self._decay_factor)
+
+        return 1 / self._rate
@@ -0,0 +1,158 @@
+"""
+Motion detection in a separate process.
+
+Lores luminance frames are copied into shared memory ring slots,
+only slot indices and results travel over the pipe, so the detection
+work does not hold the GIL of the web server process.
+"""
+import logging
+import multiprocessing as mp
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np   # pyright: ignore[reportMissingImports]
+
+from securypi_app.peripherals.camera.motion_detectors.detection_pipeline import (
+    create_detection_pipeline
+)
+from securypi_app.models.app_config import MotionCaptureConfig
+
+
+logger = logging.getLogger(__name__)
+
+
+class DetectionWorker:
+    """
+    Drop-in replacement of DetectionPipeline running the pipeline
+    in a worker process. The process is started by 'resize'
+    and stopped by 'close'.
+    """
+
+    def __init__(self,
+                 config: MotionCaptureConfig,
+                 slots: int = 2,
+                 reply_timeout: float = 2.0):
+        """
+        - 'config': motion capturing configuration the pipeline is built from
+        - 'slots': shared memory frame slots, the frame being written never
+          shares a slot with a frame the worker may still read
+        - 'reply_timeout': seconds to wait for a frame score
+        """
+        self._config = config
+        self._slots = slots
+        self._reply_timeout = reply_timeout
+
+        self._process = None
+        self._conn = None
+        self._shm: SharedMemory | None = None
+        self._ring: np.ndarray | None = None
+        self._seq = 0
+
+        # (x0, y0, x1, y1) frame-normalized box of the largest blob
+        self.motion_box = None
+
+    def is_alive(self) -> bool:
+        return self._process is not None and self._process.is_alive()
+
+    def resize(self, resolution: tuple[int, int]):
+        """ Prepare the frame ring for 'resolution' (width, height). """
+        w, h = resolution
+        if self._ring is not None and self._ring.shape[1:] == (h, w) and self.is_alive():
+            return self
+
+        self.close()
+        self._shm = SharedMemory(create=True, size=self._slots * w * h)
+        self._ring = np.ndarray((self._slots, h, w), dtype=np.uint8, buffer=self._shm.buf)
+
+        # spawn: no copy of the server threads, camera or sockets
+        ctx = mp.get_context("spawn")
+        self._conn, child_conn = ctx.Pipe()
+        self._process = ctx.Process(target=_worker_main,
+                                    args=(child_conn, self._config,
+                                          self._shm.name, self._ring.shape),
+                                    name="motion-detection", daemon=True)
+        self._process.start()
+        child_conn.close()
+        return self
+
+    def reset(self):
+        self.motion_box = None
+        if self.is_alive():
+            self._conn.send(("reset",))
+        return self
+
+    def score(self,
+              frame: np.ndarray,
+              threshold: float,
+              exit_threshold: float | None = None) -> float | None:
+        """
+        Return change ratio of 'frame' computed by the worker,
+        None if there is nothing to compare to yet or the worker does not reply.
+        """
+        if not self.is_alive():
+            logger.warning("Motion detection worker is not running.")
+            return None
+
+        self._seq += 1
+        slot = self._seq % self._slots
+        np.copyto(self._ring[slot], frame)
+        self._conn.send(("score", self._seq, slot, threshold, exit_threshold))
+
+        # replies of timed out requests are skipped by sequence number
+        while self._conn.poll(self._reply_timeout):
+            seq, ratio, box = self._conn.recv()
+            if seq == self._seq:
+                self.motion_box = box
+                return ratio
+
+        logger.warning("Motion detection worker did not reply in %.1f s.",
+                       self._reply_timeout)
+        return None
+
+    def close(self):
+        """ Stop the worker process and release the shared memory. """
+        if self._process is not None:
+            try:
+                self._conn.send(("stop",))
+            except (BrokenPipeError, OSError):
+                pass
+            self._process.join(timeout=2.0)
+            if self._process.is_alive():
+                self._process.terminate()
+            self._conn.close()
+            self._process = None
+            self._conn = None
+
+        if self._shm is not None:
+            self._ring = None
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+
+def _worker_main(conn, config: MotionCaptureConfig, shm_name: str, shape: tuple):
+    """ Worker process loop, scores frames of the shared ring on request. """
+    shm = SharedMemory(name=shm_name)
+    ring = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+    pipeline = create_detection_pipeline(config)
+    pipeline.resize((shape[2], shape[1])).reset()
+
+    try:
+        while True:
+            try:
+                message = conn.recv()
+            except EOFError:
+                break  # parent is gone
+
+            command = message[0]
+            if command == "score":
+                _, seq, slot, threshold, exit_threshold = message
+                ratio = pipeline.score(ring[slot], threshold, exit_threshold)
+                conn.send((seq, ratio, pipeline.motion_box))
+            elif command == "reset":
+                pipeline.reset()
+            elif command == "stop":
+                break
+    finally:
+        pipeline.close()
+        del ring
+        shm.close()
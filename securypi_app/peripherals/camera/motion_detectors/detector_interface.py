@@ -0,0 +1,52 @@
+"""
+Interface for motion detection engines used by MotionCapturing.
+
+To add a new engine, implement the interface and assign it
+in motion_detectors/detection_pipeline.py's "create_detection_pipeline" function.
+"""
+from abc import ABC, abstractmethod
+
+import numpy as np   # pyright: ignore[reportMissingImports]
+
+
+class MotionDetectorInterface(ABC):
+
+    # score() compares with the directly preceding frame,
+    # so its state is stale after frames were skipped
+    needs_consecutive_frames: bool = True
+    # score() subtracts the mean brightness of the frame
+    compensates_illumination: bool = False
+
+    @abstractmethod
+    def resize(self, resolution: tuple[int, int]):
+        """
+        Allocate workspace buffers for frames of 'resolution' (width, height).
+        Does nothing, if the buffers already have the right size.
+        """
+        pass
+
+    @abstractmethod
+    def reset(self):
+        """ Forget the scene history, the next score starts fresh. """
+        pass
+
+    @property
+    @abstractmethod
+    def changed_mask(self) -> np.ndarray | None:
+        """ Boolean mask of changed pixels from the last scored frame. """
+        pass
+
+    @abstractmethod
+    def score(self, frame: np.ndarray, level: float | None = None) -> float | None:
+        """
+        Score 2D uint8 luminance 'frame', return ratio of changed pixels
+        or None if there is nothing to compare to yet.
+        'level' is the mean brightness (0-255) used for illumination
+        compensation instead of the mean of 'frame', when 'frame'
+        is a part of a larger frame.
+        """
+        pass
+
+    def close(self):
+        """ Release resources like worker threads, if the engine has any. """
+        pass
@@ -0,0 +1,111 @@
+"""
+Frame differencing motion detector working on preallocated buffers.
+
+Smoothing, differencing and counting of changed pixels run in place,
+so a detection tick does not allocate any frame sized arrays.
+Buffers are (re)allocated only when the lores resolution changes.
+"""
+import numpy as np   # pyright: ignore[reportMissingImports]
+
+from securypi_app.peripherals.camera.motion_detectors.detector_interface import (
+    MotionDetectorInterface
+)
+from securypi_app.peripherals.camera.motion_detectors.smoothing import (
+    SMOOTHING_SCALE, smooth_binomial
+)
+
+
+class FrameDifferenceDetector(MotionDetectorInterface):
+    """
+    Motion detector comparing each smoothed frame
+    with the previous one.
+
+    With 'compensate_illumination', the difference of mean brightness
+    of both frames is subtracted first, so global brightness shifts
+    (clouds, exposure steps, lights) do not count as changes.
+    """
+
+    def __init__(self,
+                 pixel_threshold: float = 12.0,
+                 compensate_illumination: bool = False):
+        """
+        - 'pixel_threshold': minimal per-pixel change (0-255) of a smoothed
+          frame to be counted as changed.
+        - 'compensate_illumination': match mean brightness before differencing
+        """
+        self._pixel_threshold = pixel_threshold
+        self._scaled_threshold = int(round(pixel_threshold * SMOOTHING_SCALE))
+        self.compensates_illumination = compensate_illumination
+        self._previous_level = 0.0
+
+        self._shape = None
+        self._current = None
+        self._previous = None
+        self._scratch = None
+        self._mask = None
+        self._has_previous = False
+
+    def resize(self, resolution: tuple[int, int]):
+        width, height = resolution
+        shape = (height, width)
+        if shape == self._shape:
+            return self
+
+        self._shape = shape
+        self._current = np.empty(shape, dtype=np.uint16)
+        self._previous = np.empty(shape, dtype=np.uint16)
+        self._scratch = np.empty(shape, dtype=np.uint16)
+        self._mask = np.empty(shape, dtype=np.bool_)
+        self._has_previous = False
+        return self
+
+    def reset(self):
+        self._has_previous = False
+        return self
+
+    @property
+    def changed_mask(self) -> np.ndarray | None:
+        return self._mask
+
+    def smooth(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Smooth 2D uint8 'frame' into the current frame buffer.
+        Returned values are scaled by SMOOTHING_SCALE.
+        """
+        if frame.shape != self._shape:
+            self.resize((frame.shape[1], frame.shape[0]))
+
+        return smooth_binomial(frame, self._current, self._scratch)
+
+    def score(self, frame: np.ndarray, level: float | None = None) -> float | None:
+        """
+        Return ratio of pixels changed since the previous frame,
+        None for the very first frame (nothing to compare to).
+        """
+        current = self.smooth(frame)
+        if self.compensates_illumination:
+            # mean brightness, the only extra reduction per frame
+            if level is None:
+                level = frame.mean()
+            level = level * SMOOTHING_SCALE
+        else:
+            level = 0.0
+
+        ratio = None
+        if self._has_previous:
+            # values are < 2**14, signed differences can not overflow
+            diff = self._scratch.view(np.int16)
+            np.subtract(current.view(np.int16),
+                        self._previous.view(np.int16),
+                        out=diff)
+            if self.compensates_illumination:
+                np.subtract(diff, int(round(level - self._previous_level)), out=diff)
+            np.abs(diff, out=diff)
+            np.greater_equal(diff, self._scaled_threshold, out=self._mask)
+            ratio = np.count_nonzero(self._mask) / self._mask.size
+
+        # ping-pong, current frame becomes the previous one
+        self._previous, self._current = self._current, self._previous
+        self._previous_level = level
+        self._has_previous = True
+        return ratio
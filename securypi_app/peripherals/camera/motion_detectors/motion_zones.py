@@ -0,0 +1,156 @@
+"""
+Region-of-interest zones for motion detection.
+
+Zones are polygons in normalized frame coordinates (0.0 - 1.0),
+each with its own frame change ratio threshold.
+Pixels outside of all zones are ignored - the frame is cropped
+to the zones' bounding box before detection, and zones are rasterized
+once into flat index arrays, so each frame touches only masked pixels.
+"""
+import math
+
+import numpy as np   # pyright: ignore[reportMissingImports]
+from PIL import Image, ImageDraw
+
+
+# smallest crop side in pixels, smoothing needs neighbours on both sides
+MIN_CROP_SIZE = 3
+
+
+class MotionZone:
+    """ Named polygon with its own change ratio threshold. """
+
+    def __init__(self,
+                 name: str,
+                 polygon: list[tuple[float, float]],
+                 threshold: float):
+        self.name = name
+        self.polygon = [(float(x), float(y)) for x, y in polygon]
+        self.threshold = threshold
+
+
+class MotionZones:
+    """ Crops frames to zones and scores changed pixels per zone. """
+
+    def __init__(self, zones: list[MotionZone], min_crop_size: int = MIN_CROP_SIZE):
+        """
+        - 'min_crop_size': the crop box is padded to at least this many
+          pixels per side (if the frame is large enough), so thin zones
+          can be smoothed
+        """
+        if not zones:
+            raise ValueError("At least one motion zone is required.")
+        self._zones = zones
+        self.min_crop_size = max(min_crop_size, MIN_CROP_SIZE)
+
+        # bounding box of all zones, normalized
+        xs = [x for zone in zones for x, _ in zone.polygon]
+        ys = [y for zone in zones for _, y in zone.polygon]
+        self._bounds = (max(0.0, min(xs)), max(0.0, min(ys)),
+                        min(1.0, max(xs)), min(1.0, max(ys)))
+
+        self._frame_shape = None
+        self._crop = (slice(None), slice(None))
+        self._crop_polygons = []    # zone polygons relative to the crop box
+        self._indices = {}          # mask shape -> [flat pixel indices per zone]
+        self._buffers = {}          # mask shape -> [bool buffer per zone]
+        self.ratios = {zone.name: 0.0 for zone in zones}
+
+    def __len__(self):
+        return len(self._zones)
+
+    def crop_resolution(self, resolution: tuple[int, int]) -> tuple[int, int]:
+        """ (width, height) of frames of 'resolution' after cropping. """
+        width, height = resolution
+        rows, cols = self._crop_box((height, width))
+        return cols.stop - cols.start, rows.stop - rows.start
+
+    def crop(self, frame: np.ndarray) -> np.ndarray:
+        """ Zero-copy view of 'frame' cropped to the zones' bounding box. """
+        if frame.shape != self._frame_shape:
+            self._set_frame_shape(frame.shape)
+        return frame[self._crop]
+
+    def to_frame_box(self, box: tuple[float, float, float, float]):
+        """
+        Convert crop-normalized 'box' (x0, y0, x1, y1) to frame-normalized
+        coordinates of the last cropped frame.
+        """
+        height, width = self._frame_shape
+        rows, cols = self._crop
+        crop_width = cols.stop - cols.start
+        crop_height = rows.stop - rows.start
+        x0, y0, x1, y1 = box
+        return ((cols.start + x0 * crop_width) / width,
+                (rows.start + y0 * crop_height) / height,
+                (cols.start + x1 * crop_width) / width,
+                (rows.start + y1 * crop_height) / height)
+
+    def _crop_box(self, frame_shape) -> tuple[slice, slice]:
+        height, width = frame_shape
+        x0, y0, x1, y1 = self._bounds
+        cols = self._padded(math.floor(x0 * width), math.ceil(x1 * width), width)
+        rows = self._padded(math.floor(y0 * height), math.ceil(y1 * height), height)
+        return rows, cols
+
+    def _padded(self, start: int, stop: int, size: int) -> slice:
+        """ Widen [start, stop) around its center to 'min_crop_size', within [0, size). """
+        length = min(max(stop - start, self.min_crop_size), size)
+        start = min(max((start + stop - length) // 2, 0), size - length)
+        return slice(start, start + length)
+
+    def _set_frame_shape(self, frame_shape):
+        """ Recompute crop box and zone polygons in crop coordinates. """
+        height, width = frame_shape
+        rows, cols = self._crop_box(frame_shape)
+        crop_width = cols.stop - cols.start
+        crop_height = rows.stop - rows.start
+
+        self._frame_shape = frame_shape
+        self._crop = (rows, cols)
+        self._crop_polygons = [
+            [((x * width - cols.start) / crop_width,
+              (y * height - rows.start) / crop_height) for x, y in zone.polygon]
+            for zone in self._zones
+        ]
+        self._indices = {}
+        self._buffers = {}
+
+    def _rasterize(self, mask_shape):
+        """ Flat pixel indices of every zone in a mask of 'mask_shape'. """
+        height, width = mask_shape
+        indices = []
+        for polygon in self._crop_polygons:
+            image = Image.new("1", (width, height), 0)
+            ImageDraw.Draw(image).polygon(
+                [(x * width, y * height) for x, y in polygon], fill=1
+            )
+            indices.append(np.flatnonzero(np.asarray(image)))
+
+        self._indices[mask_shape] = indices
+        self._buffers[mask_shape] = [
+            np.empty(len(zone_indices), dtype=np.bool_) for zone_indices in indices
+        ]
+
+    def score(self, mask: np.ndarray, threshold: float) -> float:
+        """
+        Score changed pixels 'mask' of a cropped frame (or its decimation).
+        Every zone ratio is rescaled to the global 'threshold',
+        the strongest zone is returned. So 'ratio >= threshold'
+        holds, if any zone reaches its own threshold.
+        """
+        if mask.shape not in self._indices:
+            self._rasterize(mask.shape)
+
+        flat_mask = mask.reshape(-1)
+        score = 0.0
+        for zone, indices, buffer in zip(self._zones,
+                                         self._indices[mask.shape],
+                                         self._buffers[mask.shape]):
+            if len(indices) == 0:
+                continue
+            np.take(flat_mask, indices, out=buffer)
+            ratio = np.count_nonzero(buffer) / len(indices)
+            self.ratios[zone.name] = ratio
+            score = max(score, ratio * threshold / zone.threshold)
+        return score
@@ -0,0 +1,108 @@
+"""
+In-memory telemetry of motion detection scores.
+
+Samples (timestamp, change ratio, detection latency) are written
+into preallocated numpy arrays used as a ring buffer,
+so recording a sample neither allocates nor touches the disk.
+"""
+from threading import Lock
+
+import numpy as np   # pyright: ignore[reportMissingImports]
+
+
+# robust spread of quiet ratios: median + NOISE_MADS * scaled MAD,
+# samples above it are taken as motion and left out of the noise floor
+NOISE_MADS = 8.0
+# suggested threshold: noise floor peak times the margin, at least the minimum
+THRESHOLD_MARGIN = 1.5
+MIN_SUGGESTED_THRESHOLD = 0.0002
+
+
+class ScoreTelemetry:
+    """
+    Fixed-size ring of the latest 'capacity' detection samples.
+    Written by the detection loop, read by web requests.
+    """
+
+    def __init__(self, capacity: int = 3600):
+        self._capacity = capacity
+        self._times = np.zeros(capacity, dtype=np.float64)
+        self._ratios = np.zeros(capacity, dtype=np.float32)
+        self._latencies = np.zeros(capacity, dtype=np.float32)
+        self._next = 0      # ring index of the next sample
+        self._count = 0     # stored samples, up to capacity
+        self._lock = Lock()
+
+    def __len__(self):
+        return self._count
+
+    def push(self, timestamp: float, ratio: float, latency: float):
+        """ Store one sample, 'latency' in seconds. Overwrites the oldest one. """
+        with self._lock:
+            i = self._next
+            self._times[i] = timestamp
+            self._ratios[i] = ratio
+            self._latencies[i] = latency
+            self._next = (i + 1) % self._capacity
+            self._count = min(self._count + 1, self._capacity)
+
+    def clear(self):
+        with self._lock:
+            self._next = 0
+            self._count = 0
+
+    def samples(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """ Copies of (times, ratios, latencies), oldest first. """
+        with self._lock:
+            start = (self._next - self._count) % self._capacity
+            order = (np.arange(self._count) + start) % self._capacity
+            return self._times[order], self._ratios[order], self._latencies[order]
+
+    def summary(self, points: int = 200) -> dict:
+        """
+        JSON-ready overview:
+        - 'history': at most 'points' buckets with their start time,
+          peak ratio and mean latency
+        - ratio and latency percentiles
+        - threshold suggested by the noise floor of quiet samples
+        """
+        times, ratios, latencies = self.samples()
+        if len(ratios) == 0:
+            return {"samples": 0, "history": [], "ratio_percentiles": {},
+                    "latency_ms_percentiles": {}, "suggested_threshold": None}
+
+        # buckets of equal sample count, peaks are kept
+        bounds = np.linspace(0, len(ratios), min(points, len(ratios)) + 1).astype(int)
+        starts = bounds[:-1]
+        peaks = np.maximum.reduceat(ratios, starts)
+        mean_latencies = np.add.reduceat(latencies, starts) / np.diff(bounds)
+
+        percentiles = (50, 90, 95, 99)
+        ratio_values = np.percentile(ratios, percentiles)
+        latency_values = np.percentile(latencies * 1000, percentiles)
+        return {
+            "samples": len(ratios),
+            "history": [
+                {"time": float(t), "ratio": float(r), "latency_ms": float(l * 1000)}
+                for t, r, l in zip(times[starts], peaks, mean_latencies)
+            ],
+            "ratio_percentiles": {
+                f"p{p}": float(v) for p, v in zip(percentiles, ratio_values)
+            } | {"max": float(ratios.max())},
+            "latency_ms_percentiles": {
+                f"p{p}": float(v) for p, v in zip(percentiles, latency_values)
+            } | {"max": float(latencies.max() * 1000)},
+            "suggested_threshold": self.suggest_threshold(ratios),
+        }
+
+    @staticmethod
+    def suggest_threshold(ratios: np.ndarray) -> float:
+        """
+        Threshold above the noise floor: quiet samples are those within
+        NOISE_MADS robust deviations of the median, the suggestion is
+        their peak times THRESHOLD_MARGIN.
+        """
+        median = np.median(ratios)
+        spread = 1.4826 * np.median(np.abs(ratios - median))
+        quiet = ratios[ratios <= median + NOISE_MADS * spread]
+        return float(max(THRESHOLD_MARGIN * quiet.max(), MIN_SUGGESTED_THRESHOLD))
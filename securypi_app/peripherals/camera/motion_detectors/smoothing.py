@@ -0,0 +1,58 @@
+"""
+In-place frame smoothing shared by motion detection engines.
+"""
+import numpy as np   # pyright: ignore[reportMissingImports]
+
+
+# Smoothed frames are scaled by 2**8 (two [1, 2, 1] passes per axis)
+# and shifted right by two bits (values < 2**14), so a difference
+# of two frames minus their mean brightness offset fits into int16.
+SMOOTHING_SCALE = 64
+
+
+def blur_121(src: np.ndarray, dst: np.ndarray, axis: int):
+    """
+    One pass of the [1, 2, 1] binomial kernel along 'axis' (0 | 1)
+    from 'src' into 'dst', with 'nearest' border mode.
+    Result is not normalized (scaled by 4).
+    """
+    if axis == 1:
+        left, center, right = src[:, :-2], src[:, 1:-1], src[:, 2:]
+        inner = dst[:, 1:-1]
+        first, last = dst[:, 0], dst[:, -1]
+        src_first, src_second = src[:, 0], src[:, 1]
+        src_last, src_before_last = src[:, -1], src[:, -2]
+    else:
+        left, center, right = src[:-2], src[1:-1], src[2:]
+        inner = dst[1:-1]
+        first, last = dst[0], dst[-1]
+        src_first, src_second = src[0], src[1]
+        src_last, src_before_last = src[-1], src[-2]
+
+    np.add(left, right, out=inner)
+    np.add(inner, center, out=inner)
+    np.add(inner, center, out=inner)
+
+    # border pixels: 3 * edge + neighbour
+    np.add(src_first, src_second, out=first)
+    np.add(first, src_first, out=first)
+    np.add(first, src_first, out=first)
+    np.add(src_last, src_before_last, out=last)
+    np.add(last, src_last, out=last)
+    np.add(last, src_last, out=last)
+
+
+def smooth_binomial(frame: np.ndarray, out: np.ndarray, scratch: np.ndarray) -> np.ndarray:
+    """
+    Smooth 2D uint8 'frame' into uint16 'out' (using uint16 'scratch')
+    with separable 5-tap binomial filter [1, 4, 6, 4, 1] / 16,
+    which equals a gaussian with sigma = 1 sampled on integers.
+    Returned values are scaled by SMOOTHING_SCALE.
+    """
+    np.copyto(out, frame)   # widen uint8 -> uint16
+    blur_121(out, scratch, axis=1)
+    blur_121(scratch, out, axis=1)
+    blur_121(out, scratch, axis=0)
+    blur_121(scratch, out, axis=0)
+    np.right_shift(out, 2, out=out)
+    return out
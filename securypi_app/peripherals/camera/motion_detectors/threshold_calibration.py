@@ -0,0 +1,93 @@
+"""
+Automatic change ratio threshold from the observed noise floor.
+
+A high quantile of quiet-scene ratios is tracked by stochastic
+approximation - a single value nudged up or down by each sample -
+so memory stays O(1) and old conditions are forgotten over time.
+"""
+
+
+class QuantileTracker:
+    """
+    Streaming estimate of the 'quantile' of a non-negative series.
+    Each sample moves the estimate by a step proportional to it,
+    so it follows the series at the same relative speed at any scale.
+    """
+
+    def __init__(self,
+                 quantile: float = 0.95,
+                 adapt_rate: float = 0.002,
+                 min_step: float = 1e-6):
+        """
+        - 'quantile': tracked quantile (0.0 - 1.0)
+        - 'adapt_rate': relative step per sample, higher forgets faster
+          but jitters more (upward steps are q / (1 - q) times larger)
+        - 'min_step': smallest step, so the estimate can leave zero
+        """
+        self._quantile = quantile
+        self._adapt_rate = adapt_rate
+        self._min_step = min_step
+        self.value: float | None = None
+        self.count = 0
+
+    def update(self, sample: float) -> float:
+        self.count += 1
+        if self.value is None:
+            self.value = sample
+            return self.value
+
+        step = self._adapt_rate * max(self.value, self._min_step)
+        if sample > self.value:
+            # rises for (1 - q) of samples by q, falls for q of them by (1 - q)
+            self.value += step * self._quantile / (1 - self._quantile)
+        else:
+            self.value = max(self.value - step, 0.0)
+        return self.value
+
+    def reset(self):
+        self.value = None
+        self.count = 0
+
+
+class ThresholdCalibrator:
+    """
+    Effective threshold: 'multiplier' times the tracked quantile
+    of quiet ratios, clamped to [min_threshold, max_threshold].
+    """
+
+    def __init__(self,
+                 quantile: float = 0.95,
+                 multiplier: float = 3.0,
+                 min_threshold: float = 0.0003,
+                 max_threshold: float = 0.01,
+                 warmup_samples: int = 50,
+                 adapt_rate: float = 0.002):
+        """
+        - 'warmup_samples': quiet samples needed before the calibrated
+          threshold replaces the configured one
+        """
+        self._tracker = QuantileTracker(quantile, adapt_rate)
+        self._multiplier = multiplier
+        self._min_threshold = min_threshold
+        self._max_threshold = max_threshold
+        self._warmup_samples = warmup_samples
+
+    def update(self, quiet_ratio: float):
+        """ Add ratio of a frame without motion. """
+        self._tracker.update(quiet_ratio)
+
+    def is_calibrated(self) -> bool:
+        return self._tracker.count >= self._warmup_samples
+
+    def noise_floor(self) -> float | None:
+        return self._tracker.value
+
+    def threshold(self, default: float) -> float:
+        """ Calibrated threshold, 'default' until warmed up. """
+        if not self.is_calibrated():
+            return default
+        calibrated = self._multiplier * self._tracker.value
+        return min(max(calibrated, self._min_threshold), self._max_threshold)
+
+    def reset(self):
+        self._tracker.reset()
@@ -0,0 +1,120 @@
+"""
+Tiled motion detection on a thread pool.
+
+numpy releases the GIL in large array operations, so horizontal
+tiles of a frame can be scored by separate detectors in parallel.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+import numpy as np   # pyright: ignore[reportMissingImports]
+
+from securypi_app.peripherals.camera.motion_detectors.detector_interface import (
+    MotionDetectorInterface
+)
+
+
+# rows shared by neighbouring tiles, radius of the 5-tap smoothing kernel,
+# so tile borders are smoothed like the inside of a whole frame
+TILE_OVERLAP = 2
+
+
+class TiledDetector(MotionDetectorInterface):
+    """
+    Motion detector splitting frames into horizontal tiles,
+    each scored by its own detector on a persistent thread pool.
+    Per-tile changed ratios are kept in 'tile_ratios'.
+    """
+
+    def __init__(self,
+                 create_detector: Callable[[], MotionDetectorInterface],
+                 tiles: int = 4,
+                 workers: int | None = None):
+        """
+        - 'create_detector': factory of the per-tile detection engine
+        - 'tiles': number of horizontal tiles
+        - 'workers': pool threads, defaults to one per tile
+        """
+        self._detectors = [create_detector() for _ in range(tiles)]
+        self._workers = workers or tiles
+        self._executor: ThreadPoolExecutor | None = None
+        self.needs_consecutive_frames = self._detectors[0].needs_consecutive_frames
+        self.compensates_illumination = self._detectors[0].compensates_illumination
+
+        self._shape = None
+        self._mask = None
+        # per tile: (frame rows, rows of the tile mask, rows of the full mask)
+        self._bands: list[tuple[slice, slice, slice]] = []
+        self.tile_ratios = [0.0] * tiles
+
+    def resize(self, resolution: tuple[int, int]):
+        width, height = resolution
+        if self._shape != (height, width):
+            self._shape = (height, width)
+            self._mask = np.zeros((height, width), dtype=np.bool_)
+
+            # never more tiles than rows
+            tiles = min(len(self._detectors), height)
+            bounds = np.linspace(0, height, tiles + 1).astype(int)
+            self._bands = []
+            for detector, start, end in zip(self._detectors, bounds[:-1], bounds[1:]):
+                top = max(0, start - TILE_OVERLAP)
+                bottom = min(height, end + TILE_OVERLAP)
+                detector.resize((width, bottom - top))
+                self._bands.append((slice(top, bottom),
+                                    slice(start - top, end - top),
+                                    slice(start, end)))
+
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._workers,
+                                                thread_name_prefix="motion-tile")
+        return self
+
+    def reset(self):
+        for detector in self._detectors:
+            detector.reset()
+        self.tile_ratios = [0.0] * len(self._detectors)
+        return self
+
+    @property
+    def changed_mask(self) -> np.ndarray | None:
+        return self._mask
+
+    def _score_tile(self, index: int, frame: np.ndarray, level: float | None) -> int | None:
+        """ Score one tile, copy its changed pixels to the full mask. """
+        frame_rows, tile_rows, mask_rows = self._bands[index]
+        detector = self._detectors[index]
+        if detector.score(frame[frame_rows], level) is None:
+            return None
+
+        tile_mask = detector.changed_mask[tile_rows]
+        np.copyto(self._mask[mask_rows], tile_mask)
+        count = np.count_nonzero(tile_mask)
+        self.tile_ratios[index] = count / tile_mask.size
+        return count
+
+    def score(self, frame: np.ndarray, level: float | None = None) -> float | None:
+        """
+        Score tiles of 2D uint8 luminance 'frame' in parallel,
+        return ratio of changed pixels of the whole frame.
+        """
+        if frame.shape != self._shape or self._executor is None:
+            self.resize((frame.shape[1], frame.shape[0]))
+
+        # one brightness of the whole frame, a tile's own mean
+        # would cancel a subject covering most of the tile
+        if self.compensates_illumination and level is None:
+            level = frame.mean()
+
+        tiles = len(self._bands)
+        counts = list(self._executor.map(self._score_tile, range(tiles),
+                                         [frame] * tiles, [level] * tiles))
+        if None in counts:
+            return None
+        return sum(counts) / self._mask.size
+
+    def close(self):
+        """ Stop the thread pool, it is restarted by 'resize'. """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
@@ -2,12 +2,15 @@ import io
 import logging
 from pathlib import Path
 from numpy import ndarray
+from numpy.lib.stride_tricks import as_strided
 from flask import current_app
 
 from securypi_app.services.string_parsing import timed_filename
 from securypi_app.services.captures import recordings_path
 from securypi_app.peripherals.camera.mycam_interface import MyPicamera2Interface
 from securypi_app.peripherals.camera.streaming import Streaming
+from securypi_app.peripherals.camera.segmented_output import SegmentedOutput
+from securypi_app.peripherals.camera.frame_bus import FrameBus
 from securypi_app.models.app_config import AppConfig
 
 # Conditional Import for RPi picamera2 library
@@ -15,14 +18,14 @@ try:
     from picamera2 import Picamera2    # pyright: ignore[reportMissingImports]
     from libcamera import controls # pyright: ignore[reportAttributeAccessIssue]
     from picamera2.encoders import H264Encoder, Quality # pyright: ignore[reportMissingImports]
-    from picamera2.outputs import PyavOutput # pyright: ignore[reportMissingImports]
+    from picamera2.outputs import CircularOutput2 # pyright: ignore[reportMissingImports]
     from securypi_app.peripherals.camera.motion_capturing import MotionCapturing # motion capturing is dependent on picamera2
 
 except ImportError as e:
     logging.warning("Failed to import picamera2 camera library, reverting to mock class: %s", e)
     # Mock sensor classes for platform independent development
     from securypi_app.peripherals.camera.mock_camera_modules.mock_picamera2 import (
-        MockPicamera2, MockEncoder, MockPyavOutput,
+        MockPicamera2, MockEncoder, MockCircularOutput2,
         MockQuality, Controls
     )
     from securypi_app.peripherals.camera.mock_camera_modules.mock_motion_capturing import (
@@ -30,7 +33,7 @@ except ImportError as e:
     )
     Picamera2 = MockPicamera2
     H264Encoder = MockEncoder
-    PyavOutput = MockPyavOutput
+    CircularOutput2 = MockCircularOutput2
     Quality = MockQuality
     controls = Controls
     MotionCapturing = MockMotionCapturing
@@ -64,6 +67,9 @@ class MyPicamera2(MyPicamera2Interface):
         # wrapping PiCamera2 instance
         self._picam = Picamera2()
 
+        # Y plane (shape, strides) per stream, valid for current configuration
+        self._luminance_layouts = {}
+
         self.load_configuration()
         
         # starting picamera here
@@ -71,6 +77,13 @@ class MyPicamera2(MyPicamera2Interface):
 
         # encoders
         self._recording_encoder = None
+        self._recording_output = None
+        # always-on encoder into in-memory circular buffer (pre-roll)
+        self._preroll_encoder = None
+        self._preroll_output = None
+
+        # single capture thread of lores frames, shared by consumers
+        self.frame_bus = FrameBus(lambda: self.capture_luminance(stream="lores"))
 
         # extensions
         self.streaming = Streaming(self)
@@ -92,7 +105,9 @@ class MyPicamera2(MyPicamera2Interface):
         """ Stop all camera tasks and apply fresh configuration. """
         self.stop_recording_to_file()
         self.streaming.stop_capture_stream()
+        self.streaming.stop_live_segments()
         self.motion_capturing.stop()
+        self.stop_preroll_buffer()
         
         self._picam.stop()
         
@@ -171,6 +186,7 @@ class MyPicamera2(MyPicamera2Interface):
         # config.encode = "main" (defaul value)
 
         self._picam.configure(config)
+        self._luminance_layouts = {}  # strides may change with stream sizes
         return self
 
     def get_current_resolution(self, target="sensor") -> tuple[int, int]:
@@ -227,9 +243,16 @@ class MyPicamera2(MyPicamera2Interface):
         if self._recording_encoder is not None:
             raise RuntimeError("Recording already in progress.")
 
+        self._recording_output = SegmentedOutput(str(output_path))
+        if self.is_preroll_buffering():
+            # flush buffered seconds to the file, continue with live frames
+            self._preroll_output.open_output(self._recording_output)
+            self._recording_encoder = self._preroll_encoder
+            return self
+
         self._recording_encoder = H264Encoder()
         self._picam.start_encoder(self._recording_encoder,
-                                  PyavOutput(output_path),
+                                  self._recording_output,
                                   name=stream,
                                   quality=encode_quality)
         # self._picam.start()
@@ -251,8 +274,51 @@ class MyPicamera2(MyPicamera2Interface):
 
     def stop_recording_to_file(self):
         if self._recording_encoder is not None:
-            self._picam.stop_encoder(self._recording_encoder)
+            if self._recording_encoder is self._preroll_encoder:
+                # keep the encoder running, only detach the file
+                self._preroll_output.close_output()
+            else:
+                self._picam.stop_encoder(self._recording_encoder)
             self._recording_encoder = None
+            self._recording_output = None
+        return self
+
+    def split_recording_to_file(self, output_path: str):
+        if self._recording_output is None:
+            raise RuntimeError("No recording in progress.")
+        self._recording_output.split(str(output_path))
+        return self
+
+    def is_preroll_buffering(self) -> bool:
+        return self._preroll_encoder is not None
+
+    def start_preroll_buffer(self,
+                             seconds: int,
+                             stream: str = "main",
+                             encode_quality=None):
+        if encode_quality is None:
+            encode_quality = Quality.MEDIUM
+        if self._recording_encoder is not None:
+            raise RuntimeError("Recording already in progress.")
+        if self.is_preroll_buffering():
+            return self
+
+        self._preroll_output = CircularOutput2(buffer_duration_ms=seconds * 1000)
+        self._preroll_encoder = H264Encoder()
+        self._picam.start_encoder(self._preroll_encoder,
+                                  self._preroll_output,
+                                  name=stream,
+                                  quality=encode_quality)
+        logger.info("Started %s s pre-roll buffer on stream '%s'.", seconds, stream)
+        return self
+
+    def stop_preroll_buffer(self):
+        if self.is_preroll_buffering():
+            if self._recording_encoder is self._preroll_encoder:
+                self.stop_recording_to_file()
+            self._picam.stop_encoder(self._preroll_encoder)
+            self._preroll_encoder = None
+            self._preroll_output = None
         return self
 
     def capture_picture(self):
@@ -264,5 +330,33 @@ class MyPicamera2(MyPicamera2Interface):
         # Return the byte data
         return buffer.getvalue()
     
+    def get_frame_bus(self) -> FrameBus:
+        return self.frame_bus
+
     def capture_buffer(self, stream="main") -> ndarray:
         return self._picam.capture_buffer(stream)
+
+    def get_luminance_layout(self, stream="lores"):
+        """
+        Return cached ((height, width), (row_stride, 1)) of the Y plane
+        in 'stream' buffers. Row stride is read from the configured stream,
+        it is larger than width for widths not aligned by libcamera.
+        """
+        layout = self._luminance_layouts.get(stream)
+        if layout is None:
+            stream_config = self._picam.stream_configuration(stream)
+            width, height = stream_config["size"]
+            stride = stream_config["stride"]
+            layout = ((height, width), (stride, 1))
+            self._luminance_layouts[stream] = layout
+        return layout
+
+    def capture_luminance(self, stream="lores") -> ndarray:
+        buffer = self.capture_buffer(stream)
+        shape, strides = self.get_luminance_layout(stream)
+
+        height, width = shape
+        if buffer.size < (height - 1) * strides[0] + width:
+            raise ValueError(f"Buffer of {buffer.size} bytes is too small for "
+                             f"{width}x{height} Y plane with stride {strides[0]}.")
+        return as_strided(buffer, shape=shape, strides=strides, writeable=False)
@@ -73,11 +73,50 @@ class MyPicamera2Interface(ABC):
         """ If recording, stop recording to file. """
         pass
 
+    @abstractmethod
+    def split_recording_to_file(self, output_path: str):
+        """
+        Continue running recording in a new file 'output_path',
+        switching at the next keyframe without stopping the encoder.
+        """
+        pass
+
+    @abstractmethod
+    def is_preroll_buffering(self) -> bool:
+        pass
+
+    @abstractmethod
+    def start_preroll_buffer(self,
+                             seconds: int,
+                             stream: str = "main",
+                             encode_quality=None):
+        """
+        Start always-on H.264 encoder into in-memory circular buffer
+        holding last 'seconds' of encoded frames.
+        While running, start_recording_to_file flushes the buffer
+        into the file and continues with live frames
+        ('stream' and 'encode_quality' of the pre-roll encoder are used).
+        """
+        pass
+
+    @abstractmethod
+    def stop_preroll_buffer(self):
+        """ If running, stop pre-roll encoder (and its recording). """
+        pass
+
     @abstractmethod
     def capture_picture(self):
         """ Capture an image, return image data. """
         pass
     
+    @abstractmethod
+    def get_frame_bus(self):
+        """
+        FrameBus publishing each lores luminance frame once
+        to all subscribed consumers.
+        """
+        pass
+
     @abstractmethod
     def capture_buffer(self, stream="main") -> ndarray:
         """
@@ -85,3 +124,12 @@ class MyPicamera2Interface(ABC):
         from desired stream (main | lores)
         """
         pass
+
+    @abstractmethod
+    def capture_luminance(self, stream="lores") -> ndarray:
+        """
+        Capture buffer of a YUV420 stream and return
+        zero-copy (height, width) view of its Y plane,
+        respecting the row stride of the stream.
+        """
+        pass
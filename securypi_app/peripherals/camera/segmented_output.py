@@ -0,0 +1,71 @@
+import logging
+from threading import Lock
+
+# Conditional Import for RPi picamera2 library
+try:
+    from picamera2.outputs import Output, PyavOutput # pyright: ignore[reportMissingImports]
+
+except ImportError as e:
+    # Mock sensor classes for platform independent development
+    from securypi_app.peripherals.camera.mock_camera_modules.mock_picamera2 import (
+        MockOutput, MockPyavOutput
+    )
+    Output = MockOutput
+    PyavOutput = MockPyavOutput
+
+
+logger = logging.getLogger(__name__)
+
+
+class SegmentedOutput(Output):
+    """
+    Encoder output writing into a chain of .mp4 files.
+    Switching to the next file happens at the next keyframe,
+    while the encoder keeps running - no frames are lost
+    between segments and the encoder is not re-initialized.
+    """
+
+    def __init__(self, output_path: str, pts=None):
+        super().__init__(pts=pts)
+        self._lock = Lock()
+        self._streams = []  # (encoder_stream, codec_name, kwargs)
+        self._output = PyavOutput(output_path)
+        self._next_output = None
+
+    def _add_stream(self, encoder_stream, codec_name, **kwargs):
+        """ Remember encoder streams, every segment needs them added. """
+        self._streams.append((encoder_stream, codec_name, kwargs))
+        self._output._add_stream(encoder_stream, codec_name, **kwargs)
+
+    def start(self):
+        super().start()
+        with self._lock:
+            self._output.start()
+
+    def stop(self):
+        super().stop()
+        with self._lock:
+            self._output.stop()
+            self._next_output = None
+
+    def split(self, output_path: str):
+        """ Continue into 'output_path' from the next keyframe on. """
+        with self._lock:
+            self._next_output = PyavOutput(output_path)
+
+    def _switch_output(self):
+        """ Close current segment and open the pending one. """
+        self._output.stop()
+        self._output = self._next_output
+        self._next_output = None
+
+        for encoder_stream, codec_name, kwargs in self._streams:
+            self._output._add_stream(encoder_stream, codec_name, **kwargs)
+        self._output.start()
+        logger.debug("Recording continues in a new segment.")
+
+    def outputframe(self, frame, keyframe=True, timestamp=None, packet=None, audio=False):
+        with self._lock:
+            if self._next_output is not None and keyframe and not audio:
+                self._switch_output()
+            self._output.outputframe(frame, keyframe, timestamp, packet, audio)
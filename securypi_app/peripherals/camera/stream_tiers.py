@@ -0,0 +1,154 @@
+"""
+Quality tiers of the MJPEG stream.
+
+Each encoder frame can be delivered as the full JPEG or downscaled
+copies. A tier is encoded lazily, at most once per frame, and only
+when a client asks for it. Clients are moved between tiers by how
+long writing a frame to their socket takes.
+"""
+import io
+import logging
+from threading import Lock
+from typing import NamedTuple
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+class StreamTier(NamedTuple):
+    name: str
+    scale: int          # 1 / scale of the stream resolution
+    quality: int        # JPEG quality of re-encoded frames
+
+
+# from the best to the cheapest
+STREAM_TIERS = (
+    StreamTier("full", 1, 0),   # encoder's JPEG as is
+    StreamTier("half", 2, 75),
+    StreamTier("thumb", 4, 60),
+)
+TIER_NAMES = tuple(tier.name for tier in STREAM_TIERS)
+
+
+def multipart_chunk(frame) -> bytes:
+    """ JPEG 'frame' framed as one part of the multipart MJPEG response. """
+    return b"".join((b"--frame\r\n"
+                     b"Content-Type: image/jpeg\r\n"
+                     b"Content-Length: ", str(len(frame)).encode(), b"\r\n\r\n",
+                     frame, b"\r\n"))
+
+
+def downscale_jpeg(jpeg: bytes, scale: int, quality: int) -> bytes:
+    """ Downscale 'jpeg' by 'scale', see 'resize_jpeg'. """
+    img = Image.open(io.BytesIO(jpeg))
+    width, height = img.size
+    return _encode_resized(img, (max(width // scale, 1), max(height // scale, 1)), quality)
+
+
+def resize_jpeg(jpeg: bytes, width: int, quality: int) -> bytes:
+    """
+    Resize 'jpeg' to 'width' keeping the aspect ratio. Decoding uses
+    the JPEG draft mode, the decoder scales DCT blocks by a power of two
+    instead of decoding full resolution, the rest is a cheap resize.
+    """
+    img = Image.open(io.BytesIO(jpeg))
+    full_width, full_height = img.size
+    height = max(round(full_height * width / full_width), 1)
+    return _encode_resized(img, (width, height), quality)
+
+
+def _encode_resized(img: Image.Image, size: tuple[int, int], quality: int) -> bytes:
+    img.draft(img.mode, size)
+    if img.size != size:
+        img = img.resize(size, Image.Resampling.BILINEAR)
+    buffer = io.BytesIO()
+    img.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+class StreamFrame:
+    """
+    One encoder frame shared by all clients.
+    Multipart chunks of its tiers are built on first request.
+    """
+
+    def __init__(self, jpeg: bytes):
+        self.jpeg = jpeg
+        self._chunks: dict[str, bytes] = {}
+        self._lock = Lock()
+
+    def has_chunk(self, tier: str) -> bool:
+        return tier in self._chunks
+
+    def chunk(self, tier: str = "full") -> bytes:
+        """ Multipart chunk of 'tier', concurrent callers share one encoding. """
+        chunk = self._chunks.get(tier)
+        if chunk is not None:
+            return chunk
+        with self._lock:
+            chunk = self._chunks.get(tier)
+            if chunk is None:
+                chunk = multipart_chunk(self._encode(tier))
+                self._chunks[tier] = chunk
+        return chunk
+
+    def _encode(self, tier: str) -> bytes:
+        stream_tier = STREAM_TIERS[TIER_NAMES.index(tier)]
+        if stream_tier.scale == 1:
+            return self.jpeg
+        try:
+            return downscale_jpeg(self.jpeg, stream_tier.scale, stream_tier.quality)
+        except (OSError, ValueError) as e:
+            logger.debug("Cannot downscale stream frame, sending full: %s", e)
+            return self.jpeg
+
+
+class TierSelector:
+    """
+    Tier of one client, chosen by the time of writing its frames
+    (socket drain) relative to the frame interval.
+    Steps down when writes take more than 'down_ratio' of the interval,
+    back up below 'up_ratio', at most once per 'hold_frames' frames.
+    Every step down doubles the wait before the next step up,
+    a link just too slow for a tier does not flip between two tiers.
+    """
+
+    def __init__(self,
+                 frame_interval: float,
+                 down_ratio: float = 0.5,
+                 up_ratio: float = 0.1,
+                 hold_frames: int = 15,
+                 adaptive: bool = True):
+        self._down = down_ratio * frame_interval
+        self._up = up_ratio * frame_interval
+        self._hold_frames = hold_frames
+        self._adaptive = adaptive
+
+        self._index = 0
+        self._drain = 0.0   # moving average of write seconds
+        self._frames = 0    # since the last switch
+        self._up_hold = hold_frames
+
+    @property
+    def tier(self) -> str:
+        return TIER_NAMES[self._index]
+
+    def update(self, drain_seconds: float) -> str:
+        """ Record write time of a frame, return tier of the next one. """
+        if not self._adaptive:
+            return self.tier
+        self._drain += 0.3 * (drain_seconds - self._drain)
+        self._frames += 1
+        if self._frames < self._hold_frames:
+            return self.tier
+
+        if self._drain > self._down and self._index < len(TIER_NAMES) - 1:
+            self._index += 1
+            self._frames = 0
+            self._up_hold = min(self._up_hold * 2, self._hold_frames * 16)
+        elif (self._drain < self._up and self._index > 0
+              and self._frames >= self._up_hold):
+            self._index -= 1
+            self._frames = 0
+        return self.tier
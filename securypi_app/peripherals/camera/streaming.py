@@ -1,68 +1,199 @@
 import io
 import logging
-from threading import Condition, Timer
-from time import sleep
+import shutil
+import tempfile
+from pathlib import Path
+from threading import Condition, Event, Lock, RLock, Timer
+from time import monotonic, sleep, time
 
 from securypi_app.peripherals.camera.streaming_interface import StreamingInterface
+from securypi_app.peripherals.camera.stream_tiers import StreamFrame, TierSelector
 from securypi_app.models.app_config import AppConfig
 
 # Conditional Import for RPi picamera2 library
 try:
-    from picamera2.encoders import JpegEncoder
-    from picamera2.outputs import FileOutput
+    from picamera2.encoders import JpegEncoder, H264Encoder
+    from picamera2.outputs import FileOutput, FfmpegOutput
 
 except ImportError as e:
     # Mock sensor classes for platform independent development
     from securypi_app.peripherals.camera.mock_camera_modules.mock_picamera2 import (
-        MockEncoder, MockStreamingOutput
+        MockEncoder, MockStreamingOutput, MockFfmpegOutput
     )
     JpegEncoder = MockEncoder
+    H264Encoder = MockEncoder
     FileOutput = MockStreamingOutput
+    FfmpegOutput = MockFfmpegOutput
 
 
 logger = logging.getLogger(__name__)
 
+# end a client stream when the encoder delivers nothing for this long
+FRAME_TIMEOUT_SEC = 10.0
+
+# HLS live mode files, in a subdirectory of 'hls_dir' owned by the app
+HLS_SUBDIR = "securypi_live"
+HLS_PLAYLIST = "live.m3u8"
+HLS_INIT_SEGMENT = "init.mp4"
+HLS_SEGMENT_PATTERN = "segment_%05d.m4s"
+
+
+def hls_output_arguments(live_dir: Path, segment_seconds: int, window_segments: int) -> str:
+    """
+    ffmpeg arguments of FfmpegOutput for a sliding window of fMP4 segments,
+    ffmpeg rewrites the playlist and deletes segments leaving the window.
+    """
+    return (f"-f hls -hls_time {segment_seconds} "
+            f"-hls_list_size {window_segments} "
+            f"-hls_flags delete_segments+independent_segments+temp_file "
+            f"-hls_segment_type fmp4 "
+            f"-hls_fmp4_init_filename {HLS_INIT_SEGMENT} "
+            f"-hls_segment_filename {live_dir / HLS_SEGMENT_PATTERN} "
+            f"{live_dir / HLS_PLAYLIST}")
+
+
+class FrameMailbox:
+    """
+    One-slot mailbox of a streaming client.
+    Holds only the newest undelivered frame, older ones are dropped.
+    """
+
+    def __init__(self):
+        self._frame = None
+        self._closed = False
+        self._lock = Lock()
+        self._ready = Event()
+        self.dropped = 0    # frames replaced before the client took them
+
+    def put(self, frame):
+        with self._lock:
+            if self._frame is not None:
+                self.dropped += 1
+            self._frame = frame
+            self._ready.set()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            self._ready.set()
+
+    def get(self, timeout: float | None = None):
+        """
+        Wait for and take the newest frame.
+        None on timeout or when the mailbox was closed.
+        """
+        if not self._ready.wait(timeout):
+            return None
+        with self._lock:
+            frame, self._frame = self._frame, None
+            self._ready.clear()
+            if self._closed:
+                return None
+            return frame
+
+    def is_closed(self) -> bool:
+        return self._closed
+
 
 class StreamingOutput(io.BufferedIOBase):
     """
-    Handles streaming of camera frames to a HTTP response.
-    Uses a Condition to synchronize access to the latest frame.
+    Handles streaming of camera frames to HTTP responses.
+    Every new frame is wrapped once in a StreamFrame and handed to each
+    connected client's mailbox, clients share its multipart chunks.
+    Clients are paced by frame arrival, slow ones skip to the newest frame
+    and move to smaller tiers.
     """
 
     def __init__(self):
         self.frame = None
+        self.frame_timestamp = 0.0     # time.time() of 'frame'
         self.condition = Condition()
+        self._mailboxes: set[FrameMailbox] = set()
 
     def write(self, buf):
         with self.condition:
             self.frame = buf
+            self.frame_timestamp = time()
+            mailboxes = list(self._mailboxes)
             self.condition.notify_all()
+        if mailboxes:
+            frame = StreamFrame(buf)
+            for mailbox in mailboxes:
+                mailbox.put(frame)
+
+    def latest(self) -> tuple[bytes | None, float]:
+        """ Newest JPEG frame and its timestamp. """
+        with self.condition:
+            return self.frame, self.frame_timestamp
+
+    def client_count(self) -> int:
+        with self.condition:
+            return len(self._mailboxes)
+
+    def close(self):
+        """ End all client streams, e.g. when the encoder stops. """
+        with self.condition:
+            mailboxes = list(self._mailboxes)
+        for mailbox in mailboxes:
+            mailbox.close()
+
+    def subscribe(self) -> FrameMailbox:
+        mailbox = FrameMailbox()
+        with self.condition:
+            self._mailboxes.add(mailbox)
+        return mailbox
+
+    def unsubscribe(self, mailbox: FrameMailbox):
+        with self.condition:
+            self._mailboxes.discard(mailbox)
+
+    def frames(self):
+        """
+        Generator of this client's StreamFrames, the newest one
+        in its mailbox each time. Ends when the stream is closed
+        or no frame arrives for FRAME_TIMEOUT_SEC.
+        """
+        mailbox = self.subscribe()
+        try:
+            while True:
+                frame = mailbox.get(timeout=FRAME_TIMEOUT_SEC)
+                if frame is None:
+                    break
+                yield frame
+        finally:
+            # also on client disconnect (generator closed)
+            self.unsubscribe(mailbox)
 
     def generate_frames(self):
         """
-        Generator function that yields camera frames in byte format.
-        Wailts for a new frame from the camera and
-        yields it as part of a multipart HTTP response.
+        Generator function that yields camera frames in byte format
+        as parts of a multipart HTTP response.
+        The tier of each frame follows how long the server took
+        to write the previous one to the client.
         """
         config = AppConfig.get()
-        framerate = config.camera.streaming.framerate
-        sleep_time = 1 / framerate
-
-        while True:
-            with self.condition:
-                self.condition.wait()
-                frame = self.frame
-            yield (b"--frame\r\n"
-                   b"Content-Type: image/jpeg\r\n"
-                   b"Content-Length: " + f"{len(frame)}".encode() + b"\r\n\r\n" +
-                   frame + b"\r\n")
-            sleep(sleep_time)
+        selector = TierSelector(1 / config.camera.streaming.framerate,
+                                adaptive=config.camera.streaming.adaptive_tiers)
+        frames = self.frames()
+        try:
+            for frame in frames:
+                chunk = frame.chunk(selector.tier)
+                written = monotonic()
+                yield chunk     # resumed once the server wrote the chunk
+                selector.update(monotonic() - written)
+        finally:
+            frames.close()
 
 
 class Streaming(StreamingInterface):
     """
     Extension class of MyPicamera2.
     Handles live MJPEG streaming functionality.
+    The encoder runs while viewers are connected and stops
+    'viewer_grace_seconds' after the last one left.
+
+    HLS live mode: H.264 encoder of the stream writes fMP4 segments
+    into a tmpfs directory, kept running while players request the playlist.
     """
 
     def __init__(self, mycam):
@@ -72,39 +203,168 @@ class Streaming(StreamingInterface):
         self._streaming_output = StreamingOutput()
 
         self._streaming_encoder = None
-        self._stream_timer = None
+        self._stream_timer = None   # grace period after the last viewer
+        self._viewers = 0
+        self._lock = RLock()
+
+        self._live_encoder = None
+        self._live_dir: Path | None = None
+        self._live_timer = None     # stops HLS when players stop polling
 
     def is_streaming(self) -> bool:
         return self._streaming_encoder is not None
 
+    def get_viewer_count(self) -> int:
+        return self._viewers
+
+    def get_latest_frame(self) -> tuple[bytes | None, float]:
+        """ Newest stream JPEG and its timestamp, see StreamingOutput.latest. """
+        return self._streaming_output.latest()
+
     def start_capture_stream(self, stream: str = "lores") -> StreamingOutput:
-        config = AppConfig.get()
-        stream_timeout = config.camera.streaming.timeout_seconds
+        with self._lock:
+            # won't be starting two encoders
+            if self._streaming_encoder is None:
+                self._streaming_encoder = JpegEncoder()
+                self._mycam._picam.start_encoder(self._streaming_encoder,
+                                                 FileOutput(self._streaming_output),
+                                                 name=stream)
+                self._mycam._picam.start()
+                logger.info("Started video streaming.")
 
-        # cancel stream timeout if set - avoid timing out prematurely
-        if self._stream_timer is not None:
-            self._stream_timer.cancel()
-        # won't be starting two encoders
-        if self._streaming_encoder is None:
-            self._streaming_encoder = JpegEncoder()
-            self._mycam._picam.start_encoder(self._streaming_encoder,
-                                             FileOutput(self._streaming_output),
-                                             name=stream)
-            self._mycam._picam.start()
-
-        self._stream_timer = Timer(stream_timeout, self.stop_capture_stream)
-        self._stream_timer.start()
+            if self._viewers == 0:
+                # stop again if no viewer connects
+                self._schedule_stop()
 
         return self._streaming_output
 
-    def stop_capture_stream(self):
-        """ Stop capturing stream. Resets the timeout timer. """
+    def generate_frames(self, stream: str = "lores"):
+        """
+        Multipart MJPEG frames for one viewer, see StreamingOutput.generate_frames.
+        The viewer is counted from the first frame request until
+        the generator ends or is closed by a disconnect.
+        """
+        return self._counted(lambda output: output.generate_frames(), stream)
+
+    def stream_frames(self, stream: str = "lores"):
+        """ StreamFrames for one counted viewer, see StreamingOutput.frames. """
+        return self._counted(lambda output: output.frames(), stream)
+
+    def _counted(self, frames, stream: str):
+        with self._lock:
+            self._viewers += 1
+            self._cancel_stop()
+            output = self.start_capture_stream(stream)
+        try:
+            yield from frames(output)
+        finally:
+            with self._lock:
+                self._viewers -= 1
+                if self._viewers == 0:
+                    self._schedule_stop()
+
+    def _schedule_stop(self):
+        self._cancel_stop()
+        config = AppConfig.get()
+        grace = config.camera.streaming.viewer_grace_seconds
+        self._stream_timer = Timer(grace, self._stop_if_idle)
+        self._stream_timer.daemon = True
+        self._stream_timer.start()
+
+    def _cancel_stop(self):
         if self._stream_timer is not None:
             self._stream_timer.cancel()
             self._stream_timer = None
 
-        if self._streaming_encoder is not None:
-            self._mycam._picam.stop_encoder(self._streaming_encoder)
-            self._streaming_encoder = None
-            logger.info("Stopped video streaming (timer).")
+    def _stop_if_idle(self):
+        with self._lock:
+            # a viewer may have connected while the timer fired
+            if self._viewers == 0:
+                self.stop_capture_stream()
+
+    def stop_capture_stream(self):
+        """ Stop capturing stream, end viewers' streams. Cancels the grace timer. """
+        with self._lock:
+            self._cancel_stop()
+
+            if self._streaming_encoder is not None:
+                self._mycam._picam.stop_encoder(self._streaming_encoder)
+                self._streaming_encoder = None
+                self._streaming_output.close()
+                logger.info("Stopped video streaming.")
+        return self
+
+    # HLS live mode
+    def is_live_segmenting(self) -> bool:
+        return self._live_encoder is not None
+
+    def get_live_dir(self) -> Path:
+        """
+        Directory of HLS playlist and segments, tmpfs if available.
+        Only this subdirectory of 'hls_dir' is ever removed, 'hls_dir'
+        itself is shared (/dev/shm holds other shared memory too).
+        """
+        config = AppConfig.get()
+        hls_dir = Path(config.camera.streaming.hls_dir)
+        if not hls_dir.is_dir():
+            # no /dev/shm outside of Linux
+            hls_dir = Path(tempfile.gettempdir())
+        return hls_dir / HLS_SUBDIR
+
+    def start_live_segments(self, stream: str = "lores") -> Path:
+        """
+        Start or keep alive HLS segmenting into 'get_live_dir'.
+        Stops when not called again for the grace period plus two segments.
+        """
+        config = AppConfig.get().camera.streaming
+        with self._lock:
+            if self._live_encoder is None:
+                live_dir = self.get_live_dir()
+                shutil.rmtree(live_dir, ignore_errors=True)  # stale segments
+                live_dir.mkdir()
+
+                # keyframe at every segment start
+                self._live_encoder = H264Encoder(
+                    bitrate=config.hls_bitrate, repeat=True,
+                    iperiod=config.framerate * config.hls_segment_seconds
+                )
+                output = FfmpegOutput(hls_output_arguments(live_dir,
+                                                           config.hls_segment_seconds,
+                                                           config.hls_window_segments))
+                self._mycam._picam.start_encoder(self._live_encoder, output, name=stream)
+                self._mycam._picam.start()
+                self._live_dir = live_dir
+                logger.info("Started HLS live segments in %s.", live_dir)
+
+            if self._live_timer is not None:
+                self._live_timer.cancel()
+            keep_alive = config.viewer_grace_seconds + 2 * config.hls_segment_seconds
+            self._live_timer = Timer(keep_alive, self.stop_live_segments)
+            self._live_timer.daemon = True
+            self._live_timer.start()
+            return self._live_dir   # pyright: ignore[reportReturnType]
+
+    def wait_live_playlist(self, timeout: float) -> bool:
+        """ Wait until the first segment is listed, e.g. after start. """
+        playlist = self.get_live_dir() / HLS_PLAYLIST
+        deadline = monotonic() + timeout
+        while not playlist.exists():
+            if monotonic() >= deadline or not self.is_live_segmenting():
+                return False
+            sleep(0.1)
+        return True
+
+    def stop_live_segments(self):
+        """ Stop HLS segmenting and remove its files. """
+        with self._lock:
+            if self._live_timer is not None:
+                self._live_timer.cancel()
+                self._live_timer = None
+
+            if self._live_encoder is not None:
+                self._mycam._picam.stop_encoder(self._live_encoder)
+                self._live_encoder = None
+                shutil.rmtree(self._live_dir, ignore_errors=True)   # pyright: ignore[reportArgumentType]
+                self._live_dir = None
+                logger.info("Stopped HLS live segments.")
         return self
@@ -15,7 +15,39 @@ class StreamingInterface(ABC):
         """ Start live streaming mjpeg to the returned StreamingOutput. """
         pass
 
+    @abstractmethod
+    def get_viewer_count(self) -> int:
+        pass
+
+    @abstractmethod
+    def get_latest_frame(self) -> tuple[bytes | None, float]:
+        pass
+
+    @abstractmethod
+    def generate_frames(self, stream: str = "lores"):
+        """ Counted viewer's MJPEG stream, starts streaming if needed. """
+        pass
+
+    @abstractmethod
+    def stream_frames(self, stream: str = "lores"):
+        """ Counted viewer's StreamFrames, starts streaming if needed. """
+        pass
+
     @abstractmethod
     def stop_capture_stream(self):
-        """ If running, stop live streaming mjpeg. Cancel timer if running. """
+        """ If running, stop live streaming mjpeg. Cancel grace timer if running. """
+        pass
+
+    @abstractmethod
+    def is_live_segmenting(self) -> bool:
+        pass
+
+    @abstractmethod
+    def start_live_segments(self, stream: str = "lores"):
+        """ Start or keep alive HLS segmenting, return segments directory. """
+        pass
+
+    @abstractmethod
+    def stop_live_segments(self):
+        """ If running, stop HLS segmenting and remove segments. """
         pass
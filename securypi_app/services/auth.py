@@ -3,10 +3,12 @@ Utility functions as a service around authentication.
 """
 
 import functools
+from http.cookies import SimpleCookie, CookieError
 
 from flask import (
-    redirect, url_for, jsonify, g, session
+    Flask, redirect, url_for, jsonify, g, session
 )
+from itsdangerous import BadSignature
 from werkzeug.security import check_password_hash
 
 from securypi_app.models.user import User
@@ -19,6 +21,29 @@ def is_logged_in():
     return session.get("username") is not None
 
 
+def is_cookie_logged_in(app: Flask, cookie_header: str | None) -> bool:
+    """
+    'is_logged_in' outside of a Flask request:
+    verify the signed session cookie from raw 'Cookie' header
+    the same way the app loads its session.
+    """
+    try:
+        cookies = SimpleCookie(cookie_header or "")
+    except CookieError:
+        return False
+    morsel = cookies.get(app.config["SESSION_COOKIE_NAME"])
+    serializer = app.session_interface.get_signing_serializer(app)  # pyright: ignore[reportAttributeAccessIssue]
+    if morsel is None or serializer is None:
+        return False
+
+    max_age = int(app.permanent_session_lifetime.total_seconds())
+    try:
+        data = serializer.loads(morsel.value, max_age=max_age)
+    except BadSignature:
+        return False
+    return data.get("username") is not None
+
+
 def inject_is_logged_in():
     """ Context processor to inject 'is_logged_in' into template context. """
     return {'is_logged_in': is_logged_in()}
@@ -85,6 +110,22 @@ def admin_rights_required(view):
     return wrapped_view
 
 
+def api_admin_rights_required(view):
+    """
+    Decorate api route to be accessed only by admin,
+    otherwise return json error, 401 or 403.
+    """
+    @functools.wraps(view)
+    def wrapped_view(**kwargs):
+        if not is_logged_in():
+            return jsonify({"error": "unauthenticated"}), 401
+        if not is_logged_in_admin():
+            return jsonify({"error": "forbidden"}), 403
+        return view(**kwargs)
+
+    return wrapped_view
+
+
 def validate_login(username, password) -> tuple[User | None, str | None]:
     """
     Compare login information against database.
@@ -25,6 +25,21 @@ def _parse_positive_int(raw, label) -> tuple[int, None] | tuple[None, str]:
     return v, None
 
 
+def _parse_non_negative_int(raw, label) -> tuple[int, None] | tuple[None, str]:
+    """
+    Check if 'raw' input is non-negative int.
+    On success return it's (int_value, None)
+    Otherwise return (None, string_error_message)
+    """
+    try:
+        v = int(raw)
+    except (ValueError, TypeError):
+        return None, f"{label} must be a non-negative integer, not '{raw}'"
+    if v < 0:
+        return None, f"{label} must be a non-negative integer, not '{raw}'"
+    return v, None
+
+
 def _parse_positive_float(raw, label):
     """
     Check if 'raw' input is positive float.
@@ -71,7 +86,7 @@ def get_streaming_config() -> dict[str, int | tuple[int, int]]:
     streaming_config = {
         "resolution": config.camera.streaming.resolution,
         "framerate": config.camera.streaming.framerate,
-        "timeout seconds": config.camera.streaming.timeout_seconds
+        "viewer grace seconds": config.camera.streaming.viewer_grace_seconds
     }
     return streaming_config
 
@@ -84,7 +99,8 @@ def get_motion_capturing_config() -> dict[str, int | float]:
         "min capture length seconds": config.camera.motion_capturing.min_motion_capture_length_sec,
         "max capture length seconds": config.camera.motion_capturing.max_motion_capture_length_sec,
         "frame change ratio threshold": config.camera.motion_capturing.frame_change_ratio_threshold,
-        "motion captures window size in GB": config.camera.motion_capturing.motion_captures_window_size_gb
+        "motion captures window size in GB": config.camera.motion_capturing.motion_captures_window_size_gb,
+        "pre-roll seconds": config.camera.motion_capturing.pre_roll_seconds
     }
     return motion_capturing_config
 
@@ -153,8 +169,8 @@ def update_streaming_config(current_config: dict[str, int | tuple[int, int]],
     if err:
         return err
 
-    timeout_input = updated_config["timeout seconds"]
-    updated_timeout, err = _parse_positive_int(timeout_input, "Timeout")
+    grace_input = updated_config["viewer grace seconds"]
+    updated_grace, err = _parse_non_negative_int(grace_input, "Viewer grace seconds")
     if err:
         return err
 
@@ -166,8 +182,8 @@ def update_streaming_config(current_config: dict[str, int | tuple[int, int]],
     if updated_framerate != current_config["framerate"]:
         config.camera.streaming.framerate = updated_framerate
         updated = True
-    if updated_timeout != current_config["timeout seconds"]:
-        config.camera.streaming.timeout_seconds = updated_timeout
+    if updated_grace != current_config["viewer grace seconds"]:
+        config.camera.streaming.viewer_grace_seconds = updated_grace
         updated = True
 
     if updated:
@@ -217,6 +233,11 @@ def update_motion_capturing_config(current_config: dict[str, int | float],
     if err:
         return err
 
+    pre_roll_input = updated_config["pre-roll seconds"]
+    pre_roll, err = _parse_non_negative_int(pre_roll_input, "'pre-roll seconds'")
+    if err:
+        return err
+
     config = AppConfig.get()
     updated = False
     if framerate != current_config["motion detection framerate"]:
@@ -234,6 +255,9 @@ def update_motion_capturing_config(current_config: dict[str, int | float],
     if window_size != current_config["motion captures window size in GB"]:
         config.camera.motion_capturing.motion_captures_window_size_gb = window_size
         updated = True
+    if pre_roll != current_config["pre-roll seconds"]:
+        config.camera.motion_capturing.pre_roll_seconds = pre_roll
+        updated = True
 
     if updated:
         config.save()
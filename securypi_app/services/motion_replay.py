@@ -0,0 +1,163 @@
+"""
+Offline replay of frames through the motion detection pipeline.
+
+Frames come from a directory of images, an .npz stack
+or a video file (decoded with PyAV, installed along picamera2),
+and are scored as fast as possible by the same pipeline
+and thresholds MotionCapturing uses. Frames are decimated by their
+timestamps to the detection rate, so consecutive scored frames are
+as far apart as on the camera.
+"""
+import time
+from pathlib import Path
+from typing import Iterator, NamedTuple
+
+import numpy as np   # pyright: ignore[reportMissingImports]
+from PIL import Image
+
+try:
+    import av   # pyright: ignore[reportMissingImports]
+except ImportError:
+    av = None
+
+from securypi_app.models.app_config import MotionCaptureConfig
+from securypi_app.peripherals.camera.motion_detectors.detection_pipeline import (
+    create_detection_pipeline
+)
+from securypi_app.peripherals.camera.motion_detectors.threshold_calibration import (
+    ThresholdCalibrator
+)
+
+
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".bmp", ".pgm", ".tif", ".tiff"}
+
+
+class ReplayResult(NamedTuple):
+    frames: int
+    triggers: list[float]          # seconds from the first frame
+    latencies: np.ndarray          # seconds per scored frame
+    scoring_seconds: float         # total time spent scoring
+
+    @property
+    def fps(self) -> float:
+        if self.scoring_seconds == 0:
+            return 0.0
+        return self.frames / self.scoring_seconds
+
+
+def _to_luminance(image: Image.Image, size: tuple[int, int] | None) -> np.ndarray:
+    if size is not None and image.size != size:
+        image = image.resize(size, Image.Resampling.BILINEAR)
+    return np.asarray(image.convert("L"))
+
+
+def _stack_to_luminance(stack: np.ndarray) -> np.ndarray:
+    """ (N, H, W) luminance from a stack of gray or RGB frames. """
+    if stack.ndim == 4:
+        weights = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+        stack = stack[..., :3] @ weights
+    return np.clip(stack, 0, 255).astype(np.uint8, copy=False)
+
+
+def load_frames(path: Path,
+                framerate: float,
+                size: tuple[int, int] | None = None) -> Iterator[tuple[float, np.ndarray]]:
+    """
+    Yield (timestamp in seconds, uint8 luminance frame) from:
+    - directory of images, sorted by name, 'framerate' apart
+    - .npz with 'frames' (N, H, W[, 3]) (or its first array)
+      and optional 'timestamps'
+    - video file, with its own timestamps (requires PyAV)
+    Frames are resized to 'size' (width, height), if given.
+    """
+    path = Path(path)
+    if path.is_dir():
+        files = sorted(p for p in path.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)
+        for i, file in enumerate(files):
+            with Image.open(file) as image:
+                yield i / framerate, _to_luminance(image, size)
+
+    elif path.suffix.lower() == ".npz":
+        with np.load(path) as data:
+            frames = data["frames"] if "frames" in data else data[data.files[0]]
+            timestamps = data["timestamps"] if "timestamps" in data else None
+        frames = _stack_to_luminance(frames)
+        for i, frame in enumerate(frames):
+            t = float(timestamps[i]) if timestamps is not None else i / framerate
+            if size is not None:
+                frame = _to_luminance(Image.fromarray(frame), size)
+            yield t, frame
+
+    else:
+        if av is None:
+            raise RuntimeError("Decoding videos requires PyAV ('pip install av').")
+        with av.open(str(path)) as container:
+            start = None
+            for video_frame in container.decode(video=0):
+                t = video_frame.time or 0.0
+                start = t if start is None else start
+                yield t - start, _to_luminance(video_frame.to_image(), size)
+
+
+def replay(frames: Iterator[tuple[float, np.ndarray]],
+           config: MotionCaptureConfig,
+           rate: float | None = None) -> ReplayResult:
+    """
+    Score 'frames' with the pipeline and thresholds of 'config',
+    at most 'rate' frames per second of their timestamps
+    (default 'motion_detection_framerate', the active rate).
+    A trigger is a start of a motion capture - motion after at least
+    'min_motion_capture_length_sec' without motion.
+    """
+    interval = 1 / (rate or config.motion_detection_framerate)
+    pipeline = create_detection_pipeline(config)
+    calibrator = None
+    if config.auto_threshold:
+        calibrator = ThresholdCalibrator(quantile=config.auto_threshold_quantile,
+                                         multiplier=config.auto_threshold_multiplier,
+                                         min_threshold=config.auto_threshold_min,
+                                         max_threshold=config.auto_threshold_max)
+
+    base_threshold = config.frame_change_ratio_threshold
+    triggers = []
+    latencies = []
+    last_detected = None
+    resolution = None
+    next_time = None
+    try:
+        for t, frame in frames:
+            # paced like the frame bus, never catching up with bursts
+            if next_time is not None and t < next_time - 1e-6:
+                continue
+            next_time = t + interval if next_time is None else max(next_time + interval, t)
+
+            if frame.shape != resolution:
+                resolution = frame.shape
+                pipeline.resize((frame.shape[1], frame.shape[0])).reset()
+
+            threshold = base_threshold
+            if calibrator is not None:
+                threshold = calibrator.threshold(default=base_threshold)
+
+            start = time.perf_counter()
+            ratio = pipeline.score(frame, base_threshold, exit_threshold=threshold)
+            latencies.append(time.perf_counter() - start)
+            if ratio is None:
+                continue
+
+            recording = (last_detected is not None
+                         and t - last_detected <= config.min_motion_capture_length_sec)
+            if ratio >= threshold:
+                if not recording:
+                    triggers.append(t)
+                last_detected = t
+            elif calibrator is not None and not recording:
+                calibrator.update(ratio)
+    finally:
+        pipeline.close()
+
+    latencies = np.array(latencies)
+    return ReplayResult(frames=len(latencies),
+                        triggers=triggers,
+                        latencies=latencies,
+                        scoring_seconds=float(latencies.sum()))
@@ -0,0 +1,197 @@
+"""
+Snapshots of the camera for '/picture.jpg'.
+
+While the MJPEG stream runs, its newest frame is served as is.
+Otherwise concurrent requests share a single capture (single-flight)
+and captures younger than COALESCE_WINDOW_SEC are reused.
+Resized copies are encoded in a small thread pool and kept
+in a byte-bounded LRU cache.
+"""
+import hashlib
+import io
+import logging
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Condition, Lock
+from typing import Callable, NamedTuple
+
+from PIL import Image
+
+from securypi_app.peripherals.camera.mycam import MyPicamera2
+from securypi_app.peripherals.camera.stream_tiers import resize_jpeg
+
+logger = logging.getLogger(__name__)
+
+COALESCE_WINDOW_SEC = 0.5       # captures younger than this are shared
+STREAM_FRAME_MAX_AGE_SEC = 1.0  # older stream frames mean a stalled stream
+CAPTURE_WAIT_TIMEOUT_SEC = 10.0
+
+RESIZE_WORKERS = 2
+RESIZE_TIMEOUT_SEC = 10.0
+RESIZED_CACHE_BYTES = 8 * 1024 * 1024
+DEFAULT_QUALITY = 80
+
+
+class Snapshot(NamedTuple):
+    jpeg: bytes
+    timestamp: float    # time.time() of the frame
+    etag: str
+    sequence: int       # increments with every new snapshot
+
+
+class SnapshotCoalescer:
+    """ Latest snapshot with single-flight capturing. """
+
+    def __init__(self, window: float = COALESCE_WINDOW_SEC):
+        self._window = window
+        self._latest: Snapshot | None = None
+        self._capturing = False
+        self._sequence = 0
+        self._condition = Condition()
+
+    def _store(self, jpeg: bytes, timestamp: float) -> Snapshot:
+        """ Caller holds the condition. """
+        self._sequence += 1
+        etag = hashlib.blake2b(jpeg, digest_size=12).hexdigest()
+        self._latest = Snapshot(jpeg, timestamp, etag, self._sequence)
+        return self._latest
+
+    def from_stream(self, jpeg: bytes, timestamp: float) -> Snapshot:
+        """ Snapshot of a stream frame, hashed once per frame. """
+        with self._condition:
+            latest = self._latest
+            if latest is not None and latest.jpeg is jpeg:
+                return latest
+            return self._store(jpeg, timestamp)
+
+    def capture(self, capture: Callable[[], bytes]) -> Snapshot:
+        """
+        Recent snapshot, or the result of 'capture' shared with
+        all requests arriving while it runs.
+        """
+        with self._condition:
+            while True:
+                latest = self._latest
+                if latest is not None and time.time() - latest.timestamp < self._window:
+                    return latest
+                if not self._capturing:
+                    break
+                # another request is capturing, wait for its result
+                if not self._condition.wait(CAPTURE_WAIT_TIMEOUT_SEC):
+                    raise TimeoutError("Timed out waiting for snapshot capture.")
+            self._capturing = True
+
+        try:
+            jpeg = capture()
+        except Exception:
+            with self._condition:
+                self._capturing = False
+                self._condition.notify_all()  # next waiter tries itself
+            raise
+
+        with self._condition:
+            self._capturing = False
+            snapshot = self._store(jpeg, time.time())
+            self._condition.notify_all()
+            return snapshot
+
+
+class ResizedCache:
+    """
+    LRU cache of resized snapshots keyed by (sequence, width, quality),
+    bounded by the total size of the cached JPEGs. Resizes run in
+    a small thread pool, concurrent requests of one key share it.
+    """
+
+    def __init__(self, max_bytes: int = RESIZED_CACHE_BYTES, workers: int = RESIZE_WORKERS):
+        self._max_bytes = max_bytes
+        self._workers = workers
+        self._entries: OrderedDict[tuple[int, int, int], bytes] = OrderedDict()
+        self._bytes = 0
+        self._pending: dict[tuple[int, int, int], Future] = {}
+        self._pool: ThreadPoolExecutor | None = None
+        self._lock = Lock()
+
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, snapshot: Snapshot, width: int, quality: int) -> bytes:
+        key = (snapshot.sequence, width, quality)
+        with self._lock:
+            jpeg = self._entries.get(key)
+            if jpeg is not None:
+                self._entries.move_to_end(key)
+                return jpeg
+            future = self._pending.get(key)
+            submitted = future is None
+            if submitted:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(self._workers,
+                                                    thread_name_prefix="snapshot-resize")
+                future = self._pool.submit(resize_jpeg, snapshot.jpeg, width, quality)
+                self._pending[key] = future
+        if submitted:
+            # outside of the lock, runs right away if already done
+            future.add_done_callback(lambda done: self._finish(key, done))
+        return future.result(RESIZE_TIMEOUT_SEC)
+
+    def _finish(self, key: tuple[int, int, int], future: Future):
+        with self._lock:
+            self._pending.pop(key, None)
+            if future.exception() is not None:
+                return
+            jpeg = future.result()
+            if len(jpeg) > self._max_bytes:
+                return
+            self._entries[key] = jpeg
+            self._bytes += len(jpeg)
+            while self._bytes > self._max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+
+_snapshots = SnapshotCoalescer()
+_resized = ResizedCache()
+
+
+def get_snapshot(camera: MyPicamera2) -> Snapshot:
+    """
+    Newest MJPEG stream frame if the stream runs (no encoding),
+    otherwise a coalesced still capture.
+    """
+    if camera.streaming.is_streaming():
+        jpeg, timestamp = camera.streaming.get_latest_frame()
+        if jpeg is not None and time.time() - timestamp < STREAM_FRAME_MAX_AGE_SEC:
+            return _snapshots.from_stream(jpeg, timestamp)
+
+    return _snapshots.capture(camera.capture_picture)
+
+
+def get_snapshot_jpeg(snapshot: Snapshot,
+                      width: int | None = None,
+                      quality: int | None = None) -> tuple[bytes, str]:
+    """
+    JPEG of 'snapshot' and its ETag, resized to 'width'
+    (never enlarged) and/or re-encoded with 'quality'.
+    """
+    if width is None and quality is None:
+        return snapshot.jpeg, snapshot.etag
+
+    full_width = _jpeg_width(snapshot.jpeg)
+    width = min(width or full_width, full_width)
+    quality = quality or DEFAULT_QUALITY
+    jpeg = _resized.get(snapshot, width, quality)
+    return jpeg, f"{snapshot.etag}-{width}-{quality}"
+
+
+def _jpeg_width(jpeg: bytes) -> int:
+    """ Width from the JPEG header, without decoding. """
+    with Image.open(io.BytesIO(jpeg)) as img:
+        return img.size[0]
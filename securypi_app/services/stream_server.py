@@ -0,0 +1,292 @@
+"""
+Asyncio MJPEG streaming server.
+
+Serves '/stream.mjpeg' from one event loop in a background thread,
+so viewers do not hold WSGI worker threads for the lifetime
+of their connection. One bridge thread reads the camera stream
+as a single counted viewer and hands every frame to all connected
+clients; slow clients skip to the newest frame and move to smaller
+stream tiers. Access requires the Flask session cookie of a logged in user.
+"""
+import asyncio
+import ipaddress
+import json
+import logging
+from threading import Thread, Event, Lock
+from typing import Callable, Iterator
+
+from flask import Flask
+
+from securypi_app.models.app_config import AppConfig
+from securypi_app.peripherals.camera.mycam import MyPicamera2
+from securypi_app.peripherals.camera.stream_tiers import StreamFrame, TierSelector
+from securypi_app.services.auth import is_cookie_logged_in
+
+logger = logging.getLogger(__name__)
+
+STREAM_PATH = "/stream.mjpeg"
+REQUEST_TIMEOUT_SEC = 5.0
+REQUEST_HEAD_LIMIT = 16384  # bytes of request line and headers
+
+STREAM_HEAD = (b"HTTP/1.1 200 OK\r\n"
+               b"Content-Type: multipart/x-mixed-replace; boundary=frame\r\n"
+               b"Cache-Control: no-cache, private\r\n"
+               b"Connection: close\r\n\r\n")
+
+
+def _is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host.strip("[]")).is_loopback
+    except ValueError:
+        return False    # host name
+
+
+def _error_response(status: str, error: str) -> bytes:
+    body = json.dumps({"error": error}).encode()
+    return (f"HTTP/1.1 {status}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n").encode() + body
+
+
+class StreamServer:
+    """
+    Asyncio MJPEG server of frames from 'frame_source'.
+    'frame_source' returns a blocking iterator of StreamFrames (a generator,
+    closed when no client is left), it is started on the first client.
+    Client tiers adapt to their drain times unless 'adaptive' is False.
+    """
+
+    def __init__(self,
+                 app: Flask,
+                 frame_source: Callable[[], Iterator[StreamFrame]],
+                 host: str = "localhost",
+                 port: int = 0,
+                 framerate: int = 15,
+                 adaptive: bool = True):
+        self._app = app
+        self._frame_source = frame_source
+        self.host = host
+        self.port = port    # bound port once started
+        self._frame_interval = 1 / framerate
+        self._adaptive = adaptive
+
+        self._thread: Thread | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._started = Event()
+        self._start_error: Exception | None = None
+        self._stopping: asyncio.Event | None = None
+
+        # owned by the event loop
+        self._viewers: set[asyncio.Event] = set()
+        self._frame: StreamFrame | None = None
+        self._generation = 0    # changes when the frame source ended
+        self._bridge: Thread | None = None
+
+    def start(self) -> "StreamServer":
+        self._thread = Thread(target=asyncio.run, args=(self._serve(),),
+                              name="stream-server", daemon=True)
+        self._thread.start()
+        self._started.wait()
+        if self._start_error is not None:
+            self._thread = None
+            raise self._start_error
+        logger.info("Asyncio MJPEG server listening on %s:%s.", self.host, self.port)
+        return self
+
+    def stop(self):
+        if self._thread is None or self._loop is None or self._stopping is None:
+            return
+        self._loop.call_soon_threadsafe(self._stopping.set)
+        self._thread.join(timeout=5.0)
+        self._thread = None
+
+    def viewer_count(self) -> int:
+        return len(self._viewers)
+
+    def is_reachable_from(self, host: str) -> bool:
+        """
+        Whether clients connecting to 'host' can reach the server,
+        a loopback bind address serves loopback clients only.
+        """
+        return not _is_loopback(self.host) or _is_loopback(host)
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        try:
+            server = await asyncio.start_server(self._handle, self.host, self.port,
+                                                limit=REQUEST_HEAD_LIMIT)
+        except OSError as e:
+            self._start_error = e
+            self._started.set()
+            return
+        self.port = server.sockets[0].getsockname()[1]
+        self._started.set()
+
+        async with server:
+            await self._stopping.wait()
+            server.close()
+            # end open streams
+            self._generation += 1
+            for viewer in self._viewers:
+                viewer.set()
+            await asyncio.sleep(0)
+
+    # clients
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"),
+                                          REQUEST_TIMEOUT_SEC)
+            method, path, headers = self._parse_head(head)
+
+            if method != "GET" or path.split("?", 1)[0] != STREAM_PATH:
+                writer.write(_error_response("404 Not Found", "not found"))
+            elif not is_cookie_logged_in(self._app, headers.get("cookie")):
+                writer.write(_error_response("401 Unauthorized", "unauthenticated"))
+            else:
+                writer.write(STREAM_HEAD)
+                await self._stream(writer)
+            await writer.drain()
+        except (ConnectionError, ValueError, asyncio.TimeoutError,
+                asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass    # disconnected or malformed request
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _parse_head(head: bytes) -> tuple[str, str, dict[str, str]]:
+        """ Method, path and lowercase headers of the request head. """
+        lines = head.decode("latin-1").split("\r\n")
+        method, path, _ = lines[0].split(" ", 2)
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(":")
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+        return method, path, headers
+
+    async def _stream(self, writer: asyncio.StreamWriter):
+        """ Write the newest frame whenever one arrives and the client drained. """
+        loop = asyncio.get_running_loop()
+        selector = TierSelector(self._frame_interval, adaptive=self._adaptive)
+        ready = asyncio.Event()
+        self._viewers.add(ready)
+        if self._bridge is None:
+            self._start_bridge()
+        generation = self._generation
+        try:
+            while True:
+                await ready.wait()
+                ready.clear()
+                frame = self._frame
+                if self._generation != generation or frame is None:
+                    break
+                tier = selector.tier
+                if frame.has_chunk(tier):
+                    chunk = frame.chunk(tier)
+                else:
+                    # encoding a tier would stall all clients
+                    chunk = await loop.run_in_executor(None, frame.chunk, tier)
+                written = loop.time()
+                writer.write(chunk)
+                await writer.drain()
+                selector.update(loop.time() - written)
+        finally:
+            self._viewers.discard(ready)
+
+    # frame source
+    def _start_bridge(self):
+        self._bridge = Thread(target=self._run_bridge, name="stream-server-bridge",
+                              daemon=True)
+        self._bridge.start()
+
+    def _run_bridge(self):
+        """ Read the frame source while there are viewers. """
+        loop = self._loop
+        ended = True
+        frames = None
+        try:
+            frames = self._frame_source()
+            for frame in frames:
+                loop.call_soon_threadsafe(self._publish, frame) # pyright: ignore[reportOptionalMemberAccess]
+                if not self._viewers:
+                    ended = False
+                    break
+        except Exception as e:
+            logger.warning("Asyncio MJPEG server frame source failed: %s", e)
+        finally:
+            close = getattr(frames, "close", None)
+            if close is not None:
+                close()
+            try:
+                loop.call_soon_threadsafe(self._bridge_done, ended) # pyright: ignore[reportOptionalMemberAccess]
+            except RuntimeError:
+                pass    # event loop already closed
+
+    def _publish(self, frame: StreamFrame):
+        self._frame = frame
+        for viewer in self._viewers:
+            viewer.set()
+
+    def _bridge_done(self, ended: bool):
+        self._bridge = None
+        if not self._viewers:
+            return
+        if ended:
+            # stream stopped, end the clients' responses as the WSGI route does
+            self._generation += 1
+            for viewer in self._viewers:
+                viewer.set()
+        else:
+            # a client connected while the bridge was leaving
+            self._start_bridge()
+
+
+def start_stream_server(app: Flask) -> StreamServer | None:
+    """
+    Start the asyncio MJPEG server of the camera stream
+    if 'async_server_port' is configured.
+    """
+    config = AppConfig.get().camera.streaming
+    if config.async_server_port == 0 or app.testing:
+        return None
+
+    def camera_frames():
+        with app.app_context():
+            camera = MyPicamera2.get_instance()
+        return camera.streaming.stream_frames()
+
+    server = StreamServer(app, camera_frames,
+                          host=config.async_server_host,
+                          port=config.async_server_port,
+                          framerate=config.framerate,
+                          adaptive=config.adaptive_tiers)
+    try:
+        return server.start()
+    except OSError as e:
+        logger.error("Cannot start asyncio MJPEG server: %s", e)
+        return None
+
+
+def init_stream_server(app: Flask):
+    """
+    Start the asyncio MJPEG server with the first request of 'app',
+    CLI commands (init-db, register-user, ...) never serve requests,
+    so they never bind its port or open the camera.
+    """
+    app.extensions["stream_server"] = None
+    lock = Lock()
+    started = False
+
+    @app.before_request
+    def start_with_first_request():
+        nonlocal started
+        if started:
+            return
+        with lock:
+            if not started:
+                app.extensions["stream_server"] = start_stream_server(app)
+                started = True
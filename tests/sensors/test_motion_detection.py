@@ -0,0 +1,665 @@
+import pytest
+import numpy as np
+from multiprocessing.shared_memory import SharedMemory
+from PIL import Image
+
+from securypi_app.peripherals.camera.motion_detectors.frame_difference_detector import (
+    FrameDifferenceDetector
+)
+from securypi_app.peripherals.camera.motion_detectors.background_model_detector import (
+    BackgroundModelDetector
+)
+from securypi_app.peripherals.camera.motion_detectors.motion_zones import (
+    MotionZone, MotionZones
+)
+from securypi_app.peripherals.camera.motion_detectors.blob_filter import BlobFilter
+from securypi_app.peripherals.camera.motion_detectors.tiled_detector import TiledDetector
+from securypi_app.peripherals.camera.motion_detectors.score_telemetry import (
+    ScoreTelemetry
+)
+from securypi_app.peripherals.camera.motion_detectors.threshold_calibration import (
+    QuantileTracker, ThresholdCalibrator
+)
+from securypi_app.peripherals.camera.motion_detectors.detection_pipeline import (
+    DetectionPipeline, create_detection_pipeline
+)
+from securypi_app.peripherals.camera.motion_detectors.detection_rate import (
+    AdaptiveDetectionRate
+)
+from securypi_app.peripherals.camera.motion_detectors.detection_worker import (
+    DetectionWorker
+)
+from securypi_app.models.app_config import MotionCaptureConfig
+from securypi_app.services.motion_replay import load_frames, replay
+from securypi_app.peripherals.camera.mock_camera_modules.mock_scene import (
+    MockScene, MovingObject, LightingStep
+)
+
+
+"""
+Motion detection engines tests using pytest
+"""
+
+
+def textured_frame(width=320, height=180, seed=0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return rng.integers(60, 200, (height, width), dtype=np.uint8)
+
+
+class TestFrameDifferenceDetector():
+
+    @pytest.fixture
+    def detector(self):
+        yield FrameDifferenceDetector().resize((320, 180))
+
+    def test_first_frame(self, detector):
+        assert detector.score(textured_frame()) is None
+
+    def test_static_scene(self, detector):
+        frame = textured_frame()
+        detector.score(frame)
+        assert detector.score(frame) == 0.0
+
+    def test_moving_object(self, detector):
+        frame = textured_frame()
+        detector.score(frame)
+
+        moved = frame.copy()
+        moved[40:80, 100:160] = 255
+        ratio = detector.score(moved)
+        # changed block is 40 x 60 pixels, smoothing widens its edges
+        assert ratio == pytest.approx(40 * 60 / (320 * 180), rel=0.25)
+        assert detector.changed_mask[60, 130]
+        assert not detector.changed_mask[150, 10]
+
+    def test_buffers_reused(self, detector):
+        buffers = {id(detector._current), id(detector._previous)}
+        for seed in range(3):
+            detector.score(textured_frame(seed=seed))
+        assert {id(detector._current), id(detector._previous)} == buffers
+
+        # same resolution does not reallocate
+        detector.resize((320, 180))
+        assert {id(detector._current), id(detector._previous)} == buffers
+
+    def test_reconfigured_resolution(self, detector):
+        detector.score(textured_frame())
+        assert detector.score(textured_frame(640, 360)) is None
+        assert detector.changed_mask.shape == (360, 640)
+
+    def test_illumination_step(self):
+        detector = FrameDifferenceDetector(compensate_illumination=True).resize((320, 180))
+        uncompensated = FrameDifferenceDetector().resize((320, 180))
+        frame = textured_frame()
+        detector.score(frame)
+        uncompensated.score(frame)
+
+        # lights on: whole frame 40 levels brighter
+        brighter = frame + np.uint8(40)
+        assert detector.score(brighter) == 0.0
+        assert uncompensated.score(brighter) == 1.0
+
+        moved = brighter.copy()
+        moved[40:80, 100:160] = 30
+        assert detector.score(moved) > 0.03
+
+
+class TestTiledDetector():
+
+    @pytest.fixture
+    def detector(self):
+        detector = TiledDetector(FrameDifferenceDetector, tiles=4).resize((320, 180))
+        yield detector
+        detector.close()
+
+    def test_matches_whole_frame(self, detector):
+        whole = FrameDifferenceDetector().resize((320, 180))
+        frame = textured_frame()
+        moved = frame.copy()
+        # block across the border of the first two tiles
+        moved[30:60, 100:160] = 250
+
+        for f in (frame, moved):
+            assert detector.score(f) == whole.score(f)
+        assert np.array_equal(detector.changed_mask, whole.changed_mask)
+
+    @pytest.mark.parametrize("engine", [FrameDifferenceDetector, BackgroundModelDetector])
+    def test_matches_whole_frame_compensated(self, engine):
+        """ A subject filling a third of a tile is not cancelled by tile brightness. """
+        def create():
+            return engine(compensate_illumination=True)
+        tiled = TiledDetector(create, tiles=4).resize((320, 180))
+        whole = create().resize((320, 180))
+        frame = textured_frame()
+        moved = frame + np.uint8(20)
+        moved[0:40, 100:220] = 250  # 8 % of the frame, 33 % of the first tile
+
+        try:
+            for f in (frame, moved):
+                assert tiled.score(f) == whole.score(f)
+            assert np.array_equal(tiled.changed_mask, whole.changed_mask)
+            assert tiled.tile_ratios[0] > 0.3
+            assert tiled.tile_ratios[1] < 0.05
+        finally:
+            tiled.close()
+
+    def test_tile_ratios(self, detector):
+        frame = textured_frame()
+        detector.score(frame)
+        moved = frame.copy()
+        moved[100:130, 100:160] = 250
+        detector.score(moved)
+
+        active = [ratio > 0 for ratio in detector.tile_ratios]
+        assert active == [False, False, True, False]
+
+    def test_restarts_after_close(self, detector):
+        detector.close()
+        assert detector.score(textured_frame()) is None
+        assert detector.score(textured_frame()) == 0.0
+
+
+class TestBackgroundModelDetector():
+
+    @pytest.fixture
+    def detector(self):
+        yield BackgroundModelDetector(learning_rate=0.05).resize((320, 180))
+
+    def test_first_frame(self, detector):
+        assert detector.score(textured_frame()) is None
+
+    def test_sensor_noise(self, detector):
+        rng = np.random.default_rng(1)
+        frame = textured_frame()
+        detector.score(frame)
+        for _ in range(10):
+            noisy = np.clip(frame + rng.normal(0, 3, frame.shape), 0, 255)
+            assert detector.score(noisy.astype(np.uint8)) == 0.0
+
+    def test_slow_moving_subject(self, detector):
+        """ Subject moving 1 px per frame is lost by frame differencing. """
+        difference = FrameDifferenceDetector().resize((320, 180))
+        frame = textured_frame()
+        detector.score(frame)
+        difference.score(frame)
+
+        for x in range(100, 110):
+            moved = frame.copy()
+            moved[40:80, x:x + 60] = 250
+            background_ratio = detector.score(moved)
+            difference_ratio = difference.score(moved)
+
+        assert background_ratio > 5 * difference_ratio
+        assert detector.changed_mask[60, 140]
+
+    def test_illumination_step(self):
+        detector = BackgroundModelDetector(compensate_illumination=True).resize((320, 180))
+        frame = textured_frame()
+        detector.score(frame)
+        for offset in (0, 30, 30):
+            assert detector.score(frame + np.uint8(offset)) == 0.0
+
+        moved = frame + np.uint8(30)
+        moved[40:80, 100:160] = 255
+        assert detector.score(moved) > 0.03
+
+
+class TestMotionZones():
+
+    @pytest.fixture
+    def zones(self):
+        """ 'door' watched closely, 'street' with a loose threshold. """
+        yield MotionZones([
+            MotionZone("door", [(0.5, 0.0), (1.0, 0.0), (1.0, 0.5), (0.5, 0.5)], 0.005),
+            MotionZone("street", [(0.5, 0.5), (1.0, 0.5), (1.0, 1.0), (0.5, 1.0)], 0.5),
+        ])
+
+    def test_crop(self, zones):
+        frame = textured_frame()
+        cropped = zones.crop(frame)
+        assert cropped.shape == (180, 160)
+        assert np.shares_memory(cropped, frame)
+        assert zones.crop_resolution((320, 180)) == (160, 180)
+
+    def test_per_zone_thresholds(self, zones):
+        zones.crop(textured_frame())
+        mask = np.zeros((180, 160), dtype=np.bool_)
+
+        mask[10:20, 10:20] = True  # 100 px in 'door' (160 x 90 px)
+        assert zones.score(mask, threshold=0.001) >= 0.001
+        assert zones.ratios["door"] == pytest.approx(100 / (160 * 90), rel=0.05)
+
+        mask[:] = False
+        mask[100:110, 10:20] = True  # same 100 px in 'street'
+        assert zones.score(mask, threshold=0.001) < 0.001
+
+    @pytest.mark.parametrize("coarse_decimation", [1, 4])
+    def test_thin_zone(self, coarse_decimation):
+        # one pixel column at 320 px
+        zones = MotionZones([MotionZone("pole", [(0.5, 0.0), (0.501, 0.0), (0.501, 1.0)], 0.01)])
+        coarse_detector = FrameDifferenceDetector() if coarse_decimation > 1 else None
+        pipeline = DetectionPipeline(FrameDifferenceDetector(), zones,
+                                     coarse_detector=coarse_detector,
+                                     coarse_decimation=coarse_decimation)
+        pipeline.resize((320, 180))
+
+        frame = textured_frame()
+        assert pipeline.score(frame, 0.01) is None
+        assert pipeline.score(frame, 0.01) == 0.0
+        assert zones.crop_resolution((320, 180)) == (3 * coarse_decimation, 180)
+
+    def test_pipeline_ignores_outside_zones(self, zones):
+        pipeline = DetectionPipeline(FrameDifferenceDetector(), zones)
+        pipeline.resize((320, 180))
+
+        frame = textured_frame()
+        assert pipeline.score(frame, 0.001) is None
+
+        outside = frame.copy()
+        outside[10:80, 10:100] = 255  # left half is outside of all zones
+        assert pipeline.score(outside, 0.001) == 0.0
+
+        inside = outside.copy()
+        inside[10:50, 200:260] = 255  # door
+        assert pipeline.score(inside, 0.001) >= 0.001
+
+
+class CountingDetector(FrameDifferenceDetector):
+    """ Counts full-frame scoring calls. """
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def score(self, frame, level=None):
+        self.calls += 1
+        return super().score(frame, level)
+
+
+class TestCoarseDetection():
+
+    @pytest.fixture
+    def pipeline(self):
+        yield DetectionPipeline(CountingDetector(),
+                                coarse_detector=FrameDifferenceDetector(),
+                                coarse_decimation=4).resize((320, 180))
+
+    def test_idle_scene_exits_early(self, pipeline):
+        frame = textured_frame()
+        for _ in range(5):
+            assert pipeline.score(frame, 0.01) in (None, 0.0)
+        # only the first frame reaches the full-frame detector
+        assert pipeline.detector.calls == 1
+
+    def test_motion_reaches_full_frame(self, pipeline):
+        frame = textured_frame()
+        for _ in range(3):
+            pipeline.score(frame, 0.01)
+
+        moved = frame.copy()
+        moved[40:80, 100:160] = 250
+        # stale differencing restarts from the last skipped frame
+        ratio = pipeline.score(moved, 0.01)
+        assert pipeline.detector.calls == 3
+        assert ratio == pytest.approx(40 * 60 / (320 * 180), rel=0.25)
+
+        moved[40:80, 200:260] = 250
+        ratio = pipeline.score(moved, 0.01)
+        assert pipeline.detector.calls == 4
+        assert ratio == pytest.approx(40 * 60 / (320 * 180), rel=0.25)
+
+    def test_noise_filtered_after_early_exit(self):
+        """ The tick after an early exit must not skip the blob filter. """
+        config = MotionCaptureConfig(capture_motion_in_background=False,
+                                     motion_detection_framerate=4,
+                                     frame_change_ratio_threshold=0.0011,
+                                     min_motion_capture_length_sec=5,
+                                     max_motion_capture_length_sec=60,
+                                     motion_captures_window_size_gb=1.0,
+                                     coarse_decimation=4,
+                                     blob_filter=True,
+                                     min_blob_area_ratio=0.002)
+        pipeline = create_detection_pipeline(config).resize((320, 180))
+        frame = textured_frame()
+        for _ in range(2):
+            pipeline.score(frame, 0.0011)
+
+        rng = np.random.default_rng(3)
+        noisy = frame.copy()
+        noisy.reshape(-1)[rng.choice(noisy.size, noisy.size // 500, replace=False)] = 255
+        # restart tick after the early exits scores like the full frame
+        reference = create_detection_pipeline(
+            config.model_copy(update={"coarse_decimation": 1})).resize((320, 180))
+        for f in (frame, frame):
+            reference.score(f, 0.0011)
+        for _ in range(2):
+            assert pipeline.score(noisy, 0.0011) == reference.score(noisy, 0.0011) == 0.0
+
+        moved = noisy.copy()
+        moved[40:80, 100:160] = 250
+        assert pipeline.score(moved, 0.0011) > 0.03
+        assert pipeline.motion_box is not None
+
+    def test_background_model_follows_slow_drift(self):
+        """ Early exits must not freeze the model while half the scene brightens. """
+        def drift_ratio(pipeline):
+            frame = textured_frame().astype(np.float32)
+            for step in range(600):
+                drifted = frame.copy()
+                drifted[:, :160] += step * 0.1
+                pipeline.score(drifted.clip(0, 255).astype(np.uint8), 0.01)
+            drifted[40:60, 200:220] = 255  # small event
+            return pipeline.score(drifted.clip(0, 255).astype(np.uint8), 0.01)
+
+        reference = drift_ratio(DetectionPipeline(
+            BackgroundModelDetector(compensate_illumination=True)).resize((320, 180)))
+        coarse = drift_ratio(DetectionPipeline(
+            BackgroundModelDetector(compensate_illumination=True),
+            coarse_detector=FrameDifferenceDetector(),
+            coarse_decimation=4).resize((320, 180)))
+        assert reference < 0.05
+        assert coarse == pytest.approx(reference, abs=0.01)
+
+    def test_background_model_without_coarse_stage(self):
+        config = MotionCaptureConfig(capture_motion_in_background=False,
+                                     motion_detection_framerate=4,
+                                     frame_change_ratio_threshold=0.01,
+                                     min_motion_capture_length_sec=5,
+                                     max_motion_capture_length_sec=60,
+                                     motion_captures_window_size_gb=1.0,
+                                     motion_detection_engine="background_model")
+        assert create_detection_pipeline(config)._coarse_detector is None
+
+
+class TestBlobFilter():
+
+    @pytest.fixture
+    def blob_filter(self):
+        yield BlobFilter(downsample=2, min_area_ratio=0.001)
+
+    def test_scattered_noise(self, blob_filter):
+        rng = np.random.default_rng(2)
+        mask = np.zeros((180, 320), dtype=np.bool_)
+        mask.reshape(-1)[rng.choice(mask.size, 300, replace=False)] = True
+
+        filtered = blob_filter.filter(mask)
+        assert not filtered.any()
+        assert blob_filter.box is None
+
+    def test_single_subject(self, blob_filter):
+        mask = np.zeros((180, 320), dtype=np.bool_)
+        mask[40:60, 80:96] = True  # 320 px subject
+
+        filtered = blob_filter.filter(mask)
+        assert filtered.shape == (90, 160)
+        assert np.count_nonzero(filtered) == 10 * 8
+        assert blob_filter.box == pytest.approx((0.25, 40 / 180, 0.3, 60 / 180))
+        assert blob_filter.largest_ratio == pytest.approx(10 * 8 / (90 * 160))
+
+    def test_pipeline_ratio_of_largest_blob(self):
+        pipeline = DetectionPipeline(FrameDifferenceDetector(),
+                                     blob_filter=BlobFilter(downsample=4))
+        frame = textured_frame()
+        pipeline.score(frame, 0.001)
+
+        moved = frame.copy()
+        moved[40:80, 160:240] = 255   # subject
+        moved[120:160, 20:60] = 255   # smaller one elsewhere
+        ratio = pipeline.score(moved, 0.001)
+        # subject only, its edges widened by smoothing
+        assert ratio == pytest.approx(44 * 84 / (320 * 180), rel=0.05)
+
+    def test_pipeline_motion_box(self):
+        pipeline = DetectionPipeline(FrameDifferenceDetector(),
+                                     blob_filter=BlobFilter(downsample=4))
+        frame = textured_frame()
+        pipeline.score(frame, 0.001)
+
+        moved = frame.copy()
+        moved[40:80, 160:240] = 255
+        assert pipeline.score(moved, 0.001) > 0.001
+        x0, y0, x1, y1 = pipeline.motion_box
+        assert 0.45 < x0 <= 0.5 and 0.75 <= x1 < 0.8
+        assert 0.2 < y0 <= 0.25 and 0.4 < y1 < 0.5
+
+
+class TestDetectionWorker():
+
+    @pytest.fixture
+    def worker(self):
+        config = MotionCaptureConfig(capture_motion_in_background=False,
+                                     motion_detection_framerate=4,
+                                     frame_change_ratio_threshold=0.01,
+                                     min_motion_capture_length_sec=5,
+                                     max_motion_capture_length_sec=60,
+                                     motion_captures_window_size_gb=1.0,
+                                     blob_filter=True)
+        worker = DetectionWorker(config).resize((320, 180)).reset()
+        yield worker
+        worker.close()
+
+    def test_matches_pipeline(self, worker):
+        pipeline = create_detection_pipeline(worker._config).resize((320, 180))
+        frame = textured_frame()
+        moved = frame.copy()
+        moved[40:80, 100:160] = 250
+
+        for f in (frame, moved, moved):
+            assert worker.score(f, 0.01) == pipeline.score(f, 0.01)
+        assert worker.motion_box is None
+
+        worker.score(frame, 0.01)
+        pipeline.score(frame, 0.01)
+        assert worker.motion_box == pipeline.motion_box
+
+    def test_close(self, worker):
+        process, shm_name = worker._process, worker._shm.name
+        worker.close()
+        assert not process.is_alive()
+        assert not worker.is_alive()
+        assert worker.score(textured_frame(), 0.01) is None
+        with pytest.raises(FileNotFoundError):
+            SharedMemory(name=shm_name)
+
+
+class TestScoreTelemetry():
+
+    def test_ring_keeps_latest(self):
+        telemetry = ScoreTelemetry(capacity=4)
+        for i in range(6):
+            telemetry.push(float(i), i / 100, 0.001)
+
+        times, ratios, _ = telemetry.samples()
+        assert len(telemetry) == 4
+        assert list(times) == [2.0, 3.0, 4.0, 5.0]
+        assert ratios == pytest.approx([0.02, 0.03, 0.04, 0.05])
+
+    def test_summary(self):
+        rng = np.random.default_rng(0)
+        telemetry = ScoreTelemetry(capacity=1000)
+        noise = rng.uniform(0.0, 0.0004, 1000)
+        noise[500:510] = 0.05  # one motion event
+        for i, ratio in enumerate(noise):
+            telemetry.push(float(i), ratio, 0.004)
+
+        summary = telemetry.summary(points=100)
+        assert summary["samples"] == 1000
+        assert len(summary["history"]) == 100
+        # downsampling keeps the event peak
+        assert summary["history"][50]["ratio"] == pytest.approx(0.05)
+        assert summary["latency_ms_percentiles"]["p50"] == pytest.approx(4.0)
+        assert summary["ratio_percentiles"]["max"] == pytest.approx(0.05)
+        # above the noise floor, not pulled up by the event
+        assert 0.0004 < summary["suggested_threshold"] < 0.001
+
+    def test_empty(self):
+        summary = ScoreTelemetry().summary()
+        assert summary["samples"] == 0
+        assert summary["suggested_threshold"] is None
+
+
+class TestThresholdCalibration():
+
+    def test_quantile_tracker(self):
+        rng = np.random.default_rng(0)
+        tracker = QuantileTracker(quantile=0.95)
+        values = [tracker.update(sample) for sample in rng.uniform(0.0, 0.001, 20000)]
+        # jitters around the quantile
+        assert np.mean(values[-10000:]) == pytest.approx(0.00095, rel=0.05)
+        assert tracker.value == pytest.approx(0.00095, rel=0.2)
+
+    def test_follows_noise_floor(self):
+        rng = np.random.default_rng(0)
+        calibrator = ThresholdCalibrator(quantile=0.95, multiplier=3.0,
+                                         min_threshold=0.0003, max_threshold=0.01)
+        assert calibrator.threshold(default=0.0011) == 0.0011
+
+        # noisy night, then quiet day
+        for sample in rng.uniform(0.0, 0.002, 5000):
+            calibrator.update(sample)
+        assert calibrator.threshold(0.0011) == pytest.approx(0.0057, rel=0.15)
+
+        for sample in rng.uniform(0.0, 0.0002, 5000):
+            calibrator.update(sample)
+        assert calibrator.threshold(0.0011) == pytest.approx(0.00057, rel=0.15)
+
+    def test_bounds(self):
+        calibrator = ThresholdCalibrator(min_threshold=0.0003, max_threshold=0.01,
+                                         warmup_samples=10)
+        for _ in range(100):
+            calibrator.update(0.0)
+        assert calibrator.threshold(0.0011) == 0.0003
+
+        for _ in range(2000):
+            calibrator.update(0.5)
+        assert calibrator.threshold(0.0011) == 0.01
+
+
+class TestAdaptiveDetectionRate():
+
+    @pytest.fixture
+    def rate(self):
+        yield AdaptiveDetectionRate(idle_rate=2, active_rate=10,
+                                    ramp_fraction=0.5, cooldown_sec=5)
+
+    def test_starts_idle(self, rate):
+        assert rate.next_interval(0.0, 0.01, False, now=100.0) == pytest.approx(0.5)
+
+    def test_ramp_near_threshold(self, rate):
+        rate.next_interval(0.0, 0.01, False, now=100.0)
+        assert rate.next_interval(0.006, 0.01, False, now=100.5) == pytest.approx(0.1)
+
+    def test_stays_active_while_recording(self, rate):
+        rate.next_interval(0.02, 0.01, True, now=100.0)
+        assert rate.next_interval(0.0, 0.01, True, now=200.0) == pytest.approx(0.1)
+
+    def test_decays_after_cooldown(self, rate):
+        rate.next_interval(0.02, 0.01, False, now=100.0)
+        assert rate.next_interval(0.0, 0.01, False, now=104.0) == pytest.approx(0.1)
+
+        now = 106.0
+        for _ in range(50):
+            rate.next_interval(0.0, 0.01, False, now=now)
+            now += 0.5
+        assert rate.get_rate() == pytest.approx(2)
+
+    def test_fixed_rate(self):
+        rate = AdaptiveDetectionRate(idle_rate=10, active_rate=10)
+        assert rate.next_interval(0.0, 0.01, False, now=1000.0) == pytest.approx(0.1)
+
+
+class TestMotionReplay():
+
+    @pytest.fixture
+    def config(self):
+        yield MotionCaptureConfig(capture_motion_in_background=False,
+                                  motion_detection_framerate=4,
+                                  frame_change_ratio_threshold=0.01,
+                                  min_motion_capture_length_sec=2,
+                                  max_motion_capture_length_sec=60,
+                                  motion_captures_window_size_gb=1.0)
+
+    @pytest.fixture
+    def stack_path(self, tmp_path):
+        """ 40 frames at 4 fps, subject appears at 2.0 s and 8.0 s. """
+        frame = textured_frame()
+        frames = np.repeat(frame[np.newaxis], 40, axis=0)
+        for i in (8, 32):
+            frames[i:i + 2, 40:80, 100:160] = 250
+        path = tmp_path / "frames.npz"
+        np.savez(path, frames=frames)
+        yield path
+
+    def test_npz_triggers(self, config, stack_path):
+        result = replay(load_frames(stack_path, framerate=4), config)
+        assert result.frames == 40
+        assert result.triggers == [2.0, 8.0]
+        assert result.fps > 0
+
+    def test_decimated_to_detection_rate(self, config, tmp_path):
+        """ Subject moving 1 px per frame at 20 fps, 5 px per scored frame. """
+        frame = textured_frame()
+        frames = np.repeat(frame[np.newaxis], 200, axis=0)
+        for i in range(200):
+            x = 100 + min(max(i - 40, 0), 40)   # moves from 2.0 s to 4.0 s
+            frames[i, 40:80, x:x + 60] = 250
+        path = tmp_path / "fast.npz"
+        np.savez(path, frames=frames, timestamps=np.arange(200) / 20)
+        config = config.model_copy(update={"frame_change_ratio_threshold": 0.007})
+
+        result = replay(load_frames(path, framerate=20), config)
+        assert result.frames == 40
+        assert result.triggers == [2.25]
+        # every frame 50 ms apart, changes look smaller than on the camera
+        assert replay(load_frames(path, framerate=20), config, rate=20).triggers == []
+
+    def test_image_directory(self, config, stack_path, tmp_path):
+        with np.load(stack_path) as data:
+            frames = data["frames"]
+        folder = tmp_path / "frames"
+        folder.mkdir()
+        for i, frame in enumerate(frames):
+            Image.fromarray(frame).save(folder / f"{i:04d}.png")
+
+        result = replay(load_frames(folder, framerate=4, size=(160, 90)), config)
+        assert result.triggers == [2.0, 8.0]
+
+
+class TestMockScene():
+
+    @pytest.fixture
+    def scene(self):
+        yield MockScene(objects=[MovingObject(size=(0.2, 0.3),
+                                              waypoints=[(0.2, 0.5), (0.8, 0.5)],
+                                              frames=10, start=5, end=15)],
+                        lighting_steps=[LightingStep(20, 30)])
+
+    def test_deterministic(self, scene):
+        other = MockScene(scene.objects, scene.lighting_steps)
+        for index in (0, 7, 21):
+            assert np.array_equal(scene.render_luminance(index, 320, 180),
+                                  other.render_luminance(index, 320, 180))
+
+    def test_yuv420_layout(self, scene):
+        buffer = scene.render_yuv420(7, 320, 180, stride=384)
+        assert buffer.size == 384 * 180 * 3 // 2
+        y_plane = buffer[:384 * 180].reshape(180, 384)
+        assert np.array_equal(y_plane[:, :320], scene.render_luminance(7, 320, 180))
+
+    def test_detection(self, scene):
+        detector = FrameDifferenceDetector(compensate_illumination=True).resize((320, 180))
+        ratios = [detector.score(scene.render_luminance(i, 320, 180)) for i in range(25)]
+
+        # noise only, object moving (frames 5 - 14), lighting step at 20
+        assert max(ratios[1:5]) == 0.0
+        assert min(ratios[6:15]) > 0.01
+        assert ratios[20] == 0.0
+
+    def test_default_scene_repeats(self):
+        scene = MockScene.default()
+        for index in (30, 75, 160):
+            later = index + 10 * scene.period
+            assert list(scene.object_boxes(later, 320, 180)) == \
+                list(scene.object_boxes(index, 320, 180))
+            assert scene.lighting_offset(later) == scene.lighting_offset(index)
+        assert list(scene.object_boxes(10_030, 320, 180))
@@ -1,10 +1,30 @@
+import io
 import pytest
 import os
+import socket
+import numpy as np
 from time import sleep
+from threading import Thread
+
+from flask import Flask
+from PIL import Image
 
 from securypi_app import create_app
+from securypi_app.models.app_config import AppConfig
 from securypi_app.peripherals.camera.mycam import MyPicamera2
 from securypi_app.peripherals.camera.streaming import StreamingOutput
+from securypi_app.peripherals.camera.stream_tiers import (
+    StreamFrame, TierSelector, resize_jpeg
+)
+from securypi_app.peripherals.camera.segmented_output import SegmentedOutput
+from securypi_app.peripherals.camera.frame_bus import FrameBus
+from securypi_app.peripherals.camera.motion_capturing import FRAME_BUS_CONSUMER
+from securypi_app.services import snapshots
+from securypi_app.services.snapshots import (
+    Snapshot, SnapshotCoalescer, ResizedCache, get_snapshot
+)
+from securypi_app.services.stream_server import StreamServer
+from securypi_app.blueprints.overview import async_stream_url
 
 
 """
@@ -42,9 +62,12 @@ class TestMycamClass():
 
         mypicam.streaming._streaming_output = StreamingOutput()
         mypicam.streaming._stream_timer = None
+        mypicam.streaming._viewers = 0
 
         mypicam._recording_encoder = None
         mypicam._streaming_encoder = None
+        mypicam._preroll_encoder = None
+        mypicam._preroll_output = None
         
         mypicam._picam.start()
 
@@ -69,6 +92,90 @@ class TestMycamClass():
     def test_capture_picture(self, picam):
         assert picam.capture_picture() is not None
 
+    def test_capture_luminance(self, picam):
+        w, h = picam.get_current_resolution("lores")
+        luminance = picam.capture_luminance("lores")
+        assert luminance.shape == (h, w)
+        assert luminance.base is not None  # view, not a copy
+
+    def test_capture_luminance_unaligned_stride(self, picam):
+        picam.configure_video_streams()  # resets cached layouts
+        # width not aligned to 64 bytes (mocked configuration)
+        picam._picam.video_configuration.lores.size = (1000, 562)
+
+        shape, strides = picam.get_luminance_layout("lores")
+        assert shape == (562, 1000)
+        assert strides[0] == picam._picam.stream_configuration("lores")["stride"]
+        assert picam.capture_luminance("lores").shape == (562, 1000)
+
+    def test_frame_bus(self, picam):
+        bus = picam.get_frame_bus()
+        bus.subscribe("test", max_rate=50)
+        try:
+            seq, frame = bus.wait_next(0, timeout=2.0)
+            w, h = picam.get_current_resolution("lores")
+            assert frame.shape == (h, w)
+            assert not frame.flags.writeable
+
+            next_seq, next_frame = bus.wait_next(seq, timeout=2.0)
+            assert next_seq > seq
+            # synthetic scene noise differs between frames
+            assert not (next_frame == frame).all()
+        finally:
+            bus.unsubscribe("test")
+        assert not bus.is_running()
+
+    def test_motion_loop_follows_adaptive_rate(self, picam):
+        capturing = picam.motion_capturing
+        bus = picam.get_frame_bus()
+        saved = (capturing._adaptive_rate, capturing._idle_detection_rate,
+                 capturing._change_ratio_threshold)
+        capturing._adaptive_rate = True
+        capturing._idle_detection_rate = 2
+        capturing._change_ratio_threshold = 1.0  # never records
+        capturing._capturing_stop_event.clear()
+        loop = Thread(target=capturing.loop_motion_capturing, daemon=True)
+        loop.start()
+        try:
+            sleep(0.5)
+            # the bus captures at the idle rate, not the active one
+            assert bus._rates[FRAME_BUS_CONSUMER] == 2
+        finally:
+            capturing._capturing_stop_event.set()
+            loop.join(timeout=2.0)
+            (capturing._adaptive_rate, capturing._idle_detection_rate,
+             capturing._change_ratio_threshold) = saved
+        assert not bus.is_running()
+
+    def test_motion_loop_cleans_up_after_error(self, picam):
+        class FailingPipeline:
+            closed = False
+
+            def resize(self, resolution):
+                return self
+
+            def reset(self):
+                return self
+
+            def score(self, frame, threshold, exit_threshold=None):
+                raise RuntimeError("detection failed")
+
+            def close(self):
+                self.closed = True
+
+        capturing = picam.motion_capturing
+        pipeline = capturing._pipeline
+        capturing._pipeline = FailingPipeline()
+        capturing._capturing_stop_event.clear()
+        try:
+            with pytest.raises(RuntimeError):
+                capturing.loop_motion_capturing()
+            assert capturing._pipeline.closed
+        finally:
+            capturing._pipeline = pipeline
+        assert not picam.get_frame_bus().is_running()
+        assert not picam.is_preroll_buffering()
+
     def test_stream(self, picam):
         output = picam.streaming._streaming_output
         assert isinstance(output, StreamingOutput)
@@ -82,6 +189,144 @@ class TestMycamClass():
         assert picam.streaming._stream_timer is None
         assert picam._streaming_encoder is None
 
+    def test_stream_viewers(self, picam):
+        config = AppConfig.get().camera.streaming
+        grace = config.viewer_grace_seconds
+        interval = picam._picam.new_frame_interval_seconds
+        config.viewer_grace_seconds = 0.2
+        picam._picam.new_frame_interval_seconds = 0.05
+        try:
+            first = picam.streaming.generate_frames()
+            second = picam.streaming.generate_frames()
+            assert next(first).startswith(b"--frame")
+            assert next(second).startswith(b"--frame")
+            assert picam.streaming.get_viewer_count() == 2
+
+            first.close()  # disconnect
+            assert picam.streaming.get_viewer_count() == 1
+            sleep(0.4)
+            assert picam.streaming.is_streaming()
+
+            second.close()
+            assert picam.streaming.get_viewer_count() == 0
+            assert picam.streaming.is_streaming()   # grace period
+
+            # viewer returning within the grace period keeps the encoder
+            third = picam.streaming.generate_frames()
+            next(third)
+            sleep(0.4)
+            assert picam.streaming.is_streaming()
+            third.close()
+
+            sleep(0.4)
+            assert not picam.streaming.is_streaming()
+        finally:
+            config.viewer_grace_seconds = grace
+            picam._picam.new_frame_interval_seconds = interval
+
+    def test_live_segments(self, picam, tmp_path):
+        config = AppConfig.get().camera.streaming
+        hls_dir = config.hls_dir
+        interval = picam._picam.new_frame_interval_seconds
+        config.hls_dir = str(tmp_path)
+        picam._picam.new_frame_interval_seconds = 0.05
+        # e.g. shared memory of the detection worker in /dev/shm
+        neighbour = tmp_path / "neighbour"
+        neighbour.write_bytes(b"not ours")
+        try:
+            live_dir = picam.streaming.start_live_segments()
+            assert live_dir == tmp_path / "securypi_live"
+            assert picam.streaming.wait_live_playlist(timeout=2.0)
+            sleep(0.5)
+
+            playlist = (live_dir / "live.m3u8").read_text()
+            segments = [line for line in playlist.splitlines() if line.endswith(".m4s")]
+            assert len(segments) == config.hls_window_segments
+            assert sorted(p.name for p in live_dir.glob("*.m4s")) == segments
+
+            picam.streaming.stop_live_segments()
+            assert not picam.streaming.is_live_segmenting()
+            assert not live_dir.exists()
+            assert neighbour.read_bytes() == b"not ours"
+
+            # restart replaces stale segments only
+            picam.streaming.start_live_segments()
+            picam.streaming.stop_live_segments()
+            assert neighbour.exists()
+        finally:
+            picam.streaming.stop_live_segments()
+            config.hls_dir = hls_dir
+            picam._picam.new_frame_interval_seconds = interval
+
+    def test_live_routes(self, app, picam, tmp_path):
+        config = AppConfig.get().camera.streaming
+        hls_dir = config.hls_dir
+        config.hls_dir = str(tmp_path)
+        client = app.test_client()
+        try:
+            assert client.get("/live/live.m3u8").status_code == 401
+            with client.session_transaction() as session:
+                session["username"] = "viewer"
+
+            response = client.get("/live/live.m3u8")
+            assert response.status_code == 200
+            assert response.mimetype == "application/vnd.apple.mpegurl"
+            assert picam.streaming.is_live_segmenting()
+
+            segment = response.get_data(as_text=True).splitlines()[-1]
+            response = client.get(f"/live/{segment}")
+            assert response.status_code == 200
+            assert response.mimetype == "video/iso.segment"
+
+            assert client.get("/live/app_config.json").status_code == 404
+        finally:
+            picam.streaming.stop_live_segments()
+            config.hls_dir = hls_dir
+
+    def test_picture_revalidation(self, app, picam):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["username"] = "viewer"
+
+        response = client.get("/picture.jpg")
+        assert response.status_code == 200
+        assert response.mimetype == "image/jpeg"
+        etag = response.headers["ETag"]
+        assert response.last_modified is not None
+
+        # within the coalescing window, the same capture
+        response = client.get("/picture.jpg", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.data == b""
+
+    def test_picture_resized(self, app, picam):
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session["username"] = "viewer"
+
+        full = client.get("/picture.jpg")
+        response = client.get("/picture.jpg?width=160&quality=50")
+        assert response.status_code == 200
+        assert Image.open(io.BytesIO(response.data)).size == (160, 90)
+        assert response.headers["ETag"] != full.headers["ETag"]
+
+        # never enlarged
+        response = client.get("/picture.jpg?width=5000")
+        assert Image.open(io.BytesIO(response.data)).size == (640, 360)
+
+        assert client.get("/picture.jpg?width=0").status_code == 400
+        assert client.get("/picture.jpg?quality=100").status_code == 400
+
+    def test_picture_from_stream(self, picam):
+        picam.streaming.start_capture_stream()
+        try:
+            while picam.streaming.get_latest_frame()[0] is None:
+                sleep(0.01)
+            jpeg, _ = picam.streaming.get_latest_frame()
+            assert get_snapshot(picam).jpeg is jpeg     # no capture, no encoding
+        finally:
+            picam.streaming.stop_capture_stream()
+
     def test_default_recording(self, picam):
         recording_path = picam.start_default_recording()
         sleep(1)
@@ -97,6 +342,35 @@ class TestMycamClass():
         os.remove(recording_path)
         assert not recording_path.exists()
 
+    def test_preroll_recording(self, picam, tmp_path):
+        picam.start_preroll_buffer(2)
+        try:
+            assert picam.is_preroll_buffering()
+            assert not picam.is_recording()
+
+            picam.start_recording_to_file(str(tmp_path / "motion.mp4"))
+            assert picam.is_recording()
+
+            # encoder keeps running, only the file is detached
+            picam.stop_recording_to_file()
+            assert not picam.is_recording()
+            assert picam.is_preroll_buffering()
+        finally:
+            picam.stop_preroll_buffer()
+        assert not picam.is_preroll_buffering()
+
+    def test_split_recording(self, picam, tmp_path):
+        picam.start_recording_to_file(str(tmp_path / "first.mp4"))
+        encoder = picam._recording_encoder
+
+        picam.split_recording_to_file(str(tmp_path / "second.mp4"))
+        assert picam.is_recording()
+        assert picam._recording_encoder is encoder  # not restarted
+
+        picam.stop_recording_to_file()
+        with pytest.raises(RuntimeError):
+            picam.split_recording_to_file(str(tmp_path / "third.mp4"))
+
     """
     Testing method Mypicamera2().get_best_sensor_mode(res, fps)
 
@@ -148,3 +422,361 @@ class TestMycamClass():
         modes = picam._picam.sensor_modes
         expected = modes[expected_idx] if expected_idx is not None else None
         assert picam.get_best_sensor_mode(resolution, fps) == expected
+
+
+class TestFrameBus():
+
+    @pytest.fixture
+    def bus(self):
+        count = [0]
+
+        def capture():
+            count[0] += 1
+            return np.full((4, 6), count[0] % 256, dtype=np.uint8)
+
+        bus = FrameBus(capture, slots=3)
+        yield bus
+        bus.unsubscribe("fast")
+        bus.unsubscribe("slow")
+
+    def test_shared_capture(self, bus):
+        bus.subscribe("fast", max_rate=100)
+        bus.subscribe("slow", max_rate=1)
+        seq, frame = bus.wait_next(0, timeout=1.0)
+        other_seq, other_frame = bus.wait_next(0, timeout=1.0)
+        # both consumers read the same buffer
+        assert other_seq >= seq
+        assert other_frame.base is frame.base
+
+    def test_skips_stale_frames(self, bus):
+        bus.subscribe("fast", max_rate=100)
+        seq, _ = bus.wait_next(0, timeout=1.0)
+        sleep(0.1)
+        newest, frame = bus.wait_next(seq, timeout=1.0)
+        assert newest > seq + 1
+        assert frame[0, 0] == newest % 256
+        assert not bus.is_valid(seq)
+
+    def test_stops_without_consumers(self, bus):
+        bus.subscribe("fast", max_rate=100)
+        bus.subscribe("slow", max_rate=1)
+        bus.unsubscribe("fast")
+        assert bus.is_running()
+        bus.unsubscribe("slow")
+        assert not bus.is_running()
+        assert bus.wait_next(bus.get_sequence(), timeout=0.1) is None
+
+
+class TestStreamingOutput():
+
+    def test_slow_client_gets_newest_frame(self):
+        output = StreamingOutput()
+        frames = output.generate_frames()
+        output.write(b"first")     # before the client subscribed
+
+        received = []
+        reader = Thread(target=lambda: received.append(next(frames)))
+        reader.start()
+        while output.client_count() == 0:
+            sleep(0.01)
+        output.write(b"second")
+        reader.join(timeout=2.0)
+        assert received == [b"--frame\r\nContent-Type: image/jpeg\r\n"
+                            b"Content-Length: 6\r\n\r\nsecond\r\n"]
+
+        # client busy sending, frames arrive meanwhile
+        for frame in (b"a", b"b", b"newest"):
+            output.write(frame)
+        assert next(frames).endswith(b"\r\n\r\nnewest\r\n")
+
+        frames.close()  # client disconnected
+        assert output.client_count() == 0
+
+    def test_clients_share_frames(self):
+        output = StreamingOutput()
+        clients = [output.subscribe() for _ in range(20)]
+        output.write(b"x")
+        output.write(b"frame")
+        chunks = [mailbox.get(timeout=0).chunk("full") for mailbox in clients]
+        assert chunks[0].endswith(b"\r\n\r\nframe\r\n")
+        for mailbox, chunk in zip(clients, chunks):
+            assert chunk is chunks[0]   # framed once, shared
+            assert mailbox.dropped == 1
+            assert mailbox.get(timeout=0) is None
+
+    def test_close_ends_streams(self):
+        output = StreamingOutput()
+        frames = output.generate_frames()
+        output.write(b"frame")
+        received = []
+        reader = Thread(target=lambda: received.extend(frames))
+        reader.start()
+        while output.client_count() == 0:
+            sleep(0.01)
+        output.close()
+        reader.join(timeout=2.0)
+        assert not reader.is_alive()
+        assert output.client_count() == 0
+
+
+class TestSnapshotCoalescer():
+
+    def test_single_flight(self):
+        coalescer = SnapshotCoalescer(window=0.2)
+        captures = []
+
+        def capture():
+            captures.append(1)
+            sleep(0.1)
+            return f"jpeg {len(captures)}".encode()
+
+        results = []
+        threads = [Thread(target=lambda: results.append(coalescer.capture(capture)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(captures) == 1
+        assert {snapshot.jpeg for snapshot in results} == {b"jpeg 1"}
+
+        sleep(0.25)     # window passed
+        snapshot = coalescer.capture(capture)
+        assert snapshot.jpeg == b"jpeg 2"
+        assert snapshot.sequence == results[0].sequence + 1
+        assert snapshot.etag != results[0].etag
+
+    def test_failed_capture(self):
+        coalescer = SnapshotCoalescer()
+
+        def failing():
+            raise RuntimeError("camera stopped")
+
+        with pytest.raises(RuntimeError):
+            coalescer.capture(failing)
+        assert coalescer.capture(lambda: b"jpeg").jpeg == b"jpeg"
+
+    def test_stream_frame_hashed_once(self):
+        coalescer = SnapshotCoalescer()
+        frame = b"stream frame"
+        first = coalescer.from_stream(frame, 1.0)
+        assert coalescer.from_stream(frame, 1.0) is first
+        assert coalescer.from_stream(b"next frame", 2.0).sequence == first.sequence + 1
+
+
+class TestResizedCache():
+
+    @staticmethod
+    def snapshot(sequence=1):
+        jpeg = TestStreamTiers.jpeg()
+        return Snapshot(jpeg, 0.0, "etag", sequence)
+
+    def test_resize_once(self, monkeypatch):
+        resizes = []
+
+        def counting_resize(jpeg, width, quality):
+            resizes.append(width)
+            sleep(0.05)
+            return resize_jpeg(jpeg, width, quality)
+        monkeypatch.setattr(snapshots, "resize_jpeg", counting_resize)
+
+        cache = ResizedCache()
+        snapshot = self.snapshot()
+        results = []
+        threads = [Thread(target=lambda: results.append(cache.get(snapshot, 320, 70)))
+                   for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert resizes == [320]
+        assert all(jpeg is results[0] for jpeg in results)
+        assert Image.open(io.BytesIO(results[0])).size == (320, 180)
+        assert cache.get(snapshot, 320, 70) is results[0]
+        cache.close()
+
+    def test_bounded_by_bytes(self):
+        snapshot = self.snapshot()
+        one = len(resize_jpeg(snapshot.jpeg, 320, 70))
+        cache = ResizedCache(max_bytes=int(one * 2.5))
+        for sequence in range(1, 5):
+            cache.get(self.snapshot(sequence), 320, 70)
+        sleep(0.05)     # done callbacks
+        assert one * 2 <= cache.size_bytes() <= one * 2.5
+        cache.close()
+
+
+class TestStreamTiers():
+
+    @staticmethod
+    def jpeg(width=640, height=360):
+        buffer = io.BytesIO()
+        Image.new("RGB", (width, height), (200, 100, 50)).save(buffer, format="JPEG")
+        return buffer.getvalue()
+
+    def test_tier_chunks(self):
+        frame = StreamFrame(self.jpeg())
+        assert frame.chunk("full").endswith(frame.jpeg + b"\r\n")
+        for tier, size in (("half", (320, 180)), ("thumb", (160, 90))):
+            assert not frame.has_chunk(tier)
+            chunk = frame.chunk(tier)
+            assert frame.chunk(tier) is chunk   # encoded once
+            jpeg = chunk.split(b"\r\n\r\n", 1)[1][:-2]
+            assert Image.open(io.BytesIO(jpeg)).size == size
+
+        # not decodable, sent as is
+        broken = StreamFrame(b"jpeg")
+        assert broken.chunk("thumb").endswith(b"\r\n\r\njpeg\r\n")
+
+    def test_selector_follows_drain_time(self):
+        selector = TierSelector(frame_interval=0.1, hold_frames=10)
+        for _ in range(9):
+            selector.update(0.08)
+        assert selector.tier == "full"  # holds for 'hold_frames'
+        selector.update(0.08)
+        assert selector.tier == "half"
+        for _ in range(10):
+            selector.update(0.08)
+        assert selector.tier == "thumb"
+
+        # fast again, waits longer after each step down
+        for _ in range(39):
+            selector.update(0.001)
+        assert selector.tier == "thumb"
+        selector.update(0.001)
+        assert selector.tier == "half"
+
+    def test_selector_not_adaptive(self):
+        selector = TierSelector(frame_interval=0.1, hold_frames=1, adaptive=False)
+        for _ in range(10):
+            assert selector.update(1.0) == "full"
+
+
+class TestStreamServer():
+
+    @pytest.fixture
+    def server(self):
+        app = Flask(__name__)
+        app.secret_key = "test"
+        output = StreamingOutput()
+        server = StreamServer(app, output.frames).start()
+        server.output = output
+        server.cookie = app.session_interface.get_signing_serializer(app).dumps(
+            {"username": "viewer"}
+        )
+        yield server
+        server.stop()
+
+    @staticmethod
+    def request(server, path="/stream.mjpeg", cookie=None):
+        sock = socket.create_connection(("localhost", server.port), timeout=2.0)
+        head = f"GET {path} HTTP/1.1\r\nHost: localhost\r\n"
+        if cookie is not None:
+            head += f"Cookie: session={cookie}\r\n"
+        sock.sendall((head + "\r\n").encode())
+        return sock
+
+    @staticmethod
+    def read_until(sock, marker):
+        data = b""
+        while marker not in data:
+            received = sock.recv(4096)
+            if not received:
+                break
+            data += received
+        return data
+
+    def test_requires_login(self, server):
+        with self.request(server) as sock:
+            assert b"401 Unauthorized" in self.read_until(sock, b"}")
+        with self.request(server, cookie="forged") as sock:
+            assert b"401 Unauthorized" in self.read_until(sock, b"}")
+        with self.request(server, path="/other", cookie=server.cookie) as sock:
+            assert b"404 Not Found" in self.read_until(sock, b"}")
+
+    def test_starts_with_first_request(self):
+        config = AppConfig.get().camera.streaming
+        port = config.async_server_port
+        with socket.socket() as sock:
+            sock.bind(("localhost", 0))
+            config.async_server_port = sock.getsockname()[1]
+        try:
+            # CLI commands create the app without serving requests
+            app = create_app()
+            assert app.extensions["stream_server"] is None
+
+            client = app.test_client()
+            client.get("/login")
+            server = app.extensions["stream_server"]
+            assert server is not None
+            client.get("/login")
+            assert app.extensions["stream_server"] is server
+
+            # bound to localhost, remote viewers use the WSGI stream
+            with app.test_request_context(base_url="http://localhost:5555"):
+                assert async_stream_url() == \
+                    f"http://localhost:{server.port}/stream.mjpeg"
+            with app.test_request_context(base_url="http://camera.local:5555"):
+                assert async_stream_url() is None
+            server.host = "0.0.0.0"
+            with app.test_request_context(base_url="http://camera.local:5555"):
+                assert async_stream_url() == \
+                    f"http://camera.local:{server.port}/stream.mjpeg"
+            with app.test_request_context(base_url="https://camera.local"):
+                assert async_stream_url() is None
+        finally:
+            config.async_server_port = port
+            server = app.extensions.get("stream_server")
+            if server is not None:
+                server.stop()
+
+    def test_streams_to_viewers(self, server):
+        viewers = [self.request(server, cookie=server.cookie) for _ in range(3)]
+        try:
+            for _ in range(100):
+                if server.viewer_count() == 3:
+                    break
+                sleep(0.02)
+            assert server.viewer_count() == 3
+
+            # source started once for all viewers
+            while server.output.client_count() == 0:
+                sleep(0.01)
+            assert server.output.client_count() == 1
+            server.output.write(b"jpeg")
+            for sock in viewers:
+                data = self.read_until(sock, b"jpeg\r\n")
+                assert data.startswith(b"HTTP/1.1 200 OK")
+                assert b"boundary=frame" in data
+                assert data.endswith(b"--frame\r\nContent-Type: image/jpeg\r\n"
+                                     b"Content-Length: 4\r\n\r\njpeg\r\n")
+        finally:
+            for sock in viewers:
+                sock.close()
+
+        # frame source released after the last viewer left
+        for _ in range(100):
+            server.output.write(b"jpeg")
+            if server.output.client_count() == 0:
+                break
+            sleep(0.02)
+        assert server.output.client_count() == 0
+
+
+class TestSegmentedOutput():
+
+    def test_switch_at_keyframe(self, tmp_path):
+        first, second = tmp_path / "first.mp4", tmp_path / "second.mp4"
+        output = SegmentedOutput(str(first))
+        output.start()
+
+        output.outputframe(b"frame", keyframe=True)
+        assert first.exists()
+
+        output.split(str(second))
+        output.outputframe(b"frame", keyframe=False)
+        assert not second.exists()  # waits for a keyframe
+
+        output.outputframe(b"frame", keyframe=True)
+        assert second.exists()
+        output.stop()